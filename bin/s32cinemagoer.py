@@ -22,12 +22,21 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 """
 
+import io
 import os
 import glob
 import gzip
+import time
+import datetime
+import hashlib
 import logging
 import argparse
+import tempfile
+import itertools
+import threading
+import multiprocessing
 import sqlalchemy
+from contextlib import contextmanager
 
 try:
     from tqdm import tqdm
@@ -35,18 +44,50 @@ try:
 except ImportError:
     HAS_TQDM = False
 
-from imdb.parser.s3.utils import DB_TRANSFORM, title_soundex, name_soundexes
+try:
+    from isal import igzip
+except ImportError:
+    igzip = None
+
+from imdb.parser.s3.utils import DB_TRANSFORM, SEARCH_SOURCES, imports_table, title_soundex, name_soundexes, trigrams
 
 TSV_EXT = '.tsv.gz'
 # how many entries to write to the database at a time.
 BLOCK_SIZE = 10000
+# tables split in more chunks, when importing with more jobs: their lines are
+# read by the main process and shared by the worker processes.
+SPLIT_TABLES = ('title_principals', 'title_akas')
+# blocks of lines of a split table waiting in the queue, for each worker process.
+QUEUED_BLOCKS = 2
+# size of the buffers used to read the compressed and decompressed data.
+READ_BUFFER_SIZE = 4 * 1024 * 1024
+# seconds a SQLite connection waits for the other jobs to release the database.
+SQLITE_TIMEOUT = 24 * 60 * 60
+# columns identifying a row of each table, used by the incremental import.
+PRIMARY_KEYS = {
+    'title_basics': ('tconst',),
+    'name_basics': ('nconst',),
+    'title_akas': ('titleId', 'ordering'),
+    'title_crew': ('tconst',),
+    'title_episode': ('tconst',),
+    'title_principals': ('tconst', 'ordering'),
+    'title_ratings': ('tconst',)
+}
+# suffix of the tables with the hash of each row, used by the incremental import.
+HASHES_SUFFIX = '_hashes'
+# MySQL errors of LOAD DATA LOCAL INFILE when it's disabled on the server or on the client.
+MYSQL_LOCAL_INFILE_ERRORS = (1148, 2068, 3948)
+# escapes of the text format used by COPY (PostgreSQL) and LOAD DATA (MySQL).
+TEXT_ESCAPES = {ord('\\'): '\\\\', ord('\t'): '\\t', ord('\n'): '\\n', ord('\r'): '\\r'}
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 metadata = sqlalchemy.MetaData()
+# queues of the blocks of lines of the files in SPLIT_TABLES, in the worker processes.
+block_queues = {}
 
 
-def generate_content(fd, headers, table):
+def generate_content(fd, headers, table, row_filter=None):
     """Generate blocks of rows to be written to the database.
 
     :param fd: a file descriptor for the .tsv.gz file
@@ -55,13 +96,16 @@ def generate_content(fd, headers, table):
     :type headers: list
     :param table: the table that will populated
     :type table: :class:`sqlalchemy.Table`
+    :param row_filter: if set, only the lines for which it returns True are read;
+                       it receives the list of fields
+    :type row_filter: function
     :returns: block of data to insert
     :rtype: list
     """
     data = []
     headers_len = len(headers)
     data_transf = {}
-    table_name = table.name
+    table_name = table.info.get('dataset', table.name)
     for column, conf in DB_TRANSFORM.get(table_name, {}).items():
         if 'transform' in conf:
             data_transf[column] = conf['transform']
@@ -69,6 +113,8 @@ def generate_content(fd, headers, table):
         s_line = line.decode('utf-8').strip().split('\t')
         if len(s_line) != headers_len:
             continue
+        if row_filter is not None and not row_filter(s_line):
+            continue
         info = dict(zip(headers, [x if x != r'\N' else None for x in s_line]))
         for key, tranf in data_transf.items():
             if key not in info:
@@ -89,13 +135,126 @@ def generate_content(fd, headers, table):
         data = []
 
 
-def build_table(fn, headers):
+def to_text(value):
+    """Convert a value to the text format of COPY and LOAD DATA.
+
+    :param value: the value
+    :returns: the escaped value
+    :rtype: str
+    """
+    if value is None:
+        return '\\N'
+    if value is True:
+        return '1'
+    if value is False:
+        return '0'
+    if isinstance(value, str):
+        return value.translate(TEXT_ESCAPES)
+    return str(value)
+
+
+def block_to_text(block, columns):
+    """Convert a block of rows to the text format of COPY and LOAD DATA.
+
+    :param block: block of data to insert
+    :type block: list
+    :param columns: names of the columns
+    :type columns: list
+    :returns: a line for each row
+    :rtype: str
+    """
+    return ''.join('\t'.join([to_text(row.get(column)) for column in columns]) + '\n' for row in block)
+
+
+def bulk_loader(connection, table):
+    """Return a function that writes a block of rows into a table, using the fastest
+    method available for the database: COPY for PostgreSQL (with psycopg2),
+    LOAD DATA LOCAL INFILE for MySQL and executemany for SQLite.
+
+    :param connection: connection to the database
+    :type connection: :class:`sqlalchemy.engine.base.Connection`
+    :param table: the table that will populated
+    :type table: :class:`sqlalchemy.Table`
+    :returns: the function and the name of the method
+    :rtype: tuple
+    """
+    dialect = connection.dialect
+    quote = dialect.identifier_preparer.quote
+    columns = [column.name for column in table.columns]
+    quoted_table = quote(table.name)
+    quoted_columns = ', '.join([quote(column) for column in columns])
+    raw_connection = connection.connection
+    has_copy = False
+    if dialect.name == 'postgresql':
+        cursor = raw_connection.cursor()
+        try:
+            has_copy = hasattr(cursor, 'copy_expert')
+        finally:
+            cursor.close()
+    if has_copy:
+        copy = 'COPY %s (%s) FROM STDIN' % (quoted_table, quoted_columns)
+
+        def load_block(block):
+            cursor = raw_connection.cursor()
+            try:
+                cursor.copy_expert(copy, io.StringIO(block_to_text(block, columns)))
+            finally:
+                cursor.close()
+        return load_block, 'copy'
+    if dialect.name == 'mysql':
+        load_data = "LOAD DATA LOCAL INFILE %%s INTO TABLE %s CHARACTER SET utf8mb4 (%s)" % (
+            quoted_table, quoted_columns)
+
+        def load_block(block):
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.tsv', delete=False) as tmp_file:
+                tmp_file.write(block_to_text(block, columns))
+            try:
+                cursor = raw_connection.cursor()
+                try:
+                    cursor.execute(load_data, (tmp_file.name,))
+                finally:
+                    cursor.close()
+            finally:
+                os.remove(tmp_file.name)
+        return load_block, 'load data'
+    if dialect.name == 'sqlite':
+        insert = 'INSERT INTO %s (%s) VALUES (%s)' % (quoted_table, quoted_columns,
+                                                      ', '.join(['?'] * len(columns)))
+
+        def load_block(block):
+            # The table is written in a single transaction (see store_blocks): a
+            # savepoint removes the rows of a block that can't be written as a whole.
+            cursor = raw_connection.cursor()
+            try:
+                if not raw_connection.in_transaction:
+                    # Otherwise releasing the savepoint would commit the transaction.
+                    cursor.execute('BEGIN')
+                cursor.execute('SAVEPOINT load_block')
+                try:
+                    cursor.executemany(insert, [tuple([row.get(column) for column in columns]) for row in block])
+                except Exception:
+                    cursor.execute('ROLLBACK TO load_block')
+                    raise
+                finally:
+                    cursor.execute('RELEASE load_block')
+            finally:
+                cursor.close()
+        return load_block, 'executemany'
+    insert = table.insert()
+    return lambda block: connection.execute(insert, block), 'insert'
+
+
+def build_table(fn, headers, meta=None, name=None):
     """Build a Table object from a .tsv.gz file.
 
     :param fn: the .tsv.gz file
     :type fn: str
     :param headers: headers in the file
     :type headers: list
+    :param meta: the metadata of the table (the global one, by default)
+    :type meta: :class:`sqlalchemy.MetaData`
+    :param name: name of the table, if it's not the one of the file (e.g. for a shadow table)
+    :type name: str
     """
     logging.debug('building table for file %s' % fn)
     table_name = fn.replace(TSV_EXT, '').replace('.', '_')
@@ -108,14 +267,465 @@ def build_table(fn, headers):
         col_type = col_info.get('type') or sqlalchemy.UnicodeText
         if 'length' in col_info and col_type is sqlalchemy.String:
             col_type = sqlalchemy.String(length=col_info['length'])
+        # The indexes are created once the data is loaded; see create_indexes.
         col_args = {
             'name': header,
-            'type_': col_type,
-            'index': col_info.get('index', False)
+            'type_': col_type
         }
         col_obj = sqlalchemy.Column(**col_args)
         columns.append(col_obj)
-    return sqlalchemy.Table(table_name, metadata, *columns)
+    return sqlalchemy.Table(name or table_name, meta if meta is not None else metadata, *columns,
+                            info={'dataset': table_name})
+
+
+def build_hashes_table(table_name, meta, name=None):
+    """Build the Table object that stores the primary key and the hash of each row of a table.
+
+    :param table_name: name of the table
+    :type table_name: str
+    :param meta: the metadata of the table
+    :type meta: :class:`sqlalchemy.MetaData`
+    :param name: name of the table (by default, the name of the table followed by HASHES_SUFFIX)
+    :type name: str
+    """
+    table_map = DB_TRANSFORM.get(table_name) or {}
+    columns = [sqlalchemy.Column(column, table_map.get(column, {}).get('type') or sqlalchemy.UnicodeText)
+               for column in PRIMARY_KEYS[table_name]]
+    columns.append(sqlalchemy.Column('row_hash', sqlalchemy.BigInteger))
+    return sqlalchemy.Table(name or table_name + HASHES_SUFFIX, meta, *columns, info={'dataset': table_name})
+
+
+def key_function(table_name, headers):
+    """Return a function that computes the primary key from the fields of a line.
+
+    :param table_name: name of the table
+    :type table_name: str
+    :param headers: headers in the file
+    :type headers: list
+    :returns: a function that returns a tuple with the (transformed) values of the primary key
+    :rtype: function
+    """
+    table_map = DB_TRANSFORM.get(table_name) or {}
+    getters = []
+    for column in PRIMARY_KEYS[table_name]:
+        transf = table_map.get(column, {}).get('transform') or (lambda x: x)
+        getters.append((headers.index(column), transf))
+    return lambda fields: tuple([transf(fields[idx]) for idx, transf in getters])
+
+
+def generate_hashes(fd, headers, table):
+    """Generate blocks of rows with the primary key and the hash of each line.
+
+    :param fd: a file descriptor for the .tsv.gz file
+    :type fd: :class:`_io.TextIOWrapper`
+    :param headers: headers in the file
+    :type headers: list
+    :param table: the table of the hashes
+    :type table: :class:`sqlalchemy.Table`
+    :returns: block of data to insert
+    :rtype: list
+    """
+    data = []
+    headers_len = len(headers)
+    table_name = table.info['dataset']
+    key_columns = PRIMARY_KEYS[table_name]
+    get_key = key_function(table_name, headers)
+    for line in fd:
+        line = line.strip()
+        s_line = line.decode('utf-8').split('\t')
+        if len(s_line) != headers_len:
+            continue
+        info = dict(zip(key_columns, get_key(s_line)))
+        info['row_hash'] = int.from_bytes(hashlib.md5(line).digest()[:8], 'big', signed=True)
+        data.append(info)
+        if len(data) >= BLOCK_SIZE:
+            yield data
+            data = []
+    if data:
+        yield data
+
+
+def create_indexes(table, connection):
+    """Create the indexes of a table (with the same names SQLAlchemy uses for
+    columns with index=True) and update the statistics of the table.
+
+    :param table: the table to index
+    :type table: :class:`sqlalchemy.Table`
+    :param connection: connection to the database
+    :type connection: :class:`sqlalchemy.engine.base.Connection`
+    """
+    for column, conf in DB_TRANSFORM.get(table.info.get('dataset', table.name), {}).items():
+        if not conf.get('index') or column not in table.c:
+            continue
+        logging.debug('creating index on %s.%s' % (table.name, column))
+        index = sqlalchemy.Index('ix_%s_%s' % (table.name, column), table.c[column])
+        index.create(connection)
+    dialect = connection.dialect.name
+    quoted_table = connection.dialect.identifier_preparer.quote(table.name)
+    if dialect == 'postgresql':
+        # VACUUM can't run inside a transaction.
+        connection.execution_options(isolation_level='AUTOCOMMIT').execute('VACUUM ANALYZE %s' % quoted_table)
+    elif dialect == 'mysql':
+        connection.execute('ANALYZE TABLE %s' % quoted_table)
+    elif dialect == 'sqlite':
+        connection.execute('ANALYZE %s' % quoted_table)
+
+
+def vacuum(engine):
+    """Reclaim the space left by the dropped tables, where that's not done by create_indexes.
+
+    :param engine: SQLAlchemy engine
+    :type engine: :class:`sqlalchemy.engine.base.Engine`
+    """
+    if engine.dialect.name == 'sqlite':
+        logging.debug('vacuuming the database')
+        engine.execute('VACUUM')
+
+
+def search_sources(connection, kind):
+    """Return the queries of the ids and the texts to index for searches, from the tables that exist.
+
+    :param connection: connection to the database
+    :type connection: :class:`sqlalchemy.engine.base.Connection`
+    :param kind: 'title' or 'name'
+    :type kind: str
+    :returns: list of (query, id column) tuples; the queries have 'id' and 'text' columns
+    :rtype: list
+    """
+    selects = []
+    for table_name, id_column, text_column in SEARCH_SOURCES[kind]:
+        if not connection.dialect.has_table(connection, table_name):
+            continue
+        table = sqlalchemy.Table(table_name, sqlalchemy.MetaData(), sqlalchemy.Column(id_column, sqlalchemy.Integer),
+                                 sqlalchemy.Column(text_column, sqlalchemy.UnicodeText))
+        selects.append((sqlalchemy.select([table.c[id_column].label('id'), table.c[text_column].label('text')])
+                        .where(table.c[text_column].isnot(None)), table.c[id_column]))
+    return selects
+
+
+def create_search_index(engine, kind):
+    """Build the index used to search titles or names: a FTS5 table with the
+    trigram tokenizer with SQLite, a table with a pg_trgm index with PostgreSQL
+    and, if they are not available, a table with the trigrams of every text.
+
+    The index is built in new tables, swapped with the current ones at the end,
+    so that the searches keep working in the meantime.
+
+    :param engine: SQLAlchemy engine
+    :type engine: :class:`sqlalchemy.engine.base.Engine`
+    :param kind: 'title' or 'name'
+    :type kind: str
+    """
+    connection = engine.connect()
+    selects = search_sources(connection, kind)
+    if not selects:
+        connection.close()
+        return
+    sources = sqlalchemy.union(*[select for select, id_column in selects]).alias('sources')
+    preparer = connection.dialect.identifier_preparer
+    search_name = '%s_search' % kind
+    trigrams_name = '%s_trigrams' % kind
+    counts_name = '%s_trigram_counts' % kind
+    stamp = int(time.time())
+    new_names = dict((name, '%s_%d' % (name, stamp)) for name in (search_name, trigrams_name, counts_name))
+    # Leftovers of an interrupted import.
+    for table_name in new_names.values():
+        connection.execute('DROP TABLE IF EXISTS %s' % preparer.quote(table_name))
+    dialect = connection.dialect.name
+    logging.info('creating the %s search index' % kind)
+    built = None
+    try:
+        if dialect == 'sqlite':
+            connection.execute("CREATE VIRTUAL TABLE %s USING fts5(text, id UNINDEXED, tokenize='trigram')" %
+                               preparer.quote(new_names[search_name]))
+            search = sqlalchemy.Table(new_names[search_name], sqlalchemy.MetaData(), sqlalchemy.Column('text'),
+                                      sqlalchemy.Column('id'))
+            with connection.begin():
+                connection.execute(search.insert().from_select(
+                    ['text', 'id'], sqlalchemy.select([sources.c.text, sources.c.id])))
+            built = [search_name]
+        elif dialect == 'postgresql':
+            search = sqlalchemy.Table(new_names[search_name], sqlalchemy.MetaData(),
+                                      sqlalchemy.Column('id', sqlalchemy.Integer),
+                                      sqlalchemy.Column('text', sqlalchemy.UnicodeText))
+            with connection.begin():
+                connection.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                search.create(connection)
+                connection.execute(search.insert().from_select(
+                    ['id', 'text'], sqlalchemy.select([sources.c.id, sqlalchemy.func.lower(sources.c.text)])))
+                connection.execute('CREATE INDEX %s ON %s USING gin (text gin_trgm_ops)' % (
+                    preparer.quote('ix_%s_text' % search.name), preparer.quote(search.name)))
+            connection.execution_options(isolation_level='AUTOCOMMIT').execute(
+                'VACUUM ANALYZE %s' % preparer.quote(search.name))
+            built = [search_name]
+    except sqlalchemy.exc.SQLAlchemyError as e:
+        logging.warning('unable to create the %s search index with %s, using a table of trigrams: %s' % (
+            kind, dialect, e))
+        connection.execute('DROP TABLE IF EXISTS %s' % preparer.quote(new_names[search_name]))
+    if built is None:
+        build_trigrams_index(connection, selects, sources, new_names[trigrams_name], new_names[counts_name])
+        built = [trigrams_name, counts_name]
+    meta = sqlalchemy.MetaData()
+    swap_tables(connection, [(sqlalchemy.Table(new_names[name], meta), sqlalchemy.Table(name, meta))
+                             for name in built])
+    # The tables of the other kind of index, e.g. built by a previous import with another database.
+    for table_name in search_name, trigrams_name, counts_name:
+        if table_name not in built:
+            connection.execute('DROP TABLE IF EXISTS %s' % preparer.quote(table_name))
+    connection.close()
+
+
+def build_trigrams_index(connection, selects, sources, trigrams_name, counts_name):
+    """Build a table with the trigrams of every text, and a table with the
+    number of ids of each trigram: only the least common ones are searched.
+
+    :param connection: connection to the database
+    :type connection: :class:`sqlalchemy.engine.base.Connection`
+    :param selects: the queries of the ids and the texts, with their id columns (see search_sources)
+    :type selects: list
+    :param sources: the union of the queries
+    :type sources: :class:`sqlalchemy.sql.expression.Alias`
+    :param trigrams_name: name of the table of the trigrams
+    :type trigrams_name: str
+    :param counts_name: name of the table of the number of ids of each trigram
+    :type counts_name: str
+    """
+    meta = sqlalchemy.MetaData()
+    table = sqlalchemy.Table(trigrams_name, meta,
+                             sqlalchemy.Column('trigram', sqlalchemy.Unicode(3)),
+                             sqlalchemy.Column('id', sqlalchemy.Integer))
+    counts = sqlalchemy.Table(counts_name, meta,
+                              sqlalchemy.Column('trigram', sqlalchemy.Unicode(3), primary_key=True),
+                              sqlalchemy.Column('docs', sqlalchemy.Integer))
+    meta.create_all(connection)
+    first_id, last_id = connection.execute(sqlalchemy.select([sqlalchemy.func.min(sources.c.id),
+                                                              sqlalchemy.func.max(sources.c.id)])).fetchone()
+    if first_id is None:
+        first_id, last_id = 0, -1
+    trigram_docs = {}
+
+    def blocks():
+        # Read the texts of a range of ids at a time (using the indexes of the
+        # tables), to limit the used memory.
+        for start in range(first_id, last_id + 1, BLOCK_SIZE):
+            ids_trigrams = {}
+            for select, id_column in selects:
+                for id_, text in connection.execute(select.where(id_column.between(start, start + BLOCK_SIZE - 1))):
+                    ids_trigrams.setdefault(id_, set()).update(trigrams(text))
+            block = []
+            for id_, id_trigrams in ids_trigrams.items():
+                for trigram in id_trigrams:
+                    block.append({'trigram': trigram, 'id': id_})
+                    trigram_docs[trigram] = trigram_docs.get(trigram, 0) + 1
+            if block:
+                yield block
+    store_blocks(connection, table, blocks())
+    sqlalchemy.Index('ix_%s_trigram' % trigrams_name, table.c.trigram).create(connection)
+    store_blocks(connection, counts, [[{'trigram': trigram, 'docs': docs} for trigram, docs in trigram_docs.items()]])
+
+
+def finish_import(engine, incremental=False):
+    """Create the search indexes, vacuum the database and record the import.
+
+    :param engine: SQLAlchemy engine
+    :type engine: :class:`sqlalchemy.engine.base.Engine`
+    :param incremental: the database was updated incrementally, while in use: it's
+                        not vacuumed, since that would lock (and rewrite) the whole database
+    :type incremental: bool
+    """
+    for kind in SEARCH_SOURCES:
+        create_search_index(engine, kind)
+    if not incremental:
+        vacuum(engine)
+    record_import(engine)
+
+
+def record_import(engine):
+    """Record the end of an import, so that the readers drop their caches.
+
+    :param engine: SQLAlchemy engine
+    :type engine: :class:`sqlalchemy.engine.base.Engine`
+    """
+    imports = imports_table(sqlalchemy.MetaData())
+    imports.create(engine, checkfirst=True)
+    engine.execute(imports.insert(), imported=datetime.datetime.now())
+
+
+@contextmanager
+def open_tsv(fn):
+    """Open a .tsv.gz file, using isal if available.
+
+    :param fn: the .tsv.gz file
+    :type fn: str
+    :returns: the compressed file (its position tells the progress) and the decompressed one
+    :rtype: tuple
+    """
+    with open(fn, 'rb', buffering=READ_BUFFER_SIZE) as raw_file:
+        gz_file = (igzip or gzip).open(raw_file, 'rb')
+        with io.BufferedReader(gz_file, buffer_size=READ_BUFFER_SIZE) as tsv_file:
+            yield raw_file, tsv_file
+
+
+def read_headers(fn):
+    """Read the headers of a .tsv.gz file.
+
+    :param fn: the .tsv.gz file
+    :type fn: str
+    :returns: headers in the file
+    :rtype: list
+    """
+    with open_tsv(fn) as (raw_file, tsv_file):
+        headers = tsv_file.readline().decode('utf-8').strip().split('\t')
+    logging.debug('headers of file %s: %s' % (fn, ','.join(headers)))
+    return headers
+
+
+def create_table(fn):
+    """Create the (empty) table for a .tsv.gz file, dropping the old one.
+
+    :param fn: the .tsv.gz file
+    :type fn: str
+    :returns: the table and the headers in the file
+    :rtype: tuple
+    """
+    headers = read_headers(fn)
+    table = build_table(os.path.basename(fn), headers)
+    try:
+        table.drop()
+        logging.debug('table %s dropped' % table.name)
+    except:
+        pass
+    # The hashes of a previous incremental import no longer match the data.
+    if table.name in PRIMARY_KEYS:
+        build_hashes_table(table.name, sqlalchemy.MetaData()).drop(metadata.bind, checkfirst=True)
+    metadata.create_all(tables=[table])
+    return table, headers
+
+
+def load_file(fn, connection, table, headers, progress=False, row_filter=None):
+    """Write the content of a .tsv.gz file into its table.
+
+    :param fn: the .tsv.gz file
+    :type fn: str
+    :param connection: connection to the database
+    :type connection: :class:`sqlalchemy.engine.base.Connection`
+    :param table: the table that will populated
+    :type table: :class:`sqlalchemy.Table`
+    :param headers: headers in the file
+    :type headers: list
+    :param progress: show a progress bar (if tqdm is installed)
+    :type progress: bool
+    :param row_filter: if set, only the lines for which it returns True are read
+    :type row_filter: function
+    :returns: number of written entries
+    :rtype: int
+    """
+    return write_blocks(fn, connection, table, progress=progress,
+                        generate=lambda fd: generate_content(fd, headers, table, row_filter=row_filter))
+
+
+def write_blocks(fn, connection, table, generate, progress=False):
+    """Write the blocks of rows generated from a .tsv.gz file into a table.
+
+    :param fn: the .tsv.gz file
+    :type fn: str
+    :param connection: connection to the database
+    :type connection: :class:`sqlalchemy.engine.base.Connection`
+    :param table: the table that will populated
+    :type table: :class:`sqlalchemy.Table`
+    :param generate: function returning the blocks of rows, from the file descriptor
+    :type generate: function
+    :param progress: show a progress bar (if tqdm is installed)
+    :type progress: bool
+    :returns: number of written entries
+    :rtype: int
+    """
+    progress_bar = None
+    if progress and HAS_TQDM and logger.isEnabledFor(logging.DEBUG):
+        # The progress is measured on the compressed data read so far.
+        progress_bar = tqdm(total=os.path.getsize(fn), unit='B', unit_scale=True, desc=table.name)
+    with open_tsv(fn) as (raw_file, tsv_file):
+        tsv_file.readline()
+
+        def blocks():
+            for block in generate(tsv_file):
+                if progress_bar is not None:
+                    progress_bar.update(raw_file.tell() - progress_bar.n)
+                yield block
+        count = store_blocks(connection, table, blocks())
+    if progress_bar is not None:
+        progress_bar.close()
+    return count
+
+
+def is_unsupported(method, error):
+    """Tell if an error means that a bulk load method can't be used at all
+    (e.g.: LOAD DATA LOCAL INFILE disabled on the server or on the client),
+    rather than that a block of data can't be written.
+
+    :param method: the name of the method (see bulk_loader)
+    :type method: str
+    :param error: the exception raised by the method
+    :type error: Exception
+    :returns: True if the method is not supported
+    :rtype: bool
+    """
+    if any(cls.__name__ == 'NotSupportedError' for cls in type(error).__mro__):
+        return True
+    args = getattr(error, 'args', ())
+    return method == 'load data' and bool(args) and args[0] in MYSQL_LOCAL_INFILE_ERRORS
+
+
+def store_blocks(connection, table, blocks):
+    """Write blocks of rows into a table, with the fastest method available.
+
+    :param connection: connection to the database
+    :type connection: :class:`sqlalchemy.engine.base.Connection`
+    :param table: the table that will populated
+    :type table: :class:`sqlalchemy.Table`
+    :param blocks: the blocks of rows
+    :type blocks: iterable
+    :returns: number of written entries
+    :rtype: int
+    """
+    count = 0
+    insert = table.insert()
+    load_block, method = bulk_loader(connection, table)
+    logging.debug('writing table %s using %s' % (table.name, method))
+    # With SQLite the whole table is written in a single transaction; the journal
+    # is kept in memory, since it's needed to remove the rows of a failed block.
+    transaction = None
+    if method == 'executemany':
+        connection.execute('PRAGMA journal_mode=MEMORY')
+        connection.execute('PRAGMA synchronous=OFF')
+        transaction = connection.begin()
+    try:
+        for block in blocks:
+            try:
+                if transaction is not None:
+                    load_block(block)
+                else:
+                    with connection.begin():
+                        load_block(block)
+            except Exception as e:
+                if method in ('insert', 'executemany') or not is_unsupported(method, e):
+                    logging.error('error processing data: %d entries lost: %s' % (len(block), e))
+                    continue
+                # Fall back to plain INSERT statements.
+                logging.warning('unable to use %s on table %s: %s' % (method, table.name, e))
+                load_block, method = lambda block: connection.execute(insert, block), 'insert'
+                try:
+                    with connection.begin():
+                        load_block(block)
+                except Exception as e:
+                    logging.error('error processing data: %d entries lost: %s' % (len(block), e))
+                    continue
+            count += len(block)
+    except Exception as e:
+        logging.error('error processing data on table %s: %s' % (table.name, e))
+    if transaction is not None:
+        transaction.commit()
+    return count
 
 
 def import_file(fn, engine):
@@ -128,58 +738,350 @@ def import_file(fn, engine):
     """
     logging.info('begin processing file %s' % fn)
     connection = engine.connect()
-    count = 0
-    nr_of_lines = 0
-    fn_basename = os.path.basename(fn)
-    with gzip.GzipFile(fn, 'rb') as gz_file:
-        gz_file.readline()
-        for line in gz_file:
-            nr_of_lines += 1
-    with gzip.GzipFile(fn, 'rb') as gz_file:
-        headers = gz_file.readline().decode('utf-8').strip().split('\t')
-        logging.debug('headers of file %s: %s' % (fn, ','.join(headers)))
-        table = build_table(fn_basename, headers)
-        try:
-            table.drop()
-            logging.debug('table %s dropped' % table.name)
-        except:
-            pass
-        insert = table.insert()
-        metadata.create_all(tables=[table])
-        if HAS_TQDM and logger.isEnabledFor(logging.DEBUG):
-            tqdm_ = tqdm
-        else:
-            tqdm_ = lambda it, **kwargs: it
+    table, headers = create_table(fn)
+    count = load_file(fn, connection, table, headers, progress=True)
+    create_indexes(table, connection)
+    connection.close()
+    logging.info('processed file %s: %d entries' % (fn, count))
+
+
+def swap_tables(connection, tables):
+    """Replace some tables with new ones, in a single transaction where possible.
+
+    :param connection: connection to the database
+    :type connection: :class:`sqlalchemy.engine.base.Connection`
+    :param tables: pairs of (new table, replaced table)
+    :type tables: list
+    """
+    preparer = connection.dialect.identifier_preparer
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        # RENAME TABLE is atomic, but DDL statements can't be part of a transaction.
+        renames = []
+        dropped = []
+        for new_table, table in tables:
+            if table.exists(connection):
+                old_name = '%s_old' % new_table.name
+                renames.append('%s TO %s' % (preparer.quote(table.name), preparer.quote(old_name)))
+                dropped.append(preparer.quote(old_name))
+            renames.append('%s TO %s' % (preparer.quote(new_table.name), preparer.quote(table.name)))
+        connection.execute('RENAME TABLE %s' % ', '.join(renames))
+        for old_name in dropped:
+            connection.execute('DROP TABLE %s' % old_name)
+        return
+    raw_connection = connection.connection
+    cursor = raw_connection.cursor()
+    try:
+        if dialect == 'sqlite':
+            # With the journal in memory (see store_blocks) the swap would not survive a crash.
+            cursor.execute('PRAGMA journal_mode')
+            if cursor.fetchone()[0].lower() in ('off', 'memory'):
+                cursor.execute('PRAGMA journal_mode=DELETE')
+            cursor.execute('PRAGMA synchronous=FULL')
+            # Otherwise the DDL statements would be executed outside of a transaction.
+            cursor.execute('BEGIN')
+        for new_table, table in tables:
+            cursor.execute('DROP TABLE IF EXISTS %s' % preparer.quote(table.name))
+            cursor.execute('ALTER TABLE %s RENAME TO %s' % (preparer.quote(new_table.name),
+                                                            preparer.quote(table.name)))
+        raw_connection.commit()
+    except:
+        raw_connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def update_file(fn, engine):
+    """Incrementally update the table of a .tsv.gz file: the rows are
+    compared with the hashes stored by the previous import, and only the
+    new or changed rows are parsed and written.
+
+    The updated table is built aside and swapped with the current one at the end,
+    so that the database can be used in the meantime.
+
+    :param fn: the .tsv.gz file
+    :type fn: str
+    :param engine: SQLAlchemy engine
+    :type engine: :class:`sqlalchemy.engine.base.Engine`
+    :returns: number of written entries
+    :rtype: int
+    """
+    logging.info('begin updating file %s' % fn)
+    connection = engine.connect()
+    headers = read_headers(fn)
+    meta = sqlalchemy.MetaData()
+    table = build_table(os.path.basename(fn), headers, meta=meta)
+    table_name = table.name
+    if table_name not in PRIMARY_KEYS:
+        connection.close()
+        logging.warning('unable to update file %s incrementally: unknown table %s' % (fn, table_name))
+        import_file(fn, engine)
+        return
+    stamp = int(time.time())
+    new_table = build_table(os.path.basename(fn), headers, meta=meta, name='%s_%d' % (table_name, stamp))
+    hashes = build_hashes_table(table_name, meta)
+    new_hashes = build_hashes_table(table_name, meta, name='%s_%d' % (hashes.name, stamp))
+    key_columns = PRIMARY_KEYS[table_name]
+    # Leftovers of an interrupted update.
+    for t in (new_table, new_hashes):
+        t.drop(connection, checkfirst=True)
+        t.create(connection)
+    write_blocks(fn, connection, new_hashes, generate=lambda fd: generate_hashes(fd, headers, new_hashes))
+    sqlalchemy.Index('ix_%s_key' % new_hashes.name, *[new_hashes.c[c] for c in key_columns]).create(connection)
+    row_filter = None
+    if table.exists(connection) and hashes.exists(connection):
+        same_key = [new_hashes.c[c] == hashes.c[c] for c in key_columns]
+        # Copy the rows that didn't change.
+        unchanged = sqlalchemy.exists().where(sqlalchemy.and_(
+            new_hashes.c.row_hash == hashes.c.row_hash,
+            *([new_hashes.c[c] == table.c[c] for c in key_columns] + same_key)))
+        common_columns = [c.name for c in new_table.c if c.name in table.c]
+        connection.execute(new_table.insert().from_select(
+            common_columns, sqlalchemy.select([table.c[c] for c in common_columns]).where(unchanged)))
+        # Only the new or changed rows are read from the file.
+        changed = sqlalchemy.select([new_hashes.c[c] for c in key_columns]).select_from(
+            new_hashes.outerjoin(hashes, sqlalchemy.and_(*same_key))).where(sqlalchemy.or_(
+                hashes.c.row_hash.is_(None), hashes.c.row_hash != new_hashes.c.row_hash))
+        changed_keys = set(tuple(row) for row in connection.execute(changed))
+        logging.info('updating file %s: %d new or changed entries' % (fn, len(changed_keys)))
+        get_key = key_function(table_name, headers)
+        row_filter = lambda fields: get_key(fields) in changed_keys
+    else:
+        logging.info('updating file %s: no previous hashes, reading every entry' % fn)
+    count = load_file(fn, connection, new_table, headers, progress=True, row_filter=row_filter)
+    create_indexes(new_table, connection)
+    # The tables were loaded with the safety checks disabled (see store_blocks):
+    # they are swapped on a new connection.
+    connection.close()
+    connection = engine.connect()
+    swap_tables(connection, [(new_table, table), (new_hashes, hashes)])
+    connection.close()
+    logging.info('updated file %s: %d entries written' % (fn, count))
+    return count
+
+
+def worker_engine(db_url):
+    """Create the engine of a worker process.
+
+    :param db_url: the database URL
+    :type db_url: :class:`sqlalchemy.engine.url.URL`
+    :returns: SQLAlchemy engine
+    :rtype: :class:`sqlalchemy.engine.base.Engine`
+    """
+    connect_args = {}
+    if db_url.get_backend_name() == 'sqlite':
+        # The jobs wait for each other, since SQLite allows a single writer.
+        connect_args['timeout'] = SQLITE_TIMEOUT
+    return sqlalchemy.create_engine(db_url, encoding='utf-8', echo=False, connect_args=connect_args)
+
+
+def init_worker(queues):
+    """Initialize a worker process, with the queues of the blocks of lines
+    of the files in SPLIT_TABLES (they can only be shared when the process
+    is created).
+
+    :param queues: the queue of each split .tsv.gz file
+    :type queues: dict
+    """
+    block_queues.update(queues)
+
+
+def read_blocks(files, queues, jobs):
+    """Read the lines of the files in SPLIT_TABLES, in blocks of BLOCK_SIZE
+    lines put in their queues; each file is decompressed only once, and the
+    blocks are parsed and written by the worker processes. The end of a queue
+    is marked with a None for each worker process.
+
+    :param files: the split .tsv.gz files
+    :type files: list
+    :param queues: the queue of each split .tsv.gz file
+    :type queues: dict
+    :param jobs: number of worker processes
+    :type jobs: int
+    """
+    for fn in files:
+        queue = queues[fn]
         try:
-            for block in generate_content(tqdm_(gz_file, total=nr_of_lines), headers, table):
-                try:
-                    connection.execute(insert, block)
-                except Exception as e:
-                    logging.error('error processing data: %d entries lost: %s' % (len(block), e))
-                    continue
-                count += len(block)
-                percent = count * 100 / nr_of_lines
+            with open_tsv(fn) as (raw_file, tsv_file):
+                tsv_file.readline()
+                while True:
+                    block = list(itertools.islice(tsv_file, BLOCK_SIZE))
+                    if not block:
+                        break
+                    queue.put(block)
         except Exception as e:
-            logging.error('error processing data on table %s: %s' % (table.name, e))
-        logging.info('processed file %s: %d entries' % (fn, count))
+            logging.error('error reading file %s: %s' % (fn, e))
+        for _ in range(jobs):
+            queue.put(None)
+
+
+def queued_lines(queue):
+    """Generate the lines of the blocks of a queue, until its end.
+
+    :param queue: the queue of a split .tsv.gz file
+    :type queue: :class:`multiprocessing.Queue`
+    :returns: a line of the file
+    :rtype: bytes
+    """
+    while True:
+        block = queue.get()
+        if block is None:
+            return
+        for line in block:
+            yield line
+
+
+def import_chunk(task):
+    """Import a .tsv.gz file, in a worker process with its own engine;
+    the table must already exist. For the files in SPLIT_TABLES, only
+    the blocks of lines taken from their queue are imported.
+
+    :param task: the .tsv.gz file and the database URL
+    :type task: tuple
+    :returns: the .tsv.gz file and the number of written entries
+    :rtype: tuple
+    """
+    fn, db_url = task
+    engine = worker_engine(db_url)
+    connection = engine.connect()
+    headers = read_headers(fn)
+    table = build_table(os.path.basename(fn), headers, meta=sqlalchemy.MetaData())
+    if fn in block_queues:
+        logging.debug('begin processing blocks of file %s' % fn)
+        count = store_blocks(connection, table, generate_content(queued_lines(block_queues[fn]), headers, table))
+    else:
+        count = load_file(fn, connection, table, headers)
+    connection.close()
+    engine.dispose()
+    return fn, count
+
 
+def update_task(task):
+    """Incrementally update the table of a .tsv.gz file, in a worker process
+    with its own engine.
+
+    :param task: the .tsv.gz file and the database URL
+    :type task: tuple
+    :returns: the .tsv.gz file
+    :rtype: str
+    """
+    fn, db_url = task
+    engine = worker_engine(db_url)
+    update_file(fn, engine)
+    engine.dispose()
+    return fn
 
-def import_dir(dir_name, engine, cleanup=False):
+
+def index_file(task):
+    """Create the indexes of the table of a .tsv.gz file, in a worker process
+    with its own engine.
+
+    :param task: the .tsv.gz file and the database URL
+    :type task: tuple
+    :returns: the .tsv.gz file
+    :rtype: str
+    """
+    fn, db_url = task
+    engine = worker_engine(db_url)
+    connection = engine.connect()
+    table = build_table(os.path.basename(fn), read_headers(fn), meta=sqlalchemy.MetaData())
+    create_indexes(table, connection)
+    connection.close()
+    engine.dispose()
+    return fn
+
+
+def import_dir(dir_name, engine, cleanup=False, jobs=1, incremental=False):
     """Import data from a series of .tsv.gz files.
 
     :param dir_name: directory containing the .tsv.gz files
     :type dir_name: str
     :param engine: SQLAlchemy engine
     :type engine: :class:`sqlalchemy.engine.base.Engine`
+    :param cleanup: remove the files once imported
+    :type cleanup: bool
+    :param jobs: number of worker processes; the files in SPLIT_TABLES
+                 are read once, and their lines are shared by every process
+    :type jobs: int
+    :param incremental: only write the rows that changed since the previous (incremental) import
+    :type incremental: bool
     """
+    files = []
     for fn in glob.glob(os.path.join(dir_name, '*%s' % TSV_EXT)):
         if not os.path.isfile(fn):
             logging.debug('skipping file %s' % fn)
             continue
-        import_file(fn, engine)
-        if cleanup:
-            logging.debug('Removing file %s' % fn)
-            os.remove(fn)
+        files.append(fn)
+    if incremental and jobs > 1:
+        files.sort(key=os.path.getsize, reverse=True)
+        engine.dispose()
+        pool = multiprocessing.Pool(jobs)
+        try:
+            for fn in pool.imap_unordered(update_task, [(fn, engine.url) for fn in files]):
+                if cleanup:
+                    logging.debug('Removing file %s' % fn)
+                    os.remove(fn)
+        finally:
+            pool.close()
+            pool.join()
+        finish_import(engine, incremental=True)
+        return
+    if jobs <= 1:
+        for fn in files:
+            if incremental:
+                update_file(fn, engine)
+            else:
+                import_file(fn, engine)
+            if cleanup:
+                logging.debug('Removing file %s' % fn)
+                os.remove(fn)
+        finish_import(engine, incremental=incremental)
+        return
+    # The biggest files are imported first.
+    files.sort(key=os.path.getsize, reverse=True)
+    tasks = []
+    pending = {}
+    counts = {}
+    queues = {}
+    for fn in files:
+        table, headers = create_table(fn)
+        chunks = 1
+        if table.name in SPLIT_TABLES:
+            chunks = jobs
+            queues[fn] = multiprocessing.Queue(QUEUED_BLOCKS * jobs)
+        tasks.extend((fn, engine.url) for chunk in range(chunks))
+        pending[fn] = chunks
+        counts[fn] = 0
+        logging.info('begin processing file %s (%d chunks)' % (fn, chunks))
+    # The connections can't be shared with the worker processes.
+    engine.dispose()
+    pool = multiprocessing.Pool(jobs, initializer=init_worker, initargs=(queues,))
+    # The split files are read by the main process, in the same order of the tasks.
+    reader = threading.Thread(target=read_blocks, args=([fn for fn in files if fn in queues], queues, jobs))
+    reader.daemon = True
+    reader.start()
+    indexing = []
+    try:
+        for fn, count in pool.imap_unordered(import_chunk, tasks):
+            counts[fn] += count
+            pending[fn] -= 1
+            if pending[fn]:
+                logging.info('processing file %s: %d entries, %d chunks left' % (fn, counts[fn], pending[fn]))
+                continue
+            logging.info('processed file %s: %d entries; creating indexes' % (fn, counts[fn]))
+            # The indexes of a table are created while the other tables are still loaded.
+            indexing.append(pool.apply_async(index_file, ((fn, engine.url),)))
+        for result in indexing:
+            fn = result.get()
+            logging.info('created indexes for file %s' % fn)
+            if cleanup:
+                logging.debug('Removing file %s' % fn)
+                os.remove(fn)
+    finally:
+        pool.close()
+        pool.join()
+    finish_import(engine)
 
  
 if __name__ == '__main__':
@@ -188,6 +1090,10 @@ if __name__ == '__main__':
     parser.add_argument('db_uri')
     parser.add_argument('--verbose', help='increase verbosity and show progress', action='store_true')
     parser.add_argument('--cleanup', help='Remove files after they\'re imported', action='store_true')
+    parser.add_argument('--jobs', help='number of files (or chunks of the biggest files) imported in parallel',
+                        type=int, default=1)
+    parser.add_argument('--incremental', help='only write the entries that changed since the previous '
+                        'incremental import', action='store_true')
     args = parser.parse_args()
     dir_name = args.tsv_files_dir
     db_uri = args.db_uri
@@ -196,5 +1102,5 @@ if __name__ == '__main__':
     cleanup = args.cleanup
     engine = sqlalchemy.create_engine(db_uri, encoding='utf-8', echo=False)
     metadata.bind = engine
-    import_dir(dir_name, engine, cleanup)
+    import_dir(dir_name, engine, cleanup, jobs=args.jobs, incremental=args.incremental)
 
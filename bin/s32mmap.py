@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+s32mmap.py script.
+
+This script compiles the s3 dataset distributed by IMDb into a binary file,
+read through a memory map by the "s3mmap" access system.
+
+Copyright 2026 Davide Alberani <da@erlug.linux.it>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+import argparse
+import logging
+import time
+
+from imdb.parser.s3mmap.store import compile_dataset
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('tsv_files_dir')
+    parser.add_argument('file_name', help='the binary file to write')
+    parser.add_argument('--verbose', help='increase verbosity', action='store_true')
+    args = parser.parse_args()
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+    t0 = time.time()
+    compile_dataset(args.tsv_files_dir, args.file_name)
+    logging.info('compiled %s in %d seconds' % (args.file_name, time.time() - t0))
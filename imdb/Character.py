@@ -24,7 +24,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from copy import deepcopy
 
 from imdb._exceptions import IMDbParserError
-from imdb.utils import _Container, analyze_name, build_name, cmpPeople, flatten
+from imdb.utils import _Container, analyze_name, build_name, cmpPeople, nameSortKey
 
 
 class Character(_Container):
@@ -39,6 +39,8 @@ class Character(_Container):
     are defined (as "also known as" for the "akas" key);
     see the keys_alias dictionary.
     """
+    __slots__ = ('characterID', 'myName')
+
     # The default sets of information retrieved.
     default_info = ('main', 'filmography', 'biography')
 
@@ -61,6 +63,9 @@ class Character(_Container):
     keys_tomodify_list = ('biography', 'quotes')
 
     cmpFunct = cmpPeople
+    sortKeyFunct = nameSortKey
+
+    _computed_keys = frozenset(['long imdb name'])
 
     def _init(self, **kwds):
         """Initialize a Character object.
@@ -93,6 +98,7 @@ class Character(_Container):
         try:
             d = analyze_name(name)
             self.data.update(d)
+            self._clear_cache()
         except IMDbParserError:
             pass
 
@@ -128,13 +134,9 @@ class Character(_Container):
         from .Movie import Movie
         from .Person import Person
         if isinstance(item, Person):
-            for m in flatten(self.data, yieldDictKeys=True, scalar=Movie):
-                if item.isSame(m.currentRole):
-                    return True
+            return self._contains(item, roleOf='Movie')
         elif isinstance(item, Movie):
-            for m in flatten(self.data, yieldDictKeys=True, scalar=Movie):
-                if item.isSame(m):
-                    return True
+            return self._contains(item)
         elif isinstance(item, str):
             return item in self.data
         return False
@@ -23,7 +23,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from copy import deepcopy
 
-from imdb.utils import _Container, analyze_company_name, build_company_name, cmpCompanies, flatten
+from imdb.utils import _Container, analyze_company_name, build_company_name, cmpCompanies, companySortKey
 
 
 class Company(_Container):
@@ -38,6 +38,8 @@ class Company(_Container):
     are defined (as "also known as" for the "akas" key);
     see the keys_alias dictionary.
     """
+    __slots__ = ('companyID', 'myName')
+
     # The default sets of information retrieved.
     default_info = ('main',)
 
@@ -56,6 +58,9 @@ class Company(_Container):
     keys_tomodify_list = ()
 
     cmpFunct = cmpCompanies
+    sortKeyFunct = companySortKey
+
+    _computed_keys = frozenset(['long imdb name'])
 
     def _init(self, **kwds):
         """Initialize a company object.
@@ -98,6 +103,7 @@ class Company(_Container):
             name = oname
         d = analyze_company_name(name)
         self.data.update(d)
+        self._clear_cache()
         if notes and not self.notes:
             self.notes = notes
 
@@ -128,9 +134,7 @@ class Company(_Container):
         """Return true if this company and the given Movie are related."""
         from .Movie import Movie
         if isinstance(item, Movie):
-            for m in flatten(self.data, yieldDictKeys=True, scalar=Movie):
-                if item.isSame(m):
-                    return True
+            return self._contains(item)
         elif isinstance(item, str):
             return item in self.data
         return False
@@ -24,7 +24,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from copy import deepcopy
 
 from imdb import linguistics
-from imdb.utils import _Container, analyze_title, build_title, canonicalTitle, cmpMovies, flatten
+from imdb.utils import _Container, analyze_title, build_title, canonicalTitle, cmpMovies, movieSortKey
 
 
 class Movie(_Container):
@@ -39,6 +39,8 @@ class Movie(_Container):
     are defined (as "casting" for the "casting director" key); see
     the keys_alias dictionary.
     """
+    __slots__ = ('movieID', 'myTitle')
+
     # The default sets of information retrieved.
     default_info = ('main', 'plot')
 
@@ -85,6 +87,18 @@ class Movie(_Container):
     _image_key = 'cover url'
 
     cmpFunct = cmpMovies
+    sortKeyFunct = movieSortKey
+
+    _computed_keys = frozenset([
+        'long imdb title', 'canonical title', 'smart canonical title',
+        'long imdb canonical title', 'smart long imdb canonical title',
+        'long imdb episode title', 'series title', 'canonical series title',
+        'smart canonical series title', 'episode title', 'canonical episode title',
+        'smart canonical episode title', 'full-size cover url'
+    ])
+
+    # Used by guessLanguage.
+    _computed_lists = ('languages', 'countries')
 
     def _init(self, **kwds):
         """Initialize a Movie object.
@@ -126,6 +140,7 @@ class Movie(_Container):
         """Set the title of the movie."""
         d_title = analyze_title(title)
         self.data.update(d_title)
+        self._clear_cache()
 
     def _additional_keys(self):
         """Valid keys to append to the data.keys() list."""
@@ -241,21 +256,10 @@ class Movie(_Container):
         from .Character import Character
         from .Company import Company
         from .Person import Person
-        if isinstance(item, Person):
-            for p in flatten(self.data, yieldDictKeys=True, scalar=Person,
-                             toDescend=(list, dict, tuple, Movie)):
-                if item.isSame(p):
-                    return True
+        if isinstance(item, (Person, Company)):
+            return self._contains(item)
         elif isinstance(item, Character):
-            for p in flatten(self.data, yieldDictKeys=True, scalar=Person,
-                             toDescend=(list, dict, tuple, Movie)):
-                if item.isSame(p.currentRole):
-                    return True
-        elif isinstance(item, Company):
-            for c in flatten(self.data, yieldDictKeys=True, scalar=Company,
-                             toDescend=(list, dict, tuple, Movie)):
-                if item.isSame(c):
-                    return True
+            return self._contains(item, roleOf='Person')
         elif isinstance(item, str):
             return item in self.data
         return False
@@ -343,3 +347,7 @@ class Movie(_Container):
                 plot = plot[:i]
             s += 'Plot: %s' % plot
         return s
+
+
+# Movies contain other movies (e.g.: the episodes of a series).
+Movie._contained_descend = (list, dict, tuple, Movie)
@@ -23,7 +23,16 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from copy import deepcopy
 
-from imdb.utils import _Container, analyze_name, build_name, canonicalName, cmpPeople, flatten, normalizeName
+from imdb.utils import (
+    _ascKey,
+    _Container,
+    analyze_name,
+    build_name,
+    canonicalName,
+    cmpPeople,
+    nameSortKey,
+    normalizeName
+)
 
 
 class Person(_Container):
@@ -38,6 +47,8 @@ class Person(_Container):
     are defined (as "biography" for the "mini biography" key);
     see the keys_alias dictionary.
     """
+    __slots__ = ('personID', 'myName', 'billingPos')
+
     # The default sets of information retrieved.
     default_info = ('main', 'filmography', 'biography')
 
@@ -97,6 +108,12 @@ class Person(_Container):
     _image_key = 'headshot'
 
     cmpFunct = cmpPeople
+    sortKeyFunct = nameSortKey
+
+    _computed_keys = frozenset([
+        'name', 'canonical name', 'long imdb name', 'long imdb canonical name',
+        'full-size headshot'
+    ])
 
     def _init(self, **kwds):
         """Initialize a Person object.
@@ -144,6 +161,7 @@ class Person(_Container):
         """Set the name of the person."""
         d = analyze_name(name, canonical=False)
         self.data.update(d)
+        self._clear_cache()
 
     def _additional_keys(self):
         """Valid keys to append to the data.keys() list."""
@@ -172,10 +190,20 @@ class Person(_Container):
             return self.data['filmography'][key]
         return None
 
+    def sort_key(self):
+        """Return a tuple that can be used to sort a list of persons,
+        by billingPos, name and imdbIndex."""
+        return (_ascKey(self.billingPos or None),) + _Container.sort_key(self)
+
     def getID(self):
         """Return the personID."""
         return self.personID
 
+    def _same_occurrence(self, other):
+        """Return True if other can be replaced by this object."""
+        return _Container._same_occurrence(self, other) and \
+            self.billingPos == other.billingPos
+
     def __bool__(self):
         """The Person is "false" if the self.data does not contain a name."""
         # XXX: check the name and the personID?
@@ -188,13 +216,9 @@ class Person(_Container):
         from .Movie import Movie
 
         if isinstance(item, Movie):
-            for m in flatten(self.data, yieldDictKeys=True, scalar=Movie):
-                if item.isSame(m):
-                    return True
+            return self._contains(item)
         elif isinstance(item, Character):
-            for m in flatten(self.data, yieldDictKeys=True, scalar=Movie):
-                if item.isSame(m.currentRole):
-                    return True
+            return self._contains(item, roleOf='Movie')
         elif isinstance(item, str):
             return item in self.data
         return False
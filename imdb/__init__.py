@@ -32,13 +32,14 @@ VERSION = __version__
 
 import os
 import sys
+from functools import partial
 from pkgutil import find_loader
 from types import FunctionType, MethodType
 
 from imdb import Character, Company, Movie, Person
 from imdb._exceptions import IMDbDataAccessError, IMDbError
 from imdb._logging import imdbpyLogger as _imdb_logger
-from imdb.utils import build_company_name, build_name, build_title
+from imdb.utils import build_company_name, build_name, build_title, get_identity_map, identity_map
 
 PY2 = sys.hexversion < 0x3000000
 
@@ -197,6 +198,9 @@ def IMDb(accessSystem=None, *arguments, **keywords):
     if accessSystem in ('s3', 's3dataset', 'imdbws'):
         from .parser.s3 import IMDbS3AccessSystem
         return IMDbS3AccessSystem(*arguments, **keywords)
+    elif accessSystem == 's3mmap':
+        from .parser.s3mmap import IMDbS3MmapAccessSystem
+        return IMDbS3MmapAccessSystem(*arguments, **keywords)
     elif accessSystem in ('sql', 'db', 'database'):
         try:
             from .parser.sql import IMDbSqlAccessSystem
@@ -270,6 +274,9 @@ class IMDbBase:
             keywordsResults = 100
         self._keywordsResults = keywordsResults
         self._reraise_exceptions = keywords.get('reraiseExceptions', True)
+        # Whether to delay the parsing of the info sets until they are needed.
+        self._lazy_info = keywords.get('lazyInfo', False)
+        self._identity_map = keywords.get('identityMap', False)
         self.set_imdb_urls(keywords.get('imdbURL_base') or imdbURL_base)
 
     def set_imdb_urls(self, imdbURL_base):
@@ -780,14 +787,91 @@ class IMDbBase:
         # XXX: not really useful...
         return Company.Company(accessSystem=self.accessSystem, *arguments, **keywords)
 
-    def update(self, mop, info=None, override=0):
+    def _call_info_method(self, method, mop, mopID, infoset):
+        """Call the method used to retrieve the given set of information;
+        exceptions are logged and, if requested, re-raised."""
+        try:
+            return method(mopID)
+        except Exception:
+            _imdb_logger.critical(
+                'caught an exception retrieving or parsing "%s" info set'
+                ' for mopID "%s" (accessSystem: %s)',
+                infoset, mopID, mop.accessSystem, exc_info=True
+            )
+            # If requested by the user, reraise the exception.
+            if self._reraise_exceptions:
+                raise
+        return None
+
+    def _store_info(self, mop, infoset, ret, res):
+        """Store in the res dictionary the data returned for the given set
+        of information, and update the info sets and references of mop."""
+        keys = None
+        if 'data' in ret:
+            res.update(ret['data'])
+            if isinstance(ret['data'], dict):
+                keys = list(ret['data'].keys())
+        if 'info sets' in ret:
+            for ri in ret['info sets']:
+                mop.add_to_current_info(ri, keys, mainInfoset=infoset)
+        else:
+            mop.add_to_current_info(infoset, keys)
+        if 'titlesRefs' in ret:
+            mop.update_titlesRefs(ret['titlesRefs'])
+        if 'namesRefs' in ret:
+            mop.update_namesRefs(ret['namesRefs'])
+        if 'charactersRefs' in ret:
+            mop.update_charactersRefs(ret['charactersRefs'])
+
+    def _lazy_loader(self, method, mopID):
+        """Return a function that, called without arguments, returns the
+        same result of method(mopID).
+        By default everything is postponed; access systems able to split
+        the retrieval and the parsing of the data should override it,
+        to retrieve the data immediately."""
+        return lambda: method(mopID)
+
+    def _load_pending_info(self, loader, mopID, infoset, mop):
+        """Parse a lazily retrieved set of information and store it in mop;
+        return False if it can't be parsed (it's not parsed again)."""
+        if self._identity_map and get_identity_map() is None:
+            with identity_map():
+                return self._load_pending_info(loader, mopID, infoset, mop)
+        try:
+            ret = loader() or {}
+        except Exception:
+            _imdb_logger.critical(
+                'caught an exception parsing "%s" info set for mopID "%s"'
+                ' (accessSystem: %s)',
+                infoset, mopID, mop.accessSystem, exc_info=True
+            )
+            if self._reraise_exceptions:
+                raise
+            return False
+        res = {}
+        self._store_info(mop, infoset, ret, res)
+        mop.set_data(res, override=0)
+
+    def update(self, mop, info=None, override=0, lazy=None):
         """Given a Movie, Person, Character or Company object with only
         partial information, retrieve the required set of information.
 
         info is the list of sets of information to retrieve.
 
         If override is set, the information are retrieved and updated
-        even if they're already in the object."""
+        even if they're already in the object.
+
+        If lazy is set, the data are retrieved but parsed only the first
+        time a key is accessed; if None, the lazyInfo argument of the
+        access system is used.
+
+        If the identityMap argument of the access system is set, the
+        objects built for the same movie, person or company are shared
+        (see imdb.utils.IdentityMap) during the call, or during an
+        enclosing imdb.utils.identity_map context."""
+        if self._identity_map and get_identity_map() is None:
+            with identity_map():
+                return self.update(mop, info=info, override=override, lazy=lazy)
         # XXX: should this be a method of the Movie/Person/Character/Company
         #      classes?  NO!  What for instances created by external functions?
         mopID = None
@@ -831,9 +915,11 @@ class IMDbBase:
                 info = self.get_company_infoset()
         if not isinstance(info, (tuple, list)):
             info = (info,)
+        if lazy is None:
+            lazy = self._lazy_info
         res = {}
         for i in info:
-            if i in mop.current_info and not override:
+            if (i in mop.current_info or mop.has_pending_info(i)) and not override:
                 continue
             if not i:
                 continue
@@ -844,34 +930,16 @@ class IMDbBase:
                 _imdb_logger.error('unknown information set "%s"', i)
                 # Keeps going.
                 method = lambda *x: {}
-            try:
-                ret = method(mopID)
-            except Exception:
-                _imdb_logger.critical(
-                    'caught an exception retrieving or parsing "%s" info set'
-                    ' for mopID "%s" (accessSystem: %s)',
-                    i, mopID, mop.accessSystem, exc_info=True
-                )
+            if lazy:
+                loader = self._call_info_method(lambda x: aSystem._lazy_loader(method, x),
+                                                mop, mopID, i)
+                if loader is not None:
+                    mop.add_pending_info(i, partial(self._load_pending_info, loader, mopID, i))
+                    continue
                 ret = {}
-                # If requested by the user, reraise the exception.
-                if self._reraise_exceptions:
-                    raise
-            keys = None
-            if 'data' in ret:
-                res.update(ret['data'])
-                if isinstance(ret['data'], dict):
-                    keys = list(ret['data'].keys())
-            if 'info sets' in ret:
-                for ri in ret['info sets']:
-                    mop.add_to_current_info(ri, keys, mainInfoset=i)
             else:
-                mop.add_to_current_info(i, keys)
-            if 'titlesRefs' in ret:
-                mop.update_titlesRefs(ret['titlesRefs'])
-            if 'namesRefs' in ret:
-                mop.update_namesRefs(ret['namesRefs'])
-            if 'charactersRefs' in ret:
-                mop.update_charactersRefs(ret['charactersRefs'])
+                ret = self._call_info_method(method, mop, mopID, i) or {}
+            self._store_info(mop, i, ret, res)
         mop.set_data(res, override=0)
 
     def update_series_seasons(self, mop, season_nums, override=0):
@@ -918,22 +986,7 @@ class IMDbBase:
             # If requested by the user, reraise the exception.
             if self._reraise_exceptions:
                 raise
-        keys = None
-        if 'data' in ret:
-            res.update(ret['data'])
-            if isinstance(ret['data'], dict):
-                keys = list(ret['data'].keys())
-        if 'info sets' in ret:
-            for ri in ret['info sets']:
-                mop.add_to_current_info(ri, keys, mainInfoset=info)
-        else:
-            mop.add_to_current_info(info, keys)
-        if 'titlesRefs' in ret:
-            mop.update_titlesRefs(ret['titlesRefs'])
-        if 'namesRefs' in ret:
-            mop.update_namesRefs(ret['namesRefs'])
-        if 'charactersRefs' in ret:
-            mop.update_charactersRefs(ret['charactersRefs'])
+        self._store_info(mop, info, ret, res)
         mop.set_data(res, override=0)
 
     def get_imdbMovieID(self, movieID):
@@ -344,15 +344,28 @@ def fullSizeCoverURL(obj):
     return obj.get_fullsizeURL()
 
 
+# Caches for keyToXML and translateKey.
+_keysToXML = {}
+_translatedKeys = {}
+
+
 def keyToXML(key):
     """Return a key (the ones used to access information in Movie and
     other classes instances) converted to the style of the XML output."""
-    return _tagAttr(key, '')[0]
+    try:
+        return _keysToXML[key]
+    except KeyError:
+        tag = _keysToXML[key] = _tagAttr(key, '')[0]
+        return tag
 
 
 def translateKey(key):
     """Translate a given key."""
-    return _(keyToXML(key))
+    try:
+        return _translatedKeys[key]
+    except KeyError:
+        translated = _translatedKeys[key] = _(keyToXML(key))
+        return translated
 
 
 # Maps tags to classes.
@@ -524,7 +537,144 @@ def parseXML(xml):
     """Parse a XML string, returning an appropriate object (usually an
     instance of a subclass of _Container."""
     import lxml.etree
-    return parseTags(lxml.etree.fromstring(xml))
+    return _parseElement(lxml.etree.fromstring(xml), True, None, {}, {})
+
+
+# Child tags of a _Container tag handled before the others, by kind.
+_objectTags = {
+    'movie': ('title',) + _titleTags + ('notes', 'episode-of', 'current-role'),
+    'person': ('name',) + _nameTags + ('notes', 'episode-of', 'current-role'),
+    'character': ('name',) + _nameTags + ('notes', 'episode-of', 'current-role'),
+    'company': ('name',) + _companyTags + ('notes', 'episode-of', 'current-role')
+}
+
+# Child tags of a _Container tag that are not parsed again as keys.
+_consumedTags = frozenset(['title', 'name', 'notes', 'episode-of', 'current-role'])
+
+
+def _parseElement(tag, _topLevel, _as, _infoset2keys, _key2infoset):
+    """Parse an element; it produces the same output of parseTags, but
+    the children are iterated only once and the tree is not modified."""
+    name = tagToKey(tag)
+    children = list(tag)
+    tagStr = (tag.text or '').strip()
+    if not tagStr and name == 'item' and children and children[0].text:
+        # Handles 'item' tags containing text and a 'notes' sub-tag.
+        tagStr = children[0].text.strip()
+    infoset = tag.get('infoset')
+    if infoset:
+        _key2infoset[name] = infoset
+        _infoset2keys.setdefault(infoset, []).append(name)
+    if tag.tag in _MAP_TOP_OBJ:
+        kind = tag.tag
+        item = _MAP_TOP_OBJ[name]()
+        itemAs = tag.get('access-system')
+        if itemAs:
+            if not _as:
+                _as = itemAs
+        else:
+            itemAs = _as
+        item.accessSystem = itemAs
+        setattr(item, '%sID' % kind, tag.get('id'))
+        # The first child with each of the handled tags.
+        found = {}
+        wanted = _objectTags[kind]
+        for child in children:
+            if child.tag in wanted and child.tag not in found:
+                found[child.tag] = child
+        consumed = set()
+        if kind == 'movie':
+            child = found.get('title')
+            if child is not None:
+                item.set_title(child.text)
+        else:
+            child = found.get('name')
+            if child is not None:
+                item.set_name(child.text)
+        if child is not None:
+            consumed.add(child)
+        for t in wanted[1:-3]:
+            if t in item.data:
+                continue
+            dataTag = found.get(t)
+            if dataTag is not None:
+                item.data[tagToKey(dataTag)] = _valueWithType(dataTag, dataTag.text)
+        child = found.get('notes')
+        if child is not None:
+            item.notes = child.text
+            consumed.add(child)
+        child = found.get('episode-of')
+        if child is not None:
+            item.data['episode of'] = _parseElement(child, False, _as, _infoset2keys, _key2infoset)
+            consumed.add(child)
+        child = found.get('current-role')
+        if child is not None:
+            item.currentRole = _parseElement(child, False, _as, _infoset2keys, _key2infoset)
+            consumed.add(child)
+        if not _topLevel:
+            return item
+        data = item.data
+        for child in children:
+            if child in consumed:
+                continue
+            subTagKey = tagToKey(child)
+            # Exclude dinamically generated keys.
+            if subTagKey in item._additional_keys():
+                continue
+            subItem = _parseElement(child, False, _as, _infoset2keys, _key2infoset)
+            if subItem:
+                data[subTagKey] = subItem
+        if name in _MAP_TOP_OBJ:
+            # Add information about 'info sets', but only to the top-level object.
+            item.infoset2keys = _infoset2keys
+            item.key2infoset = _key2infoset
+            item.current_info = list(_infoset2keys.keys())
+        return item
+    if tagStr:
+        for child in children:
+            if child.tag == 'notes':
+                notes = (child.text or '').strip()
+                if notes:
+                    tagStr += '::%s' % notes
+                return tagStr
+        return _valueWithType(tag, tagStr)
+    if not children:
+        return {}
+    if tagToKey(children[0]) in _TAGS_TO_LIST:
+        item = []
+        for child in children:
+            subItem = _parseElement(child, False, _as, _infoset2keys, _key2infoset)
+            if subItem:
+                item.append(subItem)
+    else:
+        item = {}
+        for child in children:
+            subItem = _parseElement(child, False, _as, _infoset2keys, _key2infoset)
+            if subItem:
+                item[tagToKey(child)] = subItem
+    return item
+
+
+def iterparseXML(source):
+    """Parse a XML file (a file name or a binary file object) containing
+    a Movie, Person, Character or Company object (like the output of
+    asXML), or many of them enclosed in a root tag, yielding the objects
+    one at a time; the parsed elements are discarded, so that the used
+    memory doesn't depend on the number of objects."""
+    import lxml.etree
+    for event, elem in lxml.etree.iterparse(source, events=('end',)):
+        if elem.tag not in _MAP_TOP_OBJ:
+            continue
+        parent = elem.getparent()
+        if parent is not None and (parent.tag in _MAP_TOP_OBJ or parent.getparent() is not None):
+            continue
+        yield _parseElement(elem, True, None, {}, {})
+        elem.clear()
+        if parent is not None:
+            # Remove this element (and the text that might precede it).
+            while elem.getprevious() is not None:
+                del parent[0]
+            del parent[0]
 
 
 _re_akas_lang = re.compile('(?:[(])([a-zA-Z]+?)(?: title[)])')
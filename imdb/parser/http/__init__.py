@@ -29,6 +29,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import socket
 import ssl
 import warnings
+import zlib
 from codecs import lookup
 
 from imdb import PY2, IMDbBase
@@ -91,6 +92,12 @@ class _ModuleProxy:
         return getattr(_sm, name)
 
 
+class _PageStored(Exception):
+    """Raised to stop a get_* method as soon as its page was retrieved,
+    so that the parsing can be done later."""
+    pass
+
+
 class _FakeURLOpener(object):
     """Fake URLOpener object, used to return empty strings instead of
     errors.
@@ -289,6 +296,8 @@ class IMDbHTTPAccessSystem(IMDbBase):
         self.urlOpener = IMDbURLopener(*arguments, **keywords)
         self._getRefs = True
         self._mdparse = False
+        # Used to store the compressed pages of lazily parsed info sets.
+        self._pages_store = None
         self.set_timeout(timeout)
         if proxy != -1:
             self.set_proxy(proxy)
@@ -388,12 +397,40 @@ class IMDbHTTPAccessSystem(IMDbBase):
 
     def _retrieve(self, url, size=-1, _noCookies=False):
         """Retrieve the given URL."""
+        store = self._pages_store
+        if store is not None and (url, size) in store[0]:
+            return zlib.decompress(store[0][(url, size)]).decode('utf-8')
         self._http_logger.debug('fetching url %s (size: %d)', url, size)
         ret = self.urlOpener.retrieve_unicode(url, size=size)
         if PY2 and isinstance(ret, str):
             ret = ret.decode('utf-8')
+        if store is not None and store[1]:
+            store[0][(url, size)] = zlib.compress(ret.encode('utf-8'))
+            raise _PageStored()
         return ret
 
+    def _lazy_loader(self, method, mopID):
+        """Retrieve the page of an info set and store it compressed;
+        the returned function parses it (pages that can be known only
+        after the parsing, like other seasons of a series, are retrieved
+        at that time)."""
+        pages = {}
+        self._pages_store = (pages, True)
+        try:
+            method(mopID)
+        except _PageStored:
+            pass
+        finally:
+            self._pages_store = None
+
+        def loader():
+            self._pages_store = (pages, False)
+            try:
+                return method(mopID)
+            finally:
+                self._pages_store = None
+        return loader
+
     def _get_search_content(self, kind, ton, results):
         """Retrieve the web page for a given search.
         kind can be 'tt' (for titles), 'nm' (for names),
@@ -25,14 +25,20 @@ https://piculet.readthedocs.io/
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import io
 import json
+import os
 import re
 import sys
 from argparse import ArgumentParser
 from collections import deque
+from contextlib import contextmanager
 from functools import partial
+from glob import glob
+from multiprocessing import Pool
 from operator import itemgetter
 from pkgutil import find_loader
+from threading import local
 
 __version__ = '1.2b1'
 
@@ -45,29 +51,12 @@ if PY2:
     from cgi import escape as html_escape
     from htmlentitydefs import name2codepoint  # noqa: I003
     from HTMLParser import HTMLParser
-    from StringIO import StringIO
 else:
     from html import escape as html_escape
     from html.parser import HTMLParser
-    from io import StringIO
     from types import MappingProxyType
 
 
-if PY2:
-    from contextlib import contextmanager
-
-    @contextmanager
-    def redirect_stdout(new_stdout):
-        """Context manager for temporarily redirecting stdout."""
-        old_stdout, sys.stdout = sys.stdout, new_stdout
-        try:
-            yield new_stdout
-        finally:
-            sys.stdout = old_stdout
-else:
-    from contextlib import redirect_stdout
-
-
 ###########################################################
 # HTML OPERATIONS
 ###########################################################
@@ -101,6 +90,18 @@ class HTMLNormalizer(HTMLParser):
         self._open_tags = deque()
         self._open_omitted_tags = deque()
 
+        # chunks of the normalized output
+        self._output = []
+        self._write = self._output.append
+
+    def getvalue(self):
+        """Get the normalized content produced so far.
+
+        :sig: () -> str
+        :return: Normalized XHTML content.
+        """
+        return ''.join(self._output)
+
     def handle_starttag(self, tag, attrs):
         if tag in self.omit_tags:
             self._open_omitted_tags.append(tag)
@@ -108,7 +109,7 @@ class HTMLNormalizer(HTMLParser):
             # stack empty -> not in omit mode
             if '@' in tag:
                 # email address in angular brackets
-                print('&lt;%s&gt;' % tag, end='')
+                self._write('&lt;%s&gt;' % tag)
                 return
             if (tag == 'li') and (self._open_tags[-1] == 'li'):
                 self.handle_endtag('li')
@@ -128,7 +129,7 @@ class HTMLNormalizer(HTMLParser):
                 'attrs': (' ' + ' '.join(attributes)) if len(attributes) > 0 else '',
                 'slash': ' /' if tag in self.SELF_CLOSING_TAGS else ''
             }
-            print(line, end='')
+            self._write(line)
             if tag not in self.SELF_CLOSING_TAGS:
                 self._open_tags.append(tag)
 
@@ -141,14 +142,14 @@ class HTMLNormalizer(HTMLParser):
                     self.handle_endtag('li')
                 if tag == last:
                     # expected end tag
-                    print('</%(tag)s>' % {'tag': tag}, end='')
+                    self._write('</%(tag)s>' % {'tag': tag})
                     self._open_tags.pop()
                 elif tag not in self._open_tags:
                     # XXX: for <a><b></a></b>, this case gets invoked after the case below
                     pass
                 elif tag == self._open_tags[-2]:
-                    print('</%(tag)s>' % {'tag': last}, end='')
-                    print('</%(tag)s>' % {'tag': tag}, end='')
+                    self._write('</%(tag)s>' % {'tag': last})
+                    self._write('</%(tag)s>' % {'tag': tag})
                     self._open_tags.pop()
                     self._open_tags.pop()
         elif (tag in self.omit_tags) and (tag == self._open_omitted_tags[-1]):
@@ -159,23 +160,23 @@ class HTMLNormalizer(HTMLParser):
         if not self._open_omitted_tags:
             # stack empty -> not in omit mode
             line = html_escape(data)
-            print(line.decode('utf-8') if PY2 and isinstance(line, bytes) else line, end='')
+            self._write(line.decode('utf-8') if PY2 and isinstance(line, bytes) else line)
 
     def handle_entityref(self, name):
         # XXX: doesn't get called if convert_charrefs=True
         num = name2codepoint.get(name)  # we are sure we're on PY2 here
         if num is not None:
-            print('&#%(ref)d;' % {'ref': num}, end='')
+            self._write('&#%(ref)d;' % {'ref': num})
 
     def handle_charref(self, name):
         # XXX: doesn't get called if convert_charrefs=True
-        print('&#%(ref)s;' % {'ref': name}, end='')
+        self._write('&#%(ref)s;' % {'ref': name})
 
     # def feed(self, data):
         # super().feed(data)
         # # close all remaining open tags
         # for tag in reversed(self._open_tags):
-        #     print('</%(tag)s>' % {'tag': tag}, end='')
+        #     self._write('</%(tag)s>' % {'tag': tag})
 
 
 def html_to_xhtml(document, omit_tags=None, omit_attrs=None):
@@ -187,11 +188,9 @@ def html_to_xhtml(document, omit_tags=None, omit_attrs=None):
     :param omit_attrs: Attributes to exclude from the output.
     :return: Normalized XHTML content.
     """
-    out = StringIO()
     normalizer = HTMLNormalizer(omit_tags=omit_tags, omit_attrs=omit_attrs)
-    with redirect_stdout(out):
-        normalizer.feed(document)
-    return out.getvalue()
+    normalizer.feed(document)
+    return normalizer.getvalue()
 
 
 ###########################################################
@@ -274,6 +273,245 @@ else:
 _EMPTY = {} if PY2 else MappingProxyType({})  # empty result singleton
 
 
+_SIMPLE_SELECTOR = re.compile(r'^//(\*|[\w-]+)((?:\[.*\])?)$')
+
+_PREDICATE_TOKEN = re.compile(r"""\s*(?:
+    (?P<not>not\()
+    |(?P<close>\))
+    |(?P<op>and|or)\b
+    |(?P<func>starts-with|contains)\(\s*@(?P<fattr>[\w:-]+)\s*,\s*(?P<fq>["'])(?P<fvalue>.*?)(?P=fq)\s*\)
+    |@(?P<attr>[\w:-]+)(?:\s*=\s*(?P<q>["'])(?P<value>.*?)(?P=q))?
+)\s*""", re.X)
+
+
+def _split_predicates(predicates):
+    """Split a sequence of XPath predicates like ``[a][b]``.
+
+    :sig: (str) -> Optional[List[str]]
+    :param predicates: Predicates to split.
+    :return: Contents of the predicates, or None if they can't be split.
+    """
+    result = []
+    depth = 0
+    quote = None
+    start = 0
+    for index, char in enumerate(predicates):
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '[':
+            if depth == 0:
+                start = index + 1
+            depth += 1
+        elif char == ']':
+            depth -= 1
+            if depth == 0:
+                result.append(predicates[start:index])
+            elif depth < 0:
+                return None
+        elif depth == 0:
+            return None
+    return result if (depth == 0) and (quote is None) else None
+
+
+def _compile_predicate(predicate):
+    """Compile an XPath predicate on attributes to a Python function.
+
+    Only attribute tests (``@a``, ``@a="v"``, ``starts-with(@a, "v")``,
+    ``contains(@a, "v")``) combined with ``and``, ``or`` and ``not()``
+    are supported.
+
+    :sig: (str) -> Optional[Callable[[Mapping[str, str]], bool]]
+    :param predicate: Content of the predicate, without the brackets.
+    :return: Function testing the attributes of an element,
+        or None if the predicate is not supported.
+    """
+    tokens = []
+    position = 0
+    while position < len(predicate):
+        match = _PREDICATE_TOKEN.match(predicate, position)
+        if (match is None) or (match.end() == position):
+            return None
+        tokens.append(match)
+        position = match.end()
+    tokens.reverse()
+
+    def parse_or():
+        tests = [parse_and()]
+        while tokens and (tokens[-1].group('op') == 'or'):
+            tokens.pop()
+            tests.append(parse_and())
+        return tests[0] if len(tests) == 1 else lambda a: any(t(a) for t in tests)
+
+    def parse_and():
+        tests = [parse_factor()]
+        while tokens and (tokens[-1].group('op') == 'and'):
+            tokens.pop()
+            tests.append(parse_factor())
+        return tests[0] if len(tests) == 1 else lambda a: all(t(a) for t in tests)
+
+    def parse_factor():
+        token = tokens.pop()
+        if token.group('not'):
+            test = parse_or()
+            if tokens.pop().group('close') is None:
+                raise ValueError('Unbalanced parentheses')
+            return lambda a: not test(a)
+        func, attr = token.group('func'), token.group('fattr')
+        if func == 'starts-with':
+            value = token.group('fvalue')
+            return lambda a: a.get(attr, '').startswith(value)
+        if func == 'contains':
+            value = token.group('fvalue')
+            return lambda a: value in a.get(attr, '')
+        attr = token.group('attr')
+        if attr is None:
+            raise ValueError('Unexpected token')
+        if token.group('q') is None:
+            return lambda a: attr in a
+        value = token.group('value')
+        return lambda a: a.get(attr) == value
+
+    try:
+        test = parse_or()
+    except (IndexError, ValueError):
+        return None
+    return test if not tokens else None
+
+
+class Selector:
+    """An XPath evaluator for the paths generating collections of values.
+
+    Simple descendant paths like ``//tag[@attr...]`` can be collected
+    from all the rules and evaluated in a single walk over the tree
+    (see :func:`single_pass`).
+    """
+
+    def __init__(self, path):
+        """Initialize this selector.
+
+        :sig: (str) -> None
+        :param path: XPath expression to evaluate.
+        """
+        self.path = path            # sig: str
+        """XPath expression of this selector."""
+
+        self._xpath = XPath(path)   # sig: XPath
+
+        self.tag = None             # sig: Optional[str]
+        """Tag matched by this selector, if it can be evaluated in a single pass."""
+
+        self.tests = None           # sig: Optional[Sequence[Callable[[Mapping[str, str]], bool]]]
+        """Tests for the attributes of the matched elements."""
+
+        match = _SIMPLE_SELECTOR.match(path)
+        if match is not None:
+            predicates = _split_predicates(match.group(2))
+            if predicates is not None:
+                tests = [_compile_predicate(p) for p in predicates]
+                if None not in tests:
+                    self.tag = match.group(1)
+                    self.tests = tests
+
+    def __call__(self, element):
+        """Apply this selector to an element.
+
+        :sig: (Element) -> XPathResult
+        :param element: Element to apply this selector to.
+        :return: Elements or strings resulting from the query.
+        """
+        scan = getattr(_scans, 'current', None)
+        if (scan is not None) and (self in scan.results) and scan.covers(element):
+            return list(scan.results[self])
+        return self._xpath(element)
+
+
+class _Scan:
+    """Results of the selectors evaluated in a single walk over a tree."""
+
+    def __init__(self, root, selectors):
+        """Walk the tree once, dispatching every element to all the selectors it matches.
+
+        :sig: (Element, Iterable[Selector]) -> None
+        :param root: Element to search the descendants of.
+        :param selectors: Selectors to evaluate.
+        """
+        self.root = root
+        self.results = {}
+        by_tag = {}
+        for selector in selectors:
+            if (selector.tag is not None) and (selector not in self.results):
+                self.results[selector] = []
+                by_tag.setdefault(selector.tag, []).append(selector)
+        any_tag = by_tag.pop('*', [])
+        if not (by_tag or any_tag):
+            return
+        if _USE_LXML and not any_tag:
+            # let lxml skip the elements with other tags
+            elements = root.iter(*by_tag)
+        else:
+            elements = root.iter()
+        for element in elements:
+            tag = element.tag
+            if not isinstance(tag, str):
+                # comments and processing instructions
+                continue
+            if (not _USE_LXML) and (element is root):
+                # descendants only, as in ElementTree's ".//" paths
+                continue
+            matching = by_tag.get(tag)
+            if any_tag:
+                matching = (matching or []) + any_tag
+            elif matching is None:
+                continue
+            attrib = element.attrib
+            for selector in matching:
+                for test in selector.tests:
+                    if not test(attrib):
+                        break
+                else:
+                    self.results[selector].append(element)
+
+    def covers(self, element):
+        """Check whether the results of this scan are valid for an element.
+
+        :sig: (Element) -> bool
+        :param element: Element the selectors are applied to.
+        :return: Whether the selectors would return the stored results.
+        """
+        if _USE_LXML:
+            # descendant paths are evaluated from the root of the document
+            return element.getroottree().getroot() is self.root
+        return element is self.root
+
+
+_scans = local()  # sig: local
+"""Active scan for the current thread."""
+
+
+@contextmanager
+def single_pass(root, selectors):
+    """Evaluate the simple selectors in a single walk over a tree.
+
+    While the context is active, the selectors return the stored results
+    instead of evaluating their paths again.
+
+    :sig: (Element, Iterable[Selector]) -> ContextManager[_Scan]
+    :param root: Element of the tree to scan.
+    :param selectors: Selectors to evaluate.
+    """
+    if _USE_LXML:
+        root = root.getroottree().getroot()
+    previous = getattr(_scans, 'current', None)
+    _scans.current = _Scan(root, selectors)
+    try:
+        yield _scans.current
+    finally:
+        _scans.current = previous
+
+
 # sigalias: Reducer = Callable[[Sequence[str]], str]
 # sigalias: PathTransformer = Callable[[str], Any]
 # sigalias: MapTransformer = Callable[[Mapping[str, Any]], Any]
@@ -294,9 +532,18 @@ class Extractor:
         self.transform = transform  # sig: Optional[Transformer]
         """Function to transform the extracted value."""
 
-        self.foreach = XPath(foreach) if foreach is not None else None  # sig: Optional[XPath]
+        self.foreach = Selector(foreach) if foreach is not None else None  # sig: Optional[Selector]
         """Path to apply for generating a collection of values."""
 
+    def selectors(self):
+        """Get the selectors that can be evaluated in a single pass.
+
+        :sig: () -> List[Selector]
+        :return: Simple selectors used by this extractor and its rules.
+        """
+        foreach = self.foreach
+        return [foreach] if (foreach is not None) and (foreach.tag is not None) else []
+
     def apply(self, element):
         """Get the raw data from an element using this extractor.
 
@@ -433,6 +680,20 @@ class Rules(Extractor):
         self.section = XPath(section) if section is not None else None  # sig: Optional[XPath]
         """XPath expression for selecting a subroot for this section."""
 
+    def selectors(self):
+        """Get the selectors that can be evaluated in a single pass.
+
+        :sig: () -> List[Selector]
+        :return: Simple selectors used by this extractor and its rules.
+        """
+        if PY2:
+            selectors = Extractor.selectors(self)
+        else:
+            selectors = super().selectors()
+        for rule in self.rules:
+            selectors.extend(rule.selectors())
+        return selectors
+
     def apply(self, element):
         """Apply this extractor to an element.
 
@@ -474,7 +735,7 @@ class Rule:
         self.extractor = extractor  # sig: Extractor
         """Extractor that will generate this data item."""
 
-        self.foreach = XPath(foreach) if foreach is not None else None  # sig: Optional[XPath]
+        self.foreach = Selector(foreach) if foreach is not None else None  # sig: Optional[Selector]
         """XPath evaluator for generating multiple items."""
 
     @staticmethod
@@ -490,6 +751,19 @@ class Rule:
         value = Extractor.from_map(item['value'])
         return Rule(key=key, extractor=value, foreach=item.get('foreach'))
 
+    def selectors(self):
+        """Get the selectors that can be evaluated in a single pass.
+
+        :sig: () -> List[Selector]
+        :return: Simple selectors used by this rule.
+        """
+        foreach = self.foreach
+        selectors = [foreach] if (foreach is not None) and (foreach.tag is not None) else []
+        if not isinstance(self.key, str):
+            selectors.extend(self.key.selectors())
+        selectors.extend(self.extractor.selectors())
+        return selectors
+
     def extract(self, element):
         """Extract data out of an element using this rule.
 
@@ -705,22 +979,40 @@ def extract(element, items, section=None):
     :return: Extracted data.
     """
     rules = Rules([Rule.from_map(item) for item in items], section=section)
-    return rules.extract(element)
+    with single_pass(element, rules.selectors()):
+        return rules.extract(element)
+
+
+def compile_spec(spec):
+    """Build the rules described by an extraction specification.
+
+    :sig: (Mapping[str, Any]) -> Tuple[Optional[Sequence[Mapping[str, Any]]], Rules]
+    :param spec: Extraction specification.
+    :return: Preprocessing steps and extraction rules.
+    """
+    rules = Rules([Rule.from_map(item) for item in spec.get('items')], section=spec.get('section'))
+    return spec.get('pre'), rules
 
 
-def scrape(document, spec):
+def scrape(document, spec, compiled=None):
     """Extract data from a document after optionally preprocessing it.
 
-    :sig: (str, Mapping[str, Any]) -> Mapping[str, Any]
+    :sig: (
+            str,
+            Mapping[str, Any],
+            Optional[Tuple[Optional[Sequence[Mapping[str, Any]]], Rules]]
+        ) -> Mapping[str, Any]
     :param document: Document to scrape.
     :param spec: Extraction specification.
+    :param compiled: Result of compile_spec for the specification, to reuse.
     :return: Extracted data.
     """
+    pre, rules = compiled if compiled is not None else compile_spec(spec)
     root = build_tree(document)
-    pre = spec.get('pre')
     if pre is not None:
         preprocess(root, pre)
-    data = extract(root, spec.get('items'), section=spec.get('section'))
+    with single_pass(root, rules.selectors()):
+        data = rules.extract(root)
     return data
 
 
@@ -729,21 +1021,110 @@ def scrape(document, spec):
 ###########################################################
 
 
+def list_documents(sources):
+    """Get the files to scrape, in order.
+
+    :sig: (Iterable[str]) -> List[str]
+    :param sources: Files, directories or glob patterns.
+    :return: Paths of the files; files in directories are sorted by name.
+    """
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            names = sorted(os.listdir(source))
+            paths.extend(p for p in (os.path.join(source, n) for n in names) if os.path.isfile(p))
+        elif os.path.isfile(source):
+            paths.append(source)
+        else:
+            paths.extend(p for p in sorted(glob(source)) if os.path.isfile(p))
+    return paths
+
+
+_worker = {}    # spec and rules of the current process
+
+
+def _init_worker(spec, html):
+    """Compile the specification once for a worker process.
+
+    :sig: (Mapping[str, Any], bool) -> None
+    :param spec: Extraction specification.
+    :param html: Whether the documents are in HTML format.
+    """
+    _worker['spec'] = spec
+    _worker['compiled'] = compile_spec(spec)
+    _worker['html'] = html
+
+
+def _scrape_file(path):
+    """Scrape a file using the specification of the current process.
+
+    :sig: (str) -> Mapping[str, Any]
+    :param path: Path of the document.
+    :return: Record with the extracted data, or the error.
+    """
+    try:
+        with io.open(path, encoding='utf-8') as f:
+            content = f.read()
+        if _worker['html']:
+            content = html_to_xhtml(content)
+        data = scrape(content, _worker['spec'], compiled=_worker['compiled'])
+        return {'file': path, 'data': dict(data)}
+    except Exception as e:
+        return {'file': path, 'error': '%s: %s' % (e.__class__.__name__, e)}
+
+
+def scrape_files(paths, spec, html=False, jobs=1):
+    """Scrape many documents, using parallel worker processes.
+
+    :sig: (Sequence[str], Mapping[str, Any], Optional[bool], Optional[int]) -> Iterator[Mapping[str, Any]]
+    :param paths: Paths of the documents.
+    :param spec: Extraction specification.
+    :param html: Whether the documents are in HTML format.
+    :param jobs: Number of worker processes.
+    :return: Records with the extracted data (or the error), in input order.
+    """
+    if jobs <= 1:
+        _init_worker(spec, html)
+        for path in paths:
+            yield _scrape_file(path)
+        return
+    pool = Pool(jobs, initializer=_init_worker, initargs=(spec, html))
+    try:
+        chunksize = max(1, min(16, len(paths) // (jobs * 4)))
+        for record in pool.imap(_scrape_file, paths, chunksize):
+            yield record
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
 def main():
     parser = ArgumentParser(description="extract data from XML/HTML")
     parser.add_argument('--version', action='version', version=__version__)
     parser.add_argument('--html', action='store_true', help='document is in HTML format')
     parser.add_argument('-s', '--spec', required=True, help='spec file')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes, when scraping files')
+    parser.add_argument('documents', nargs='*',
+                        help='files, directories or glob patterns to scrape, writing JSONL'
+                             ' (by default, a single document is read from stdin)')
     arguments = parser.parse_args()
 
-    content = sys.stdin.read()
-    if arguments.html:
-        content = html_to_xhtml(content)
-
     with open(arguments.spec) as f:
         spec_content = f.read()
     spec = json.loads(spec_content)
 
+    if arguments.documents:
+        paths = list_documents(arguments.documents)
+        for record in scrape_files(paths, spec, html=arguments.html, jobs=arguments.jobs):
+            print(json.dumps(record, sort_keys=True))
+        return
+
+    content = sys.stdin.read()
+    if arguments.html:
+        content = html_to_xhtml(content)
+
     data = scrape(content, spec)
     print(json.dumps(data, indent=2, sort_keys=True))
 
@@ -29,9 +29,9 @@ from imdb.Character import Character
 from imdb.Movie import Movie
 from imdb.parser.http.logging import logger
 from imdb.Person import Person
-from imdb.utils import _Container, flatten
+from imdb.utils import _Container, flatten, get_identity_map, objects_params
 
-from .piculet import _USE_LXML, ElementTree, Path, Rule, Rules, build_tree, html_to_xhtml
+from .piculet import _USE_LXML, ElementTree, Path, Rule, Rules, build_tree, html_to_xhtml, single_pass
 from .piculet import xpath as piculet_xpath
 
 if PY2:
@@ -203,6 +203,9 @@ def build_person(txt, personID=None, billingPos=None,
     elif person.currentRole and isinstance(person.currentRole, Character) and \
             not person.currentRole.notes and notes:
         person.currentRole.notes = notes
+    idmap = get_identity_map()
+    if idmap is not None:
+        person = idmap.share(person)
     return person
 
 
@@ -366,6 +369,9 @@ def build_movie(txt, movieID=None, roleID=None, status=None,
     # Status can't be checked here, and must be detected by the parser.
     if status:
         m['status'] = status
+    idmap = get_identity_map()
+    if idmap is not None:
+        m = idmap.share(m)
     return m
 
 
@@ -413,6 +419,19 @@ class DOMParserBase(object):
             self.getRefs = self._defGetRefs
         if PY2 and isinstance(html_string, str):
             html_string = html_string.decode('utf-8')
+        if self._containsObjects:
+            # The Movie/Person/... instances built while parsing get
+            # the access system and the modFunct of this parser.
+            with objects_params(self._as, self._modFunct):
+                data = self._parse_string(html_string)
+        else:
+            data = self._parse_string(html_string)
+        data = self.add_refs(data)
+        return data
+
+    def _parse_string(self, html_string):
+        """Return the dictionary generated from the given html string,
+        before the references are added."""
         # Temporary fix: self.parse_dom must work even for empty strings.
         html_string = self.preprocess_string(html_string)
         if html_string:
@@ -423,13 +442,16 @@ class DOMParserBase(object):
             except Exception:
                 self._logger.error('%s: caught exception preprocessing DOM',
                                    self._cname, exc_info=True)
-            if self.getRefs:
-                try:
-                    self.gather_refs(dom)
-                except Exception:
-                    self._logger.warn('%s: unable to gather refs',
-                                      self._cname, exc_info=True)
-            data = self.parse_dom(dom)
+            # Descendant paths of all the rules are evaluated in a single
+            # walk over the DOM.
+            with single_pass(dom, self.get_selectors()):
+                if self.getRefs:
+                    try:
+                        self.gather_refs(dom)
+                    except Exception:
+                        self._logger.warn('%s: unable to gather refs',
+                                          self._cname, exc_info=True)
+                data = self.parse_dom(dom)
         else:
             data = {}
         try:
@@ -437,9 +459,6 @@ class DOMParserBase(object):
         except Exception:
             self._logger.error('%s: caught exception postprocessing data',
                                self._cname, exc_info=True)
-        if self._containsObjects:
-            self.set_objects_params(data)
-        data = self.add_refs(data)
         return data
 
     def get_dom(self, html_string):
@@ -515,6 +534,14 @@ class DOMParserBase(object):
         self._namesRefs = refs['names refs']
         self._titlesRefs = refs['titles refs']
 
+    def get_selectors(self):
+        """Return the selectors of the rules that can be evaluated
+        in a single walk over the dom."""
+        selectors = Rules(self.rules).selectors()
+        if self.getRefs:
+            selectors += Rules(GatherRefs.rules).selectors()
+        return selectors
+
     def preprocess_dom(self, dom):
         """Last chance to modify the dom, before the rules are applied."""
         return dom
@@ -529,7 +556,8 @@ class DOMParserBase(object):
 
     def set_objects_params(self, data):
         """Set parameters of Movie/Person/... instances, since they are
-        not always set in the parser's code."""
+        not always set in the parser's code; no longer used by parse,
+        since the instances get them when they're built."""
         for obj in flatten(data, yieldDictKeys=True, scalar=_Container):
             obj.accessSystem = self._as
             obj.modFunct = self._modFunct
@@ -625,6 +653,9 @@ class GatherRefs(DOMParserBase):
                 elif item == 'titles refs':
                     obj = Movie(movieID=imdbID, title=k,
                                 accessSystem=self._as, modFunct=self._modFunct)
+                idmap = get_identity_map()
+                if idmap is not None:
+                    obj = idmap.share(obj)
                 result[item][k] = obj
         return result
 
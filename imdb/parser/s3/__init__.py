@@ -26,15 +26,37 @@ called with the ``accessSystem`` parameter is set to "s3" or "s3dataset".
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import logging
+import time
 from operator import itemgetter
 
 import sqlalchemy
 
 from imdb import IMDbBase
+from imdb.linguistics import GENERIC_ARTICLES
 from imdb.Movie import Movie
 from imdb.Person import Person
-
-from .utils import DB_TRANSFORM, name_soundexes, scan_names, scan_titles, title_soundex
+from imdb.utils import LRUCache
+
+from .utils import (
+    DB_TRANSFORM,
+    SEARCH_CANDIDATES,
+    SEARCH_TRIGRAMS,
+    imports_table,
+    name_soundexes,
+    re_words,
+    scan_names,
+    scan_titles,
+    title_soundex,
+    trigrams
+)
+
+# maximum number of values in a single "IN (...)" clause.
+MAX_IN_VALUES = 500
+# default number of titles and of people kept in the caches.
+CACHE_SIZE = 4096
+# default number of seconds an item is kept in the caches.
+CACHE_TTL = 3600
+_missing = object()
 
 
 def split_array(text):
@@ -58,14 +80,61 @@ class IMDbS3AccessSystem(IMDbBase):
     accessSystem = 's3'
     _s3_logger = logging.getLogger('imdbpy.parser.s3')
     _metadata = sqlalchemy.MetaData()
+    # seconds between two checks for a new import of the dataset.
+    importCheckInterval = 60
 
     def __init__(self, uri, adultSearch=True, *arguments, **keywords):
-        """Initialize the access system."""
+        """Initialize the access system.
+
+        The rows of the titles and of the people are cached; the optional
+        *cacheSize* (number of titles and of people) and *cacheTTL* (seconds,
+        0 to keep them until they are discarded) keywords configure the caches."""
         IMDbBase.__init__(self, *arguments, **keywords)
         self._engine = sqlalchemy.create_engine(uri, encoding='utf-8', echo=False)
         self._metadata.bind = self._engine
         self._metadata.reflect()
         self.T = self._metadata.tables
+        try:
+            cacheSize = int(keywords.get('cacheSize', CACHE_SIZE))
+        except (TypeError, ValueError):
+            cacheSize = CACHE_SIZE
+        try:
+            cacheTTL = float(keywords.get('cacheTTL', CACHE_TTL))
+        except (TypeError, ValueError):
+            cacheTTL = CACHE_TTL
+        self._titles_cache = LRUCache(maxsize=cacheSize, ttl=cacheTTL or None)
+        self._persons_cache = LRUCache(maxsize=cacheSize, ttl=cacheTTL or None)
+        self._last_import = self._get_last_import()
+        self._last_import_check = time.time()
+
+    def _get_last_import(self):
+        """Return the identifier of the last import of the dataset, if known."""
+        imports = imports_table(self._metadata)
+        try:
+            return sqlalchemy.select([sqlalchemy.func.max(imports.c.id)]).execute().scalar()
+        except sqlalchemy.exc.SQLAlchemyError:
+            return None
+
+    def _check_import(self):
+        """Drop the caches, if the dataset was imported again."""
+        now = time.time()
+        if now - self._last_import_check < self.importCheckInterval:
+            return
+        self._last_import_check = now
+        last_import = self._get_last_import()
+        if last_import != self._last_import:
+            self._s3_logger.debug('the dataset was imported again: dropping the caches')
+            self._last_import = last_import
+            self.clear_cache(counters=False)
+
+    def clear_cache(self, counters=True):
+        """Empty the caches of the titles and of the people and, by default, reset their counters."""
+        self._titles_cache.clear(counters=counters)
+        self._persons_cache.clear(counters=counters)
+
+    def cache_stats(self):
+        """Return the statistics of the caches of the titles and of the people."""
+        return {'titles': self._titles_cache.stats(), 'persons': self._persons_cache.stats()}
 
     def _rename(self, table, data):
         for column, conf in DB_TRANSFORM.get(table, {}).items():
@@ -85,15 +154,33 @@ class IMDbS3AccessSystem(IMDbBase):
                 del data[key]
         return data
 
-    def _base_title_info(self, movieID, movies_cache=None, persons_cache=None):
-        if movies_cache is None:
-            movies_cache = {}
-        if persons_cache is None:
-            persons_cache = {}
-        if movieID in movies_cache:
-            return movies_cache[movieID]
-        tb = self.T['title_basics']
-        movie = tb.select(tb.c.tconst == movieID).execute().fetchone() or {}
+    def _select_in(self, table, column, values):
+        """Yield the rows of a table with one of the given values in a column,
+        with a query every MAX_IN_VALUES values."""
+        values = list(values)
+        for idx in range(0, len(values), MAX_IN_VALUES):
+            for row in table.select(column.in_(values[idx:idx + MAX_IN_VALUES])).execute():
+                yield row
+
+    def _cached_rows(self, cache, table, column, values):
+        """Return a dictionary with the rows (as dictionaries; empty if missing) with
+        the given values in a column, fetching only the ones not in the cache."""
+        self._check_import()
+        rows = {}
+        missing = []
+        for value in values:
+            row = cache.get(value, _missing)
+            if row is _missing:
+                missing.append(value)
+            else:
+                rows[value] = row
+        if missing:
+            fetched = dict((row[column.name], dict(row)) for row in self._select_in(table, column, missing))
+            for value in missing:
+                rows[value] = cache[value] = fetched.get(value) or {}
+        return rows
+
+    def _title_data(self, movie):
         data = self._rename('title_basics', dict(movie))
         data['year'] = str(data.get('startYear') or '')
         if 'endYear' in data and data['endYear']:
@@ -103,31 +190,54 @@ class IMDbS3AccessSystem(IMDbBase):
         if 'runtimes' in data and data['runtimes']:
             data['runtimes'] = [data['runtimes']]
         self._clean(data, ('startYear', 'endYear', 'movieID'))
-        movies_cache[movieID] = data
         return data
 
+    def _fetch_titles(self, movieIDs, movies_cache):
+        """Fill movies_cache with the titles not already there, fetching the
+        ones that are not cached with a single query."""
+        missing = set(movieIDs).difference(movies_cache)
+        if not missing:
+            return
+        tb = self.T['title_basics']
+        movies = self._cached_rows(self._titles_cache, tb, tb.c.tconst, missing)
+        for movieID in missing:
+            movies_cache[movieID] = self._title_data(movies.get(movieID) or {})
+
+    def _fetch_persons(self, personIDs, movies_cache, persons_cache):
+        """Fill persons_cache with the people not already there, fetching them
+        and then all the titles they are known for with a single query each
+        (for the ones that are not cached)."""
+        missing = set(personIDs).difference(persons_cache)
+        if not missing:
+            return
+        nb = self.T['name_basics']
+        persons = self._cached_rows(self._persons_cache, nb, nb.c.nconst, missing)
+        known_for = {}
+        for personID in missing:
+            data = persons[personID] = self._rename('name_basics', dict(persons.get(personID) or {}))
+            known_for[personID] = [int(movieID) for movieID in split_array(data.get('known for') or '')
+                                   if movieID]
+        self._fetch_titles([movieID for movieIDs in known_for.values() for movieID in movieIDs], movies_cache)
+        for personID in missing:
+            data = persons[personID]
+            data['known for'] = [Movie(movieID=movieID, data=movies_cache[movieID], accessSystem=self.accessSystem)
+                                 for movieID in known_for[personID]]
+            self._clean(data, ('ns_soundex', 'sn_soundex', 's_soundex', 'personID'))
+            persons_cache[personID] = data
+
+    def _base_title_info(self, movieID, movies_cache=None, persons_cache=None):
+        if movies_cache is None:
+            movies_cache = {}
+        self._fetch_titles([movieID], movies_cache)
+        return movies_cache[movieID]
+
     def _base_person_info(self, personID, movies_cache=None, persons_cache=None):
         if movies_cache is None:
             movies_cache = {}
         if persons_cache is None:
             persons_cache = {}
-        if personID in persons_cache:
-            return persons_cache[personID]
-        nb = self.T['name_basics']
-        person = nb.select(nb.c.nconst == personID).execute().fetchone() or {}
-        data = self._rename('name_basics', dict(person))
-        movies = []
-        for movieID in split_array(data.get('known for') or ''):
-            if not movieID:
-                continue
-            movieID = int(movieID)
-            movie_data = self._base_title_info(movieID, movies_cache=movies_cache, persons_cache=persons_cache)
-            movie = Movie(movieID=movieID, data=movie_data, accessSystem=self.accessSystem)
-            movies.append(movie)
-        data['known for'] = movies
-        self._clean(data, ('ns_soundex', 'sn_soundex', 's_soundex', 'personID'))
-        persons_cache[personID] = data
-        return data
+        self._fetch_persons([personID], movies_cache, persons_cache)
+        return persons_cache[personID]
 
     def get_movie_main(self, movieID):
         movieID = int(movieID)
@@ -138,29 +248,8 @@ class IMDbS3AccessSystem(IMDbBase):
         tc = self.T['title_crew']
         movie = tc.select(tc.c.tconst == movieID).execute().fetchone() or {}
         tc_data = self._rename('title_crew', dict(movie))
-        writers = []
-        directors = []
-        for key, target in (('director', directors), ('writer', writers)):
-            for personID in split_array(tc_data.get(key) or ''):
-                if not personID:
-                    continue
-                personID = int(personID)
-                person_data = self._base_person_info(personID,
-                                                     movies_cache=_movies_cache,
-                                                     persons_cache=_persons_cache)
-                person = Person(personID=personID, data=person_data, accessSystem=self.accessSystem)
-                target.append(person)
-        tc_data['director'] = directors
-        tc_data['writer'] = writers
-        data.update(tc_data)
-
-        te = self.T['title_episode']
-        movie = te.select(te.c.tconst == movieID).execute().fetchone() or {}
-        te_data = self._rename('title_episode', dict(movie))
-        if 'parentTconst' in te_data:
-            te_data['episodes of'] = self._base_title_info(te_data['parentTconst'])
-        self._clean(te_data, ('parentTconst',))
-        data.update(te_data)
+        crew = [(key, [int(personID) for personID in split_array(tc_data.get(key) or '') if personID])
+                for key in ('director', 'writer')]
 
         tp = self.T['title_principals']
         movie_rows = tp.select(tp.c.tconst == movieID).execute().fetchall() or {}
@@ -174,6 +263,26 @@ class IMDbS3AccessSystem(IMDbBase):
             if category in ('actor', 'actress', 'self'):
                 category = 'cast'
             roles.setdefault(category, []).append(movie_row)
+
+        # Fetch every person (and the titles they are known for) at once.
+        personIDs = [personID for key, personIDs in crew for personID in personIDs]
+        personIDs += [person_info.get('nconst') for rows in roles.values() for person_info in rows
+                      if person_info.get('nconst')]
+        self._fetch_persons(personIDs, _movies_cache, _persons_cache)
+
+        for key, personIDs in crew:
+            tc_data[key] = [Person(personID=personID, data=_persons_cache[personID], accessSystem=self.accessSystem)
+                            for personID in personIDs]
+        data.update(tc_data)
+
+        te = self.T['title_episode']
+        movie = te.select(te.c.tconst == movieID).execute().fetchone() or {}
+        te_data = self._rename('title_episode', dict(movie))
+        if 'parentTconst' in te_data:
+            te_data['episodes of'] = self._base_title_info(te_data['parentTconst'])
+        self._clean(te_data, ('parentTconst',))
+        data.update(te_data)
+
         for role in roles:
             roles[role].sort(key=itemgetter('ordering'))
             persons = []
@@ -181,10 +290,7 @@ class IMDbS3AccessSystem(IMDbBase):
                 personID = person_info.get('nconst')
                 if not personID:
                     continue
-                person_data = self._base_person_info(personID,
-                                                     movies_cache=_movies_cache,
-                                                     persons_cache=_persons_cache)
-                person = Person(personID=personID, data=person_data,
+                person = Person(personID=personID, data=_persons_cache[personID],
                                 billingPos=person_info.get('ordering'),
                                 currentRole=person_info.get('characters'),
                                 notes=person_info.get('job'),
@@ -231,27 +337,91 @@ class IMDbS3AccessSystem(IMDbBase):
     get_person_filmography = get_person_main
     get_person_biography = get_person_main
 
+    def _search_candidates(self, kind, text):
+        """Return the ids of the best SEARCH_CANDIDATES matches of a title or
+        a name, using the search index built by the import script; None if
+        the index (or the trigrams of the text) is missing."""
+        search_name = '%s_search' % kind
+        trigrams_name = '%s_trigrams' % kind
+        dialect = self._engine.dialect.name
+        if trigrams_name in self.T:
+            text_trigrams = list(trigrams(text))
+            if not text_trigrams:
+                return None
+            counts_name = '%s_trigram_counts' % kind
+            if counts_name in self.T:
+                # Only the least common trigrams are used: the most common ones
+                # would select a large part of the table.
+                counts = self.T[counts_name]
+                text_trigrams = [row[0] for row in sqlalchemy.select([counts.c.trigram]).where(
+                    counts.c.trigram.in_(text_trigrams)).order_by(counts.c.docs).limit(SEARCH_TRIGRAMS).execute()]
+                if not text_trigrams:
+                    return []
+            table = self.T[trigrams_name]
+            query = sqlalchemy.select([table.c.id]).where(table.c.trigram.in_(text_trigrams)).group_by(
+                table.c.id).order_by(sqlalchemy.func.count().desc()).limit(SEARCH_CANDIDATES)
+            rows = query.execute()
+        elif search_name in self.T and dialect == 'sqlite':
+            # The FTS5 trigram tokenizer indexes every sequence of three chars: first
+            # search the texts that contain the whole text, then every word and, at last,
+            # any of its trigrams.
+            text = text.lower()
+            text_trigrams = set(text[idx:idx + 3] for idx in range(len(text) - 2))
+            if not text_trigrams:
+                return None
+            query = sqlalchemy.text('SELECT id FROM %s WHERE %s MATCH :match ORDER BY rank LIMIT :limit' % (
+                search_name, search_name))
+            words = [word for word in re_words.split(text) if len(word) >= 3 and word not in GENERIC_ARTICLES]
+            matches = ['"%s"' % text.replace('"', '""')]
+            if words:
+                matches.append(' AND '.join('"%s"' % word.replace('"', '""') for word in words))
+            rows = []
+            for match in matches:
+                rows += self._engine.execute(query, match=match, limit=SEARCH_CANDIDATES).fetchall()
+            if not rows:
+                match = ' OR '.join('"%s"' % trigram.replace('"', '""') for trigram in text_trigrams)
+                rows = self._engine.execute(query, match=match, limit=SEARCH_CANDIDATES)
+        elif search_name in self.T and dialect == 'postgresql':
+            rows = self._engine.execute(sqlalchemy.text(
+                'SELECT id FROM %s WHERE text %% :text ORDER BY similarity(text, :text) DESC LIMIT :limit' %
+                search_name), text=text.lower(), limit=SEARCH_CANDIDATES)
+        else:
+            return None
+        ids = []
+        for row in rows:
+            if row[0] not in ids:
+                ids.append(row[0])
+        return ids
+
     def _search_movie(self, title, results, _episodes=False):
         title = title.strip()
         if not title:
             return []
         results = []
-        t_soundex = title_soundex(title)
         tb = self.T['title_basics']
-        conditions = [tb.c.t_soundex == t_soundex]
-        if _episodes:
-            conditions.append(tb.c.titleType == 'episode')
-        results = tb.select(sqlalchemy.and_(*conditions)).execute()
-        results = [(x['tconst'], self._clean(self._rename('title_basics', dict(x)), ('t_soundex',)))
-                   for x in results]
-
-        # Also search the AKAs
         ta = self.T['title_akas']
-        if t_soundex is not None:
-            ta_conditions = [ta.c.t_soundex == t_soundex]
+        candidates = None
+        if not _episodes:
+            # The candidates are the best matches among every kind of title:
+            # the episodes are searched by soundex, filtering them in the query.
+            candidates = self._search_candidates('title', title)
+        if candidates is not None:
+            results = self._select_in(tb, tb.c.tconst, candidates)
+            ta_results = self._select_in(ta, ta.c.titleId, candidates)
         else:
-            ta_conditions = [ta.c.title.ilike('%%%s%%' % title)]
-        ta_results = ta.select(sqlalchemy.and_(*ta_conditions)).execute()
+            t_soundex = title_soundex(title)
+            conditions = [tb.c.t_soundex == t_soundex]
+            if _episodes:
+                conditions.append(tb.c.titleType == 'episode')
+            results = tb.select(sqlalchemy.and_(*conditions)).execute()
+            # Also search the AKAs
+            if t_soundex is not None:
+                ta_conditions = [ta.c.t_soundex == t_soundex]
+            else:
+                ta_conditions = [ta.c.title.ilike('%%%s%%' % title)]
+            ta_results = ta.select(sqlalchemy.and_(*ta_conditions)).execute()
+        results = [(x['tconst'], self._clean(self._rename('title_basics', dict(x)), ('t_soundex',)))
+                   for x in results]
         ta_results = [(x['titleId'], self._clean(self._rename('title_akas', dict(x)), ('t_soundex',)))
                       for x in ta_results]
         results += ta_results
@@ -271,14 +441,18 @@ class IMDbS3AccessSystem(IMDbBase):
         if not name:
             return []
         results = []
-        ns_soundex, sn_soundex, s_soundex = name_soundexes(name)
         nb = self.T['name_basics']
-        conditions = [nb.c.ns_soundex == ns_soundex]
-        if sn_soundex:
-            conditions.append(nb.c.sn_soundex == sn_soundex)
-        if s_soundex:
-            conditions.append(nb.c.s_soundex == s_soundex)
-        results = nb.select(sqlalchemy.or_(*conditions)).execute()
+        candidates = self._search_candidates('name', name)
+        if candidates is not None:
+            results = self._select_in(nb, nb.c.nconst, candidates)
+        else:
+            ns_soundex, sn_soundex, s_soundex = name_soundexes(name)
+            conditions = [nb.c.ns_soundex == ns_soundex]
+            if sn_soundex:
+                conditions.append(nb.c.sn_soundex == sn_soundex)
+            if s_soundex:
+                conditions.append(nb.c.s_soundex == s_soundex)
+            results = nb.select(sqlalchemy.or_(*conditions)).execute()
         results = [(x['nconst'], self._clean(self._rename('name_basics', dict(x)),
                                              ('ns_soundex', 'sn_soundex', 's_soundex')))
                    for x in results]
@@ -21,11 +21,12 @@ This package provides utilities for the s3 dataset.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import re
+import string
 from difflib import SequenceMatcher
 
 import sqlalchemy
 
-from imdb.utils import _unicodeArticles, canonicalName, canonicalTitle
+from imdb.utils import _unicodeArticles, canonicalName, canonicalTitle, spArticles
 
 SOUNDEX_LENGTH = 5
 RO_THRESHOLD = 0.6
@@ -170,11 +171,69 @@ DB_TRANSFORM = {
 }
 
 
+# for titles and names, the (table, id column, text column) indexed for searches.
+SEARCH_SOURCES = {
+    'title': (('title_basics', 'tconst', 'primaryTitle'), ('title_akas', 'titleId', 'title')),
+    'name': (('name_basics', 'nconst', 'primaryName'),)
+}
+# number of candidates fetched from the search index, then ranked by scan_titles or scan_names.
+SEARCH_CANDIDATES = 100
+SEARCH_TRIGRAMS = 6
+re_words = re.compile(r'\W+', re.U)
+
+
+def trigrams(s):
+    """Return the trigrams of the words of a string, as PostgreSQL's pg_trgm does:
+    every (lowercase) word is prefixed by two spaces and followed by one.
+
+    :param s: the string
+    :type s: str
+    :returns: the set of trigrams
+    :rtype: set
+    """
+    result = set()
+    for word in re_words.split(s.lower()):
+        if not word:
+            continue
+        word = '  %s ' % word
+        result.update(word[idx:idx + 3] for idx in range(len(word) - 2))
+    return result
+
+
+# the table where the importer records each import.
+IMPORTS_TABLE = 'cinemagoer_imports'
+
+
+def imports_table(metadata):
+    """Return the table where the importer records each import; readers use it
+    to know when their caches must be dropped.
+
+    :param metadata: the metadata of the table
+    :type metadata: :class:`sqlalchemy.MetaData`
+    :returns: the table
+    :rtype: :class:`sqlalchemy.Table`
+    """
+    if IMPORTS_TABLE in metadata.tables:
+        return metadata.tables[IMPORTS_TABLE]
+    return sqlalchemy.Table(IMPORTS_TABLE, metadata,
+                            sqlalchemy.Column('id', sqlalchemy.Integer, primary_key=True),
+                            sqlalchemy.Column('imported', sqlalchemy.DateTime))
+
+
 _translate = dict(B='1', C='2', D='3', F='1', G='2', J='2', K='2', L='4',
                     M='5', N='5', P='1', Q='2', R='6', S='2', T='3', V='1',
                     X='2', Z='2')
 _translateget = _translate.get
 _re_non_ascii = re.compile(r'^[^a-z]*', re.I)
+_asciiLetters = frozenset(string.ascii_letters)
+# Map the (encoded) letters to their code, deleting everything else.
+_soundexCodes = bytes.maketrans(''.join(_translate).encode('ascii'),
+                                ''.join(_translate.values()).encode('ascii'))
+_soundexDelete = bytes(bytearray(c for c in range(256) if chr(c) not in _translate))
+_articles = frozenset(_unicodeArticles)
+_spArticles = frozenset(spArticles[1])
+# The start of a title, up to the char that ends an article.
+_re_article = re.compile(r"[^ '\-]*[ '\-]")
 
 
 def soundex(s, length=SOUNDEX_LENGTH):
@@ -186,20 +245,23 @@ def soundex(s, length=SOUNDEX_LENGTH):
     :type length: int
     :returns: the soundex code
     :rtype: str"""
-    s = _re_non_ascii.sub('', s)
-    if not s:
-        return None
+    if s[:1] not in _asciiLetters:
+        s = _re_non_ascii.sub('', s)
+        if not s:
+            return None
     s = s.upper()
     soundCode = s[0]
-    count = 1
-    for c in s[1:]:
-        if count >= length:
-            break
-        cw = _translateget(c, '0')
-        if cw != '0' and soundCode[-1] != cw:
+    if len(soundCode) >= length:
+        return soundCode
+    last = None
+    # Only ASCII letters have a code: the others are dropped before the loop.
+    for cw in s[1:].encode('ascii', 'ignore').translate(_soundexCodes, _soundexDelete).decode('ascii'):
+        if cw != last:
             soundCode += cw
-            count += 1
-    return soundCode or None
+            if len(soundCode) >= length:
+                break
+            last = cw
+    return soundCode
 
 
 def title_soundex(title):
@@ -212,9 +274,14 @@ def title_soundex(title):
     """
     if not title:
         return None
-    title = canonicalTitle(title)
     ts = title.split(', ')
-    if ts[-1].lower() in _unicodeArticles:
+    if ts[-1].lower() not in _articles:
+        # Only the titles starting with an article are changed by canonicalTitle.
+        match = _re_article.match(title.lower())
+        if match and match.group() in _spArticles:
+            title = canonicalTitle(title)
+            ts = title.split(', ')
+    if ts[-1].lower() in _articles:
         title = ', '.join(ts[:-1])
     return soundex(title)
 
@@ -252,6 +319,8 @@ def ratcliff(s1, s2, sm):
     :rtype: float"""
     s1len = len(s1)
     s2len = len(s2)
+    if not (s1len and s2len):
+        return 0.0
     if s1len < s2len:
         threshold = float(s1len) / s2len
     else:
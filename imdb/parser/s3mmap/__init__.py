@@ -0,0 +1,292 @@
+# Copyright 2026 Davide Alberani <da@erlug.linux.it>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""
+This package provides the IMDbS3MmapAccessSystem class used to access IMDb's
+data through the s3 dataset, compiled into a read-only binary file (see the
+s32mmap.py script) that is read through a memory map: no database is needed,
+and the processes reading the same file share the same pages of memory.
+
+The :func:`imdb.IMDb` function will return an instance of this class when
+called with the ``accessSystem`` parameter is set to "s3mmap".
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import os
+import threading
+import time
+
+from imdb import IMDbBase
+from imdb.Movie import Movie
+from imdb.parser.s3 import split_array
+from imdb.parser.s3.utils import name_soundexes, scan_names, scan_titles, title_soundex
+from imdb.Person import Person
+
+from .store import AKA_COLUMNS, NAME_COLUMNS, PRINCIPAL_COLUMNS, TITLE_COLUMNS, Store
+
+
+class IMDbS3MmapAccessSystem(IMDbBase):
+    """The class used to access IMDb's data through the compiled s3 dataset."""
+
+    accessSystem = 's3mmap'
+    _s3_logger = logging.getLogger('imdbpy.parser.s3mmap')
+    # seconds between two checks for a new version of the file.
+    fileCheckInterval = 60
+
+    def __init__(self, file_name, adultSearch=True, *arguments, **keywords):
+        """Initialize the access system.
+
+        *file_name* is the file written by the s32mmap.py script."""
+        IMDbBase.__init__(self, *arguments, **keywords)
+        self._file_name = file_name
+        self._store = Store(file_name)
+        self._store_lock = threading.Lock()
+        self._last_file_check = time.time()
+
+    def _check_file(self):
+        """Open the file again, if it was replaced by a new version, and
+        return the store that must be used for the whole request.
+
+        The previous store is not closed, since other threads may still be
+        reading it: the file is unmapped once it's no longer referenced."""
+        now = time.time()
+        if now - self._last_file_check < self.fileCheckInterval:
+            return self._store
+        with self._store_lock:
+            if now - self._last_file_check < self.fileCheckInterval:
+                return self._store
+            self._last_file_check = now
+            try:
+                stat = os.stat(self._file_name)
+            except OSError:
+                return self._store
+            if (stat.st_ino, stat.st_mtime) != (self._store.stat.st_ino, self._store.stat.st_mtime):
+                self._s3_logger.debug('the file was compiled again: opening it')
+                self._store = Store(self._file_name)
+            return self._store
+
+    def close(self):
+        """Close the file."""
+        self._store.close()
+
+    def _clean(self, data):
+        for key in list(data.keys()):
+            if data[key] in (None, '', []):
+                del data[key]
+        return data
+
+    def _title_data(self, store, row):
+        """Return the basic information of a title (empty, if the row is None)."""
+        if row is None:
+            return {}
+        values = store.row('title_columns', row, TITLE_COLUMNS)
+        data = {
+            'kind': values['titleType'],
+            'title': values['primaryTitle'],
+            'original title': values['originalTitle'],
+            'adult': values['isAdult'],
+            'year': str(values['startYear'] or ''),
+            'genres': split_array((values['genres'] or '').lower()),
+            'runtimes': [values['runtimeMinutes']] if values['runtimeMinutes'] else None
+        }
+        if values['endYear']:
+            data['year'] += '-%s' % values['endYear']
+        return self._clean(data)
+
+    def _person_data(self, store, row):
+        """Return the basic information of a person, without the known for titles."""
+        values = store.row('name_columns', row, NAME_COLUMNS)
+        return self._clean({
+            'name': values['primaryName'],
+            'birth date': values['birthYear'],
+            'death date': values['deathYear'],
+            'primary profession': values['primaryProfession']
+        })
+
+    def _fetch_titles(self, store, movieIDs, movies_cache):
+        """Fill movies_cache with the titles not already there."""
+        for movieID in movieIDs:
+            if movieID not in movies_cache:
+                movies_cache[movieID] = self._title_data(store, store.find(store.title_ids, movieID))
+
+    def _fetch_persons(self, store, personIDs, movies_cache, persons_cache):
+        """Fill persons_cache with the people not already there, and
+        movies_cache with the titles they are known for."""
+        for personID in personIDs:
+            if personID in persons_cache:
+                continue
+            row = store.find(store.name_ids, personID)
+            if row is None:
+                persons_cache[personID] = {}
+                continue
+            data = self._person_data(store, row)
+            known_for = store.related('known_for', row)
+            self._fetch_titles(store, known_for, movies_cache)
+            if known_for:
+                data['known for'] = [Movie(movieID=movieID, data=movies_cache[movieID],
+                                           accessSystem=self.accessSystem) for movieID in known_for]
+            persons_cache[personID] = data
+
+    def get_movie_main(self, movieID):
+        store = self._check_file()
+        movieID = int(movieID)
+        row = store.find(store.title_ids, movieID)
+        if row is None:
+            return {'data': {}, 'info sets': ('main', 'plot')}
+        data = self._title_data(store, row)
+        values = store.row('title_columns', row, TITLE_COLUMNS)
+        _movies_cache = {movieID: data}
+        _persons_cache = {}
+
+        crew = [('director', store.related('directors', row)),
+                ('writer', store.related('writers', row))]
+        roles = {}
+        for principal in store.related('principals', row, PRINCIPAL_COLUMNS):
+            category = principal['category']
+            if not category:
+                continue
+            if category in ('actor', 'actress', 'self'):
+                category = 'cast'
+            roles.setdefault(category, []).append(principal)
+
+        # Fetch every person (and the titles they are known for).
+        personIDs = [personID for key, personIDs in crew for personID in personIDs]
+        personIDs += [principal['nconst'] for principals in roles.values() for principal in principals]
+        self._fetch_persons(store, personIDs, _movies_cache, _persons_cache)
+
+        for key, personIDs in crew:
+            if personIDs:
+                data[key] = [Person(personID=personID, data=_persons_cache[personID],
+                                    accessSystem=self.accessSystem) for personID in personIDs]
+
+        if values['parentTconst'] is not None:
+            self._fetch_titles(store, [values['parentTconst']], _movies_cache)
+            data['episodes of'] = _movies_cache[values['parentTconst']]
+        data['seasonNr'] = values['seasonNumber']
+        data['episodeNr'] = values['episodeNumber']
+
+        for role, principals in roles.items():
+            principals.sort(key=lambda principal: principal['ordering'])
+            data[role] = [Person(personID=principal['nconst'], data=_persons_cache[principal['nconst']],
+                                 billingPos=principal['ordering'], currentRole=principal['characters'],
+                                 notes=principal['job'], accessSystem=self.accessSystem)
+                          for principal in principals]
+
+        data['rating'] = values['averageRating']
+        data['votes'] = values['numVotes']
+
+        akas_list = []
+        for aka in store.related('akas', row, AKA_COLUMNS):
+            aka_data = {'ordering': aka['ordering'], 'title': aka['title'], 'region': aka['region'],
+                        'language': aka['language'], 'original': aka['isOriginalTitle']}
+            for key in 'types', 'attributes':
+                if aka[key]:
+                    aka_data[key] = split_array(aka[key])
+            akas_list.append(dict((key, value) for key, value in aka_data.items() if value))
+        if akas_list:
+            data['akas'] = akas_list
+
+        self._clean(data)
+        return {'data': data, 'info sets': ('main', 'plot')}
+
+    # we don't really have plot information, yet
+    get_movie_plot = get_movie_main
+
+    def get_movie_episodes(self, movieID, season_nums='all'):
+        store = self._check_file()
+        movieID = int(movieID)
+        row = store.find(store.title_ids, movieID)
+        if row is None:
+            return {'data': {}}
+        if isinstance(season_nums, int):
+            season_nums = {season_nums}
+        elif season_nums != 'all':
+            season_nums = set(season_nums)
+        series = Movie(movieID=movieID, data=self._title_data(store, row), accessSystem=self.accessSystem)
+        episodes = []
+        for episode_row in store.related('episodes', row):
+            values = store.row('title_columns', episode_row, TITLE_COLUMNS)
+            if season_nums != 'all' and values['seasonNumber'] not in season_nums:
+                continue
+            episodes.append((values['seasonNumber'], values['episodeNumber'], episode_row))
+        # the episodes without a number are sorted last.
+        episodes.sort(key=lambda x: (x[0] is None, x[0] or 0, x[1] is None, x[1] or 0, x[2]))
+        seasons = {}
+        for season, episode, episode_row in episodes:
+            data = self._title_data(store, episode_row)
+            data.update({'episode of': series, 'season': season, 'episode': episode})
+            self._clean(data)
+            seasons.setdefault(season, {})[episode] = Movie(movieID=store.title_ids[episode_row], data=data,
+                                                            accessSystem=self.accessSystem)
+        return {'data': {'episodes': seasons, 'number of episodes': len(episodes)}}
+
+    def get_person_main(self, personID):
+        store = self._check_file()
+        personID = int(personID)
+        persons_cache = {}
+        self._fetch_persons(store, [personID], {}, persons_cache)
+        return {'data': persons_cache[personID], 'info sets': ('main', 'filmography', 'biography')}
+
+    get_person_filmography = get_person_main
+    get_person_biography = get_person_main
+
+    def _search_movie(self, title, results, _episodes=False):
+        store = self._check_file()
+        title = title.strip()
+        if not title:
+            return []
+        titles_count = len(store.title_ids)
+        results = []
+        for row in store.soundex_rows('t_soundex', title_soundex(title)):
+            if row < titles_count:
+                data = self._title_data(store, row)
+                if _episodes and data.get('kind') != 'episode':
+                    continue
+                results.append((store.title_ids[row], data))
+                continue
+            # the akas are referenced after the titles.
+            title_row, aka = store.entry('akas', row - titles_count, AKA_COLUMNS)
+            data = {'title': aka['title'], 'region': aka['region'], 'language': aka['language'],
+                    'types': aka['types'], 'attributes': aka['attributes'], 'original': aka['isOriginalTitle']}
+            results.append((store.title_ids[title_row], self._clean(data)))
+        results = scan_titles(results, title)
+        return [x[1] for x in results]
+
+    def _search_movie_advanced(self, title=None, adult=None, results=None, sort=None, sort_dir=None):
+        return self._search_movie(title, results)
+
+    def _search_episode(self, title, results):
+        return self._search_movie(title, results=results, _episodes=True)
+
+    def _search_person(self, name, results):
+        store = self._check_file()
+        name = name.strip()
+        if not name:
+            return []
+        rows = set()
+        ns_soundex, sn_soundex, s_soundex = name_soundexes(name)
+        rows.update(store.soundex_rows('ns_soundex', ns_soundex))
+        if sn_soundex:
+            rows.update(store.soundex_rows('sn_soundex', sn_soundex))
+        if s_soundex:
+            rows.update(store.soundex_rows('s_soundex', s_soundex))
+        results = []
+        for row in sorted(rows):
+            results.append((store.name_ids[row], self._person_data(store, row)))
+        results = scan_names(results, name)
+        return [x[1] for x in results]
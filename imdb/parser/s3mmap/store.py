@@ -0,0 +1,482 @@
+# Copyright 2026 Davide Alberani <da@erlug.linux.it>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""
+This module compiles the s3 dataset into a single, read-only, binary file
+and reads it through a memory map.
+
+The file starts with a magic string, the length of a JSON header and the
+header itself (describing the arrays), followed by the arrays, each one
+aligned to 8 bytes:
+
+- title_ids and name_ids: the sorted tconst and nconst; the row of a title or
+  of a person is found with a binary search;
+- title_columns and name_columns: the values of each row, a fixed number of
+  unsigned integers (the strings are ids in the heap);
+- strings and string_offsets: the heap of the strings; the most repeated
+  ones (kinds, genres, categories, ...) are interned;
+- <name>_offsets and <name>_values: the adjacency arrays, in compressed
+  sparse row format, of the crew, the principals, the akas, the episodes and
+  the known for titles: the values of row i are the ones between offsets[i]
+  and offsets[i + 1];
+- t_soundex, ns_soundex, sn_soundex and s_soundex: the soundex codes of the
+  titles (and of the akas) and of the names, sorted, each one followed by the
+  referenced row; the akas are referenced after the titles.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import gzip
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from imdb._exceptions import IMDbDataAccessError
+from imdb.parser.s3.utils import DB_TRANSFORM, name_soundexes, title_soundex
+
+MAGIC = b'CGMMAP01'
+TSV_EXT = '.tsv.gz'
+# every array starts at a multiple of this number of bytes.
+ALIGNMENT = 8
+# the value of missing integers.
+NONE = 0xFFFFFFFF
+
+TITLE_COLUMNS = ('titleType', 'primaryTitle', 'originalTitle', 'isAdult', 'startYear', 'endYear',
+                 'runtimeMinutes', 'genres', 'averageRating', 'numVotes', 'parentTconst',
+                 'seasonNumber', 'episodeNumber')
+NAME_COLUMNS = ('primaryName', 'birthYear', 'deathYear', 'primaryProfession')
+PRINCIPAL_COLUMNS = ('nconst', 'ordering', 'category', 'job', 'characters')
+AKA_COLUMNS = ('ordering', 'title', 'region', 'language', 'types', 'attributes', 'isOriginalTitle')
+# columns stored in the heap of the strings; the values of some are interned.
+STRING_COLUMNS = frozenset(['titleType', 'primaryTitle', 'originalTitle', 'genres', 'primaryName',
+                            'primaryProfession', 'category', 'job', 'characters', 'title', 'region',
+                            'language', 'types', 'attributes'])
+INTERNED_COLUMNS = frozenset(['titleType', 'genres', 'primaryProfession', 'category', 'job', 'region',
+                              'language', 'types', 'attributes'])
+# the soundex codes of the names, as returned by name_soundexes.
+NAME_SOUNDEX_COLUMNS = ('ns_soundex', 'sn_soundex', 's_soundex')
+# columns stored as integers, multiplied by 10.
+DECIMAL_COLUMNS = frozenset(['averageRating'])
+BOOLEAN_COLUMNS = frozenset(['isAdult', 'isOriginalTitle'])
+
+_logger = logging.getLogger('imdbpy.parser.s3mmap')
+
+
+def soundex_key(code):
+    """Convert a soundex code (an uppercase letter followed by up to 4 digits,
+    never 0) to an integer, preserving the order.
+
+    :param code: the soundex code
+    :type code: str
+    :returns: the integer, 0 if the code is missing
+    :rtype: int
+    """
+    if not code:
+        return 0
+    return (ord(code[0]) << 16) | int(code[1:].ljust(4, '0'))
+
+
+class StringHeap(object):
+    """The strings, encoded in UTF-8 and concatenated; string i is
+    data[offsets[i]:offsets[i + 1]], and 0 is the id of None."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('Q', [0, 0])
+        self._interned = {}
+
+    def add(self, s, intern=False):
+        """Add a string to the heap, returning its id; interned strings are
+        added only once."""
+        if s is None:
+            return 0
+        if intern:
+            string_id = self._interned.get(s)
+            if string_id is not None:
+                return string_id
+        self.data += s.encode('utf-8')
+        self.offsets.append(len(self.data))
+        string_id = len(self.offsets) - 2
+        if intern:
+            self._interned[s] = string_id
+        return string_id
+
+
+def encode(column, value, heap):
+    """Convert a value of a column to an unsigned integer."""
+    if column in STRING_COLUMNS:
+        return heap.add(value, intern=column in INTERNED_COLUMNS)
+    if value is None:
+        return NONE
+    if column in DECIMAL_COLUMNS:
+        return int(round(value * 10))
+    return int(value)
+
+
+def read_dataset(dir_name, table_name):
+    """Yield the rows of a .tsv.gz file, as dictionaries, converting the values
+    as the s3 importer does.
+
+    :param dir_name: the directory with the .tsv.gz files
+    :type dir_name: str
+    :param table_name: the name of the table (like "title_basics")
+    :type table_name: str
+    """
+    fn = os.path.join(dir_name, table_name.replace('_', '.') + TSV_EXT)
+    if not os.path.isfile(fn):
+        _logger.warning('missing file %s' % fn)
+        return
+    _logger.info('reading file %s' % fn)
+    transforms = [(column, conf['transform']) for column, conf in DB_TRANSFORM.get(table_name, {}).items()
+                  if 'transform' in conf]
+    with gzip.open(fn, 'rb') as fd:
+        headers = fd.readline().decode('utf-8').strip().split('\t')
+        for line in fd:
+            s_line = line.decode('utf-8').strip().split('\t')
+            if len(s_line) != len(headers):
+                continue
+            info = dict(zip(headers, [x if x != r'\N' else None for x in s_line]))
+            for column, transform in transforms:
+                if column in info:
+                    info[column] = transform(info[column])
+            yield info
+
+
+def _sort_rows(ids, values, width):
+    """Sort the ids and (in place) the rows of values, if needed."""
+    if all(ids[idx] < ids[idx + 1] for idx in range(len(ids) - 1)):
+        return ids
+    order = sorted(range(len(ids)), key=ids.__getitem__)
+    old_values = values[:]
+    for row, old_row in enumerate(order):
+        values[row * width:(row + 1) * width] = old_values[old_row * width:(old_row + 1) * width]
+    return array('I', [ids[old_row] for old_row in order])
+
+
+def _find(ids, key):
+    """Return the index of key in a sorted array of ids, or None."""
+    if key is None:
+        return None
+    idx = bisect_left(ids, key)
+    if idx < len(ids) and ids[idx] == key:
+        return idx
+    return None
+
+
+def _csr(rows, values, width, count):
+    """Group the entries by row, in the compressed sparse row format.
+
+    :param rows: the row of each entry
+    :type rows: array
+    :param values: the values of the entries, width for each one
+    :type values: array
+    :param width: the number of values of each entry
+    :type width: int
+    :param count: the number of rows
+    :type count: int
+    :returns: the offsets (count + 1), the sorted values and the new
+              position of each entry
+    :rtype: tuple
+    """
+    offsets = array('I', [0]) * (count + 1)
+    for row in rows:
+        offsets[row + 1] += 1
+    for row in range(count):
+        offsets[row + 1] += offsets[row]
+    next_positions = offsets[:-1]
+    sorted_values = array('I', [0]) * len(values)
+    positions = array('I', [0]) * len(rows)
+    for entry, row in enumerate(rows):
+        position = next_positions[row]
+        next_positions[row] += 1
+        positions[entry] = position
+        sorted_values[position * width:(position + 1) * width] = values[entry * width:(entry + 1) * width]
+    return offsets, sorted_values, positions
+
+
+def _soundex_index(codes, refs):
+    """Return the sorted soundex codes, each followed by the referenced row."""
+    keys = sorted((code << 32) | ref for code, ref in zip(codes, refs))
+    index = array('I')
+    for key in keys:
+        index.append(key >> 32)
+        index.append(key & NONE)
+    return index
+
+
+def compile_dataset(dir_name, file_name):
+    """Compile the .tsv.gz files of the s3 dataset into a binary file.
+
+    The file is written under a temporary name and then renamed, so that the
+    processes that are reading the old file are not affected.
+
+    :param dir_name: the directory with the .tsv.gz files
+    :type dir_name: str
+    :param file_name: the binary file to write
+    :type file_name: str
+    """
+    heap = StringHeap()
+    arrays = {}
+
+    title_width = len(TITLE_COLUMNS)
+    basics_columns = TITLE_COLUMNS[:8]
+    basics_missing = [NONE] * (title_width - len(basics_columns))
+    title_ids = array('I')
+    title_values = array('I')
+    for info in read_dataset(dir_name, 'title_basics'):
+        title_ids.append(info['tconst'])
+        title_values.extend([encode(column, info.get(column), heap) for column in basics_columns])
+        title_values.extend(basics_missing)
+    title_ids = _sort_rows(title_ids, title_values, title_width)
+    titles_count = len(title_ids)
+
+    rows = array('I')
+    values = array('I')
+    for table_name, columns in (('title_ratings', ('averageRating', 'numVotes')),
+                                ('title_episode', ('parentTconst', 'seasonNumber', 'episodeNumber'))):
+        indexes = [TITLE_COLUMNS.index(column) for column in columns]
+        for info in read_dataset(dir_name, table_name):
+            row = _find(title_ids, info['tconst'])
+            if row is None:
+                continue
+            for column, idx in zip(columns, indexes):
+                title_values[row * title_width + idx] = encode(column, info.get(column), heap)
+            parent_row = _find(title_ids, info.get('parentTconst'))
+            if parent_row is not None:
+                rows.append(parent_row)
+                values.append(row)
+    arrays['episodes_offsets'], arrays['episodes_values'] = _csr(rows, values, 1, titles_count)[:2]
+
+    crew = {'directors': (array('I'), array('I')), 'writers': (array('I'), array('I'))}
+    for info in read_dataset(dir_name, 'title_crew'):
+        row = _find(title_ids, info['tconst'])
+        if row is None:
+            continue
+        for column, (rows, values) in crew.items():
+            for personID in (info.get(column) or '').split(','):
+                if personID:
+                    rows.append(row)
+                    values.append(int(personID))
+    for column, (rows, values) in crew.items():
+        arrays['%s_offsets' % column], arrays['%s_values' % column] = _csr(rows, values, 1, titles_count)[:2]
+
+    rows = array('I')
+    values = array('I')
+    for info in read_dataset(dir_name, 'title_principals'):
+        row = _find(title_ids, info['tconst'])
+        if row is not None:
+            rows.append(row)
+            values.extend([encode(column, info.get(column), heap) for column in PRINCIPAL_COLUMNS])
+    arrays['principals_offsets'], arrays['principals_values'] = _csr(
+        rows, values, len(PRINCIPAL_COLUMNS), titles_count)[:2]
+
+    codes = array('I')
+    refs = array('I')
+    title_idx = TITLE_COLUMNS.index('primaryTitle')
+    for row in range(titles_count):
+        codes.append(soundex_key(title_soundex(heap_string(heap, title_values[row * title_width + title_idx]) or '')))
+        refs.append(row)
+    rows = array('I')
+    values = array('I')
+    for info in read_dataset(dir_name, 'title_akas'):
+        row = _find(title_ids, info['titleId'])
+        if row is not None:
+            rows.append(row)
+            values.extend([encode(column, info.get(column), heap) for column in AKA_COLUMNS])
+            codes.append(soundex_key(title_soundex(info['title'] or '')))
+    arrays['akas_offsets'], arrays['akas_values'], positions = _csr(rows, values, len(AKA_COLUMNS), titles_count)
+    refs.extend(titles_count + position for position in positions)
+    del positions
+    arrays['t_soundex'] = _soundex_index(codes, refs)
+    arrays['title_ids'] = title_ids
+    arrays['title_columns'] = title_values
+
+    name_width = len(NAME_COLUMNS)
+    name_ids = array('I')
+    name_values = array('I')
+    known_for = {}
+    for info in read_dataset(dir_name, 'name_basics'):
+        name_ids.append(info['nconst'])
+        name_values.extend([encode(column, info.get(column), heap) for column in NAME_COLUMNS])
+        if info.get('knownForTitles'):
+            known_for[info['nconst']] = info['knownForTitles']
+    name_ids = _sort_rows(name_ids, name_values, name_width)
+    rows = array('I')
+    values = array('I')
+    soundexes = dict((column, (array('I'), array('I'))) for column in NAME_SOUNDEX_COLUMNS)
+    for row, nconst in enumerate(name_ids):
+        for movieID in (known_for.get(nconst) or '').split(','):
+            if movieID:
+                rows.append(row)
+                values.append(int(movieID))
+        codes = name_soundexes(heap_string(heap, name_values[row * name_width]) or '')
+        for idx, (column, code) in enumerate(zip(NAME_SOUNDEX_COLUMNS, codes)):
+            # only the first code is searched also when missing.
+            if code or idx == 0:
+                soundexes[column][0].append(soundex_key(code))
+                soundexes[column][1].append(row)
+    del known_for
+    arrays['known_for_offsets'], arrays['known_for_values'] = _csr(rows, values, 1, len(name_ids))[:2]
+    for column, (codes, refs) in soundexes.items():
+        arrays[column] = _soundex_index(codes, refs)
+    arrays['name_ids'] = name_ids
+    arrays['name_columns'] = name_values
+
+    arrays['strings'] = array('B', heap.data)
+    arrays['string_offsets'] = heap.offsets
+    write_arrays(file_name, arrays)
+
+
+def heap_string(heap, string_id):
+    """Return a string of a StringHeap."""
+    if not string_id:
+        return None
+    return heap.data[heap.offsets[string_id]:heap.offsets[string_id + 1]].decode('utf-8')
+
+
+def _aligned(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_arrays(file_name, arrays):
+    """Write a dictionary of arrays in a binary file, through a temporary file."""
+    layout = {}
+    offset = 0
+    for name in sorted(arrays):
+        values = arrays[name]
+        layout[name] = [values.typecode, values.itemsize, offset, len(values)]
+        offset = _aligned(offset + values.itemsize * len(values))
+    header = json.dumps({'byteorder': sys.byteorder, 'arrays': layout}).encode('utf-8')
+    prefix = MAGIC + struct.pack('<Q', len(header)) + header
+    tmp_file_name = '%s.%s.tmp' % (file_name, os.getpid())
+    with open(tmp_file_name, 'wb') as fd:
+        fd.write(prefix)
+        fd.write(b'\0' * (_aligned(len(prefix)) - len(prefix)))
+        for name in sorted(arrays):
+            values = arrays[name]
+            values.tofile(fd)
+            size = values.itemsize * len(values)
+            fd.write(b'\0' * (_aligned(size) - size))
+    os.replace(tmp_file_name, file_name)
+
+
+class Store(object):
+    """The arrays of a binary file, read through a memory map."""
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        with open(file_name, 'rb') as fd:
+            self.stat = os.fstat(fd.fileno())
+            self._mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        self._arrays = {}
+        buffer = memoryview(self._mmap)
+        try:
+            self._read_arrays(buffer)
+        except IMDbDataAccessError:
+            buffer.release()
+            self.close()
+            raise
+        buffer.release()
+        self.title_ids = self._arrays['title_ids']
+        self.name_ids = self._arrays['name_ids']
+        self._strings = self._arrays['strings']
+        self._string_offsets = self._arrays['string_offsets']
+
+    def _read_arrays(self, buffer):
+        """Read the header and create a view of each array."""
+        prefix_length = len(MAGIC) + 8
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise IMDbDataAccessError('%s is not a compiled s3 dataset' % self.file_name)
+        header_length = struct.unpack('<Q', buffer[len(MAGIC):prefix_length])[0]
+        try:
+            header = json.loads(bytes(buffer[prefix_length:prefix_length + header_length]).decode('utf-8'))
+        except ValueError:
+            raise IMDbDataAccessError('%s is not a compiled s3 dataset' % self.file_name)
+        start = _aligned(prefix_length + header_length)
+        for name, (typecode, itemsize, offset, count) in header['arrays'].items():
+            if header['byteorder'] != sys.byteorder or array(typecode).itemsize != itemsize:
+                raise IMDbDataAccessError('%s was compiled on a different platform' % self.file_name)
+            self._arrays[name] = buffer[start + offset:start + offset + itemsize * count].cast(typecode)
+
+    def close(self):
+        """Release the arrays and close the memory map."""
+        for values in self._arrays.values():
+            values.release()
+        self._arrays = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            # a view is still in use: the map is closed when it's garbage collected.
+            pass
+
+    def string(self, string_id):
+        """Return a string of the heap."""
+        if not string_id:
+            return None
+        return str(self._strings[self._string_offsets[string_id]:self._string_offsets[string_id + 1]], 'utf-8')
+
+    def decode(self, column, value):
+        """Convert a value of a column back, from an unsigned integer."""
+        if column in STRING_COLUMNS:
+            return self.string(value)
+        if value == NONE:
+            return None
+        if column in BOOLEAN_COLUMNS:
+            return bool(value)
+        if column in DECIMAL_COLUMNS:
+            return value / 10
+        return value
+
+    def find(self, ids, key):
+        """Return the row of a key in title_ids or name_ids, or None."""
+        return _find(ids, key)
+
+    def row(self, name, row, columns):
+        """Return a dictionary with the values of a row of title_columns or name_columns."""
+        width = len(columns)
+        return dict((column, self.decode(column, value))
+                    for column, value in zip(columns, self._arrays[name][row * width:(row + 1) * width].tolist()))
+
+    def related(self, name, row, columns=None):
+        """Return the entries of a row of an adjacency array: dictionaries with
+        the values of the given columns, or the single values."""
+        offsets = self._arrays['%s_offsets' % name]
+        if columns is None:
+            return self._arrays['%s_values' % name][offsets[row]:offsets[row + 1]].tolist()
+        width = len(columns)
+        values = self._arrays['%s_values' % name][offsets[row] * width:offsets[row + 1] * width].tolist()
+        return [dict((column, self.decode(column, value)) for column, value in zip(columns, values[idx:idx + width]))
+                for idx in range(0, len(values), width)]
+
+    def entry(self, name, position, columns):
+        """Return the row and a dictionary with the values of an entry of an
+        adjacency array, given its position."""
+        width = len(columns)
+        row = bisect_right(self._arrays['%s_offsets' % name], position) - 1
+        values = self._arrays['%s_values' % name][position * width:(position + 1) * width].tolist()
+        return row, dict((column, self.decode(column, value)) for column, value in zip(columns, values))
+
+    def soundex_rows(self, name, code):
+        """Return the rows referenced by a soundex code, in one of the soundex indexes."""
+        key = soundex_key(code)
+        index = self._arrays[name]
+        codes = index[::2]
+        return index[bisect_left(codes, key) * 2 + 1:bisect_right(codes, key) * 2:2].tolist()
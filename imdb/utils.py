@@ -21,17 +21,28 @@ This module provides basic utilities for the imdb package.
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import io
+import pickle
 import re
 import string
 import sys
+from collections import OrderedDict
+from contextlib import contextmanager
 from copy import copy, deepcopy
 from functools import total_ordering
-from time import strftime, strptime
+from operator import attrgetter, is_
+from threading import Lock, local
+from time import strftime, strptime, time
 
 from imdb import linguistics
-from imdb._exceptions import IMDbParserError
+from imdb._exceptions import IMDbError, IMDbParserError
 from imdb._logging import imdbpyLogger
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 PY2 = sys.hexversion < 0x3000000
 
 # Logger for imdb.utils module.
@@ -80,9 +91,128 @@ _sname_suffixes = ('de', 'la', 'der', 'den', 'del', 'y', 'da', 'van',
                    'e', 'von', 'the', 'di', 'du', 'el', 'al')
 
 
+class LRUCache(object):
+    """A thread-safe dictionary that holds up to maxsize items, discarding
+    the least recently used ones and, if ttl is set, the ones stored more
+    than ttl seconds ago; it counts hits and misses."""
+    def __init__(self, maxsize=4096, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """Return the value of the given key, marking it as recently used."""
+        with self._lock:
+            try:
+                value, expires = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires < time():
+                self.misses += 1
+                return default
+            self._data[key] = (value, expires)
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        expires = time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self, counters=True):
+        """Remove every item and, by default, reset the counters."""
+        with self._lock:
+            self._data.clear()
+            if counters:
+                self.hits = self.misses = 0
+
+    def stats(self):
+        """Return a dictionary with the hits, misses, hit rate and size."""
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hitRate': float(self.hits) / lookups if lookups else 0.0,
+                'size': len(self._data), 'maxsize': self.maxsize, 'ttl': self.ttl}
+
+
+# Caches of the functions used to analyze and build titles and names.
+_missing = object()
+_canonicalNames = LRUCache()
+_analyzedNames = LRUCache()
+_canonicalTitles = LRUCache()
+_analyzedTitles = LRUCache()
+_builtTitles = LRUCache()
+
+_parsingCaches = {
+    'canonicalName': _canonicalNames,
+    'analyze_name': _analyzedNames,
+    'canonicalTitle': _canonicalTitles,
+    'analyze_title': _analyzedTitles,
+    'build_title': _builtTitles
+}
+
+
+def parsing_cache_stats():
+    """Return the statistics of the caches of canonicalName, analyze_name,
+    canonicalTitle, analyze_title and build_title."""
+    return dict((name, cache.stats()) for name, cache in _parsingCaches.items())
+
+
+def clear_parsing_caches():
+    """Empty the caches of canonicalName, analyze_name, canonicalTitle,
+    analyze_title and build_title."""
+    for cache in _parsingCaches.values():
+        cache.clear()
+
+
+class _FrozenDict(tuple):
+    """The items of a cached dictionary."""
+    __slots__ = ()
+
+
+class _FrozenList(tuple):
+    """The items of a cached list."""
+    __slots__ = ()
+
+
+def _freeze(o):
+    """Return the immutable version of a dictionary or a list, to be cached."""
+    if isinstance(o, dict):
+        return _FrozenDict((k, _freeze(v)) for k, v in o.items())
+    if isinstance(o, list):
+        return _FrozenList(_freeze(v) for v in o)
+    return o
+
+
+def _thaw(o):
+    """Return a new dictionary or list from the cached items."""
+    if isinstance(o, _FrozenDict):
+        return dict((k, _thaw(v)) for k, v in o)
+    if isinstance(o, _FrozenList):
+        return [_thaw(v) for v in o]
+    return o
+
+
 def canonicalName(name):
     """Return the given name in canonical "Surname, Name" format.
     It assumes that name is in the 'Name Surname' format."""
+    canonical = _canonicalNames.get(name, _missing)
+    if canonical is _missing:
+        canonical = _canonicalNames[name] = _canonicalName(name)
+    return canonical
+
+
+def _canonicalName(name):
+    """Uncached version of canonicalName."""
     # XXX: some statistics (as of 17 Apr 2008, over 2288622 names):
     #      - just a surname:                 69476
     #      - single surname, single name:  2209656
@@ -154,6 +284,21 @@ def analyze_name(name, canonical=None):
 
     raise an IMDbParserError exception if the name is not valid.
     """
+    key = (name, canonical)
+    res = _analyzedNames.get(key)
+    if res is None:
+        res = _analyzedNames[key] = _freeze(_analyze_name(name, canonical))
+    return _thaw(res)
+
+
+def analyze_names(names, canonical=None):
+    """Return a list of dictionaries, analyzing every name in names;
+    see analyze_name."""
+    return [analyze_name(name, canonical=canonical) for name in names]
+
+
+def _analyze_name(name, canonical=None):
+    """Uncached version of analyze_name."""
     original_n = name
     name = name.split(' aka ')[0].strip()
     res = {}
@@ -214,6 +359,15 @@ def canonicalTitle(title, lang=None, imdbIndex=None):
     beware that it doesn't handle long imdb titles.
     The 'lang' argument can be used to specify the language of the title.
     """
+    key = (title, lang, imdbIndex)
+    canonical = _canonicalTitles.get(key)
+    if canonical is None:
+        canonical = _canonicalTitles[key] = _canonicalTitle(title, lang, imdbIndex)
+    return canonical
+
+
+def _canonicalTitle(title, lang=None, imdbIndex=None):
+    """Uncached version of canonicalTitle."""
     isUnicode = isinstance(title, str)
     articlesDicts = linguistics.articlesDictsForLang(lang)
     try:
@@ -309,6 +463,23 @@ def analyze_title(title, canonical=None, canonicalSeries=None, canonicalEpisode=
 
     raise an IMDbParserError exception if the title is not valid.
     """
+    key = (title, canonical, canonicalSeries, canonicalEpisode)
+    result = _analyzedTitles.get(key)
+    if result is None:
+        result = _analyzedTitles[key] = _freeze(
+            _analyze_title(title, canonical, canonicalSeries, canonicalEpisode))
+    return _thaw(result)
+
+
+def analyze_titles(titles, canonical=None, canonicalSeries=None, canonicalEpisode=None):
+    """Return a list of dictionaries, analyzing every title in titles;
+    see analyze_title."""
+    return [analyze_title(title, canonical=canonical, canonicalSeries=canonicalSeries,
+                          canonicalEpisode=canonicalEpisode) for title in titles]
+
+
+def _analyze_title(title, canonical=None, canonicalSeries=None, canonicalEpisode=None):
+    """Uncached version of analyze_title."""
     # XXX: introduce the 'lang' argument?
     if canonical is not None:
         canonicalSeries = canonicalEpisode = canonical
@@ -534,21 +705,41 @@ def build_title(title_dict, canonical=None, canonicalSeries=None,
             episode_title = '{%s}' % episode_title
         return '%s %s' % (pre_title, episode_title)
     title = title_dict.get('title', '')
-    imdbIndex = title_dict.get('imdbIndex', '')
     if not title:
         return ''
+    imdbIndex = title_dict.get('imdbIndex')
+    year = title_dict.get('year')
+    key = (title, imdbIndex, year, kind, canonical, ptdf, lang, _doYear, appendKind)
+    try:
+        built = _builtTitles.get(key)
+    except TypeError:
+        # Unhashable values.
+        return _build_title(*key)
+    if built is None:
+        built = _builtTitles[key] = _build_title(*key)
+    return built
+
+
+def build_titles(title_dicts, canonical=None, canonicalSeries=None,
+                 canonicalEpisode=None, ptdf=False, lang=None, appendKind=True):
+    """Return a list of strings, building the title of every dictionary
+    in title_dicts; see build_title."""
+    return [build_title(title_dict, canonical=canonical, canonicalSeries=canonicalSeries,
+                        canonicalEpisode=canonicalEpisode, ptdf=ptdf, lang=lang,
+                        appendKind=appendKind) for title_dict in title_dicts]
+
+
+def _build_title(title, imdbIndex, year, kind, canonical, ptdf, lang, _doYear, appendKind):
+    """Build the title of a movie that is not an episode; see build_title."""
     if canonical is not None:
         if canonical:
-            title = canonicalTitle(title, lang=lang, imdbIndex=imdbIndex)
+            title = canonicalTitle(title, lang=lang, imdbIndex=imdbIndex or '')
         else:
             title = normalizeTitle(title, lang=lang)
-    if pre_title:
-        title = '%s %s' % (pre_title, title)
     if kind in ('tv series', 'tv mini series'):
         title = '"%s"' % title
     if _doYear:
-        year = str(title_dict.get('year')) or '????'
-        imdbIndex = title_dict.get('imdbIndex')
+        year = str(year) or '????'
         if not ptdf:
             if imdbIndex and (canonical is None or canonical):
                 title += ' (%s)' % imdbIndex
@@ -755,6 +946,99 @@ def cmpCompanies(p1, p2):
     return 0
 
 
+@total_ordering
+class _Descending:
+    """Wrap a value to reverse its order in a sort key."""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        if not isinstance(other, _Descending):
+            return NotImplemented
+        return other.value < self.value
+
+    def __eq__(self, other):
+        if not isinstance(other, _Descending):
+            return NotImplemented
+        return self.value == other.value
+
+
+# Key of the cached sort key, in the cache of the computed keys.
+_sortKeyCache = object()
+
+# Sort keys of the missing values: like _last, they are bigger than anything.
+_lastKey = (1,)
+_lastDescKey = (0,)
+
+
+def _ascKey(value):
+    """Sort key of a value sorted in ascending order."""
+    if value is None or value is _last:
+        return _lastKey
+    return (0, value)
+
+
+def _descKey(value):
+    """Sort key of a value sorted in descending order."""
+    if value is None or value is _last:
+        return _lastDescKey
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (1, -value)
+    return (1, _Descending(value))
+
+
+def movieSortKey(movie):
+    """Return a tuple to sort movies (or dictionaries) in the same order
+    of cmpMovies: by year in reverse order, title, imdbIndex and movieID
+    in reverse order.
+    Tv series' episodes are not compared by the year of their series and
+    their own title, like cmpMovies does (that's not a consistent order,
+    in a list with other movies): the key of an episode is the key of its
+    series, followed by season and episode in reverse order, so that the
+    episodes of a series are always sorted together."""
+    series = movie.get('episode of')
+    if series is not None:
+        if isinstance(series, _Container):
+            key = series.sort_key()
+        else:
+            key = movieSortKey(series)
+        key += (_descKey(movie.get('season')), _descKey(movie.get('episode')))
+    else:
+        try:
+            year = int(movie.get('year', 0))
+        except (ValueError, TypeError):
+            year = 0
+        key = (-year,)
+    return key + (_ascKey(movie.get('title')), _descKey(movie.get('imdbIndex')),
+                  _descKey(getattr(movie, 'movieID', None)))
+
+
+def nameSortKey(person):
+    """Return a tuple to sort persons or characters (or dictionaries)
+    by name and imdbIndex."""
+    name = person.get('canonical name')
+    if name is None:
+        name = person.get('name')
+    return (_ascKey(name), _ascKey(person.get('imdbIndex')))
+
+
+def peopleSortKey(person):
+    """Return a tuple to sort persons or characters (or dictionaries) in the
+    same order of cmpPeople."""
+    return (_ascKey(getattr(person, 'billingPos', None) or None),) + nameSortKey(person)
+
+
+def companySortKey(company):
+    """Return a tuple to sort companies (or dictionaries) in the same order
+    of cmpCompanies."""
+    name = company.get('long imdb name')
+    if name is None:
+        name = company.get('name')
+    return (_ascKey(name), _ascKey(company.get('country')))
+
+
 # References to titles, names and characters.
 # XXX: find better regexp!
 re_titleRef = re.compile(
@@ -866,14 +1150,25 @@ class RolesList(list):
 # _re_amp = re.compile(r'(?<=\W)&(?=[^a-zA-Z0-9_#])')
 _re_amp = re.compile(r'&(?![^a-zA-Z0-9_#]{1,5};)')
 
+# Translation table used to escape the other chars.
+_xml_escapes = {
+    ord('"'): '&quot;',
+    ord("'"): '&apos;',
+    ord('<'): '&lt;',
+    ord('>'): '&gt;'
+}
+
 
 def escape4xml(value):
     """Escape some chars that can't be present in a XML value."""
     if isinstance(value, (int, float)):
         value = str(value)
     value = _re_amp.sub('&amp;', value)
-    value = value.replace('"', '&quot;').replace("'", '&apos;')
-    value = value.replace('<', '&lt;').replace('>', '&gt;')
+    if isinstance(value, str):
+        value = value.translate(_xml_escapes)
+    else:
+        value = value.replace('"', '&quot;').replace("'", '&apos;')
+        value = value.replace('<', '&lt;').replace('>', '&gt;')
     if isinstance(value, bytes):
         value = value.decode('utf-8', 'xmlcharrefreplace')
     return value
@@ -1054,6 +1349,16 @@ def _seq2xml(seq, _l=None, withRefs=False, modFunct=None,
     unicode strings."""
     if _l is None:
         _l = []
+    _write_seq2xml(_l.append, seq, withRefs, modFunct, titlesRefs, namesRefs,
+                   charactersRefs, _topLevel, key2infoset, fullpath)
+    return _l
+
+
+def _write_seq2xml(write, seq, withRefs=False, modFunct=None,
+                   titlesRefs=None, namesRefs=None, charactersRefs=None,
+                   _topLevel=True, key2infoset=None, fullpath=''):
+    """Convert a sequence or a dictionary to XML, passing the unicode
+    strings to the write function."""
     if isinstance(seq, dict):
         for key in seq:
             value = seq[key]
@@ -1076,11 +1381,11 @@ def _seq2xml(seq, _l=None, withRefs=False, modFunct=None,
                     openTag += ' type="float"'
                 openTag += '>'
                 closeTag = '</%s>' % tagName
-            _l.append(openTag)
-            _seq2xml(value, _l, withRefs, modFunct, titlesRefs,
-                     namesRefs, charactersRefs, _topLevel=False,
-                     fullpath='%s.%s' % (fullpath, tagName))
-            _l.append(closeTag)
+            write(openTag)
+            _write_seq2xml(write, value, withRefs, modFunct, titlesRefs,
+                           namesRefs, charactersRefs, _topLevel=False,
+                           fullpath='%s.%s' % (fullpath, tagName))
+            write(closeTag)
     elif isinstance(seq, (list, tuple)):
         tagName, attrs = _tagAttr('item', fullpath)
         beginTag = '<%s' % tagName
@@ -1090,9 +1395,9 @@ def _seq2xml(seq, _l=None, withRefs=False, modFunct=None,
         closeTag = '</%s>' % tagName
         for item in seq:
             if isinstance(item, _Container):
-                _seq2xml(item, _l, withRefs, modFunct, titlesRefs,
-                         namesRefs, charactersRefs, _topLevel=False,
-                         fullpath='%s.%s' % (fullpath, item.__class__.__name__.lower()))
+                _write_seq2xml(write, item, withRefs, modFunct, titlesRefs,
+                               namesRefs, charactersRefs, _topLevel=False,
+                               fullpath='%s.%s' % (fullpath, item.__class__.__name__.lower()))
             else:
                 openTag = beginTag
                 if isinstance(item, int):
@@ -1100,22 +1405,47 @@ def _seq2xml(seq, _l=None, withRefs=False, modFunct=None,
                 elif isinstance(item, float):
                     openTag += ' type="float"'
                 openTag += '>'
-                _l.append(openTag)
-                _seq2xml(item, _l, withRefs, modFunct, titlesRefs,
-                         namesRefs, charactersRefs, _topLevel=False,
-                         fullpath='%s.%s' % (fullpath, tagName))
-                _l.append(closeTag)
+                write(openTag)
+                _write_seq2xml(write, item, withRefs, modFunct, titlesRefs,
+                               namesRefs, charactersRefs, _topLevel=False,
+                               fullpath='%s.%s' % (fullpath, tagName))
+                write(closeTag)
     else:
         if isinstance(seq, _Container):
-            _l.extend(_tag4TON(seq))
+            for tag in _tag4TON(seq):
+                write(tag)
         elif seq:
             # Text, ints, floats and the like.
-            _l.append(_normalizeValue(seq, withRefs=withRefs,
-                                      modFunct=modFunct,
-                                      titlesRefs=titlesRefs,
-                                      namesRefs=namesRefs,
-                                      charactersRefs=charactersRefs))
-    return _l
+            write(_normalizeValue(seq, withRefs=withRefs,
+                                  modFunct=modFunct,
+                                  titlesRefs=titlesRefs,
+                                  namesRefs=namesRefs,
+                                  charactersRefs=charactersRefs))
+
+
+class _BlockWriter(object):
+    """Collect strings, passing them to a write function in blocks."""
+    def __init__(self, write, encoding=None, blockSize=65536):
+        self._write = write
+        self._encoding = encoding
+        self._blockSize = blockSize
+        self._chunks = []
+        self._size = 0
+
+    def write(self, chunk):
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        if self._size >= self._blockSize:
+            self.flush()
+
+    def flush(self):
+        block = ''.join(self._chunks)
+        self._chunks = []
+        self._size = 0
+        if self._encoding:
+            block = block.encode(self._encoding)
+        if block:
+            self._write(block)
 
 
 _xmlHead = """<?xml version="1.0"?>
@@ -1124,9 +1454,62 @@ _xmlHead = """<?xml version="1.0"?>
 """
 
 
+class _LazyAttribute(object):
+    """A dictionary or a list stored in a slot of a _Container instance;
+    it is created only when it's first accessed, since for most objects
+    (e.g.: the persons in a cast) it will never be used."""
+    def __init__(self, slot, factory, doc=None):
+        self.slot = slot
+        self.factory = factory
+        self.__doc__ = doc
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        if value is None:
+            value = self.factory()
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+
+def _same_values(values, data):
+    """Return True if the values of the data dictionary are the same objects."""
+    return len(values) == len(data) and all(map(is_, values, data.values()))
+
+
+def _contained_items(seq):
+    """Return the items of a list or a tuple, or the keys and the values
+    of a dictionary or of the data of an object."""
+    if isinstance(seq, _Container):
+        seq = seq._data
+    if isinstance(seq, dict):
+        return tuple(seq) + tuple(seq.values())
+    return tuple(seq)
+
+
+_get_role = attrgetter('_Container__role')
+
+
+def _same_items(items, seq):
+    """Return True if the items of seq are the same objects."""
+    current = _contained_items(seq)
+    return len(items) == len(current) and all(map(is_, items, current))
+
+
 @total_ordering
 class _Container(object):
     """Base class for Movie, Person, Character and Company classes."""
+    __slots__ = ('_data', '_pending_infosets', '_lazy_lookup', 'myID', 'notes',
+                 'accessSystem', 'modFunct', '_roleIsPerson', '__role',
+                 '_titlesRefs', '_namesRefs', '_charactersRefs',
+                 '_current_info', '_infoset2keys', '_key2infoset', '_modCache',
+                 '_computedCache', '_containedIndex', '_cacheState',
+                 '__weakref__')
+
     # The default sets of information retrieved.
     default_info = ()
 
@@ -1139,9 +1522,23 @@ class _Container(object):
     # Function used to compare two instances of this class.
     cmpFunct = None
 
+    # Function returning the sort key of an instance of this class,
+    # computed from its data and consistent with cmpFunct.
+    sortKeyFunct = None
+
     # key that contains the cover/headshot
     _image_key = None
 
+    # Types descended looking for the objects contained in the data.
+    _contained_descend = (list, dict, tuple)
+
+    # Keys computed by _getitem from the data; their values are cached.
+    # If None, _getitem is called for every key.
+    _computed_keys = None
+
+    # Keys of the lists whose content is used to compute them.
+    _computed_lists = ()
+
     def __init__(self, myID=None, data=None, notes='',
                  currentRole='', roleID=None, roleIsPerson=False,
                  accessSystem=None, titlesRefs=None, namesRefs=None,
@@ -1174,26 +1571,14 @@ class _Container(object):
             data = {}
         self.set_data(data, override=True)
         self.notes = notes
-        if titlesRefs is None:
-            titlesRefs = {}
         self.update_titlesRefs(titlesRefs)
-        if namesRefs is None:
-            namesRefs = {}
         self.update_namesRefs(namesRefs)
-        if charactersRefs is None:
-            charactersRefs = {}
         self.update_charactersRefs(charactersRefs)
         self.set_mod_funct(modFunct)
-        self.keys_tomodify = {}
-        for item in self.keys_tomodify_list:
-            self.keys_tomodify[item] = None
+        params = getattr(_objects_params, 'current', None)
+        if params is not None:
+            self.accessSystem, self.modFunct = params
         self._roleIsPerson = roleIsPerson
-        if not roleIsPerson:
-            from imdb.Character import Character
-            self._roleClass = Character
-        else:
-            from imdb.Person import Person
-            self._roleClass = Person
         self.currentRole = currentRole
         if roleID:
             self.roleID = roleID
@@ -1237,6 +1622,32 @@ class _Container(object):
     roleID = property(_get_roleID, _set_roleID,
                       doc="the characterID or personID of the currentRole object.")
 
+    @property
+    def _roleClass(self):
+        """The class of the currentRole object."""
+        if not self._roleIsPerson:
+            from imdb.Character import Character
+            return Character
+        from imdb.Person import Person
+        return Person
+
+    @property
+    def keys_tomodify(self):
+        """The keys whose values are modified by modFunct; it's built
+        from keys_tomodify_list and shared by every instance of a class."""
+        cls = self.__class__
+        keys = cls.__dict__.get('_keys_tomodify')
+        if keys is None:
+            keys = cls._keys_tomodify = dict.fromkeys(cls.keys_tomodify_list)
+        return keys
+
+    titlesRefs = _LazyAttribute('_titlesRefs', dict, doc="The references to movies.")
+    namesRefs = _LazyAttribute('_namesRefs', dict, doc="The references to persons.")
+    charactersRefs = _LazyAttribute('_charactersRefs', dict, doc="The references to characters.")
+    current_info = _LazyAttribute('_current_info', list, doc="The sets of information retrieved.")
+    infoset2keys = _LazyAttribute('_infoset2keys', dict, doc="The keys of every set of information.")
+    key2infoset = _LazyAttribute('_key2infoset', dict, doc="The set of information of every key.")
+
     def _get_currentRole(self):
         """Return a Character or Person instance."""
         if self.__role:
@@ -1288,18 +1699,41 @@ class _Container(object):
                 return url
             return url[:prev_dot] + url[ext_idx:]
 
+    def _get_data(self):
+        """Return the data dictionary, parsing any pending set of
+        information first."""
+        if self._pending_infosets and not self._lazy_lookup:
+            self.materialize()
+        return self._data
+
+    def _set_data(self, data):
+        """Set the data dictionary."""
+        self._data = data
+        self._clear_cache()
+
+    data = property(_get_data, _set_data,
+                    doc="The dictionary with the information about this object.")
+
     def reset(self):
         """Reset the object."""
-        self.data = {}
+        self._pending_infosets = None
+        self._lazy_lookup = False
+        self._data = {}
         self.myID = None
         self.notes = ''
-        self.titlesRefs = {}
-        self.namesRefs = {}
-        self.charactersRefs = {}
+        self.accessSystem = None
+        self._roleIsPerson = False
+        self._titlesRefs = None
+        self._namesRefs = None
+        self._charactersRefs = None
         self.modFunct = modClearRefs
-        self.current_info = []
-        self.infoset2keys = {}
-        self.key2infoset = {}
+        self._current_info = None
+        self._infoset2keys = None
+        self._key2infoset = None
+        self._modCache = None
+        self._computedCache = None
+        self._containedIndex = None
+        self._cacheState = None
         self.__role = None
         self._reset()
 
@@ -1308,14 +1742,19 @@ class _Container(object):
 
     def clear(self):
         """Reset the dictionary."""
+        self._pending_infosets = None
         self.data.clear()
         self.notes = ''
-        self.titlesRefs = {}
-        self.namesRefs = {}
-        self.charactersRefs = {}
-        self.current_info = []
-        self.infoset2keys = {}
-        self.key2infoset = {}
+        self._titlesRefs = None
+        self._namesRefs = None
+        self._charactersRefs = None
+        self._current_info = None
+        self._infoset2keys = None
+        self._key2infoset = None
+        self._modCache = None
+        self._computedCache = None
+        self._containedIndex = None
+        self._cacheState = None
         self.__role = None
         self._clear()
 
@@ -1351,17 +1790,89 @@ class _Container(object):
 
     def has_current_info(self, val):
         """Return true if the given set of information is in the list."""
-        return val in self.current_info
+        return bool(self._current_info) and val in self._current_info
+
+    def add_pending_info(self, val, loader):
+        """Add a set of information that was retrieved but not yet parsed;
+        loader is called with this object as its only argument, the first
+        time a key not already in the data dictionary is requested.
+        If loader raises an exception or returns False, the set of
+        information is dropped: it can be retrieved again with update()."""
+        if self._pending_infosets is None:
+            self._pending_infosets = {}
+        self._pending_infosets[val] = loader
+
+    def has_pending_info(self, val):
+        """Return true if the given set of information is waiting to be parsed."""
+        return bool(self._pending_infosets) and val in self._pending_infosets
+
+    def get_pending_info(self):
+        """Return the list of sets of information waiting to be parsed."""
+        return list(self._pending_infosets or ())
+
+    def materialize(self, infoset=None):
+        """Parse the given pending set of information or, if infoset
+        is None, every pending set of information."""
+        if not self._pending_infosets:
+            return
+        if infoset is None:
+            infosets = list(self._pending_infosets)
+        else:
+            infosets = [infoset]
+        for val in infosets:
+            loader = self._pending_infosets.pop(val, None)
+            if loader is not None:
+                loader(self)
 
     def set_mod_funct(self, modFunct):
         """Set the fuction used to modify the strings."""
         if modFunct is None:
             modFunct = modClearRefs
         self.modFunct = modFunct
+        self._modCache = None
+
+    def _lists_state(self):
+        """Return the content of the lists the computed keys depend on."""
+        data = self._data
+        return tuple(tuple(data[key]) for key in self._computed_lists if isinstance(data.get(key), list))
+
+    def _data_state(self):
+        """Return the state of the data the cached values are computed from:
+        the data dictionary, its values, the values of the objects among
+        them (e.g.: the series of an episode) and the content of the lists
+        used by the computed keys (e.g.: the languages of a movie)."""
+        data = self._data
+        values = tuple(data.values())
+        return data, values, [(value, tuple(value._data.values()))
+                              for value in values if isinstance(value, _Container)], self._lists_state()
+
+    def _check_cache(self):
+        """Forget the values computed from the data, if it was changed since
+        they were cached without using the methods of this object: directly
+        in the data dictionary, by another object sharing it (see IdentityMap)
+        or in one of the objects it contains."""
+        state = self._cacheState
+        if state is not None:
+            data, values, contained, lists = state
+            if data is self._data and _same_values(values, data) and \
+                    (not contained or all(_same_values(cvalues, obj._data) for obj, cvalues in contained)) and \
+                    (not lists or lists == self._lists_state()):
+                return
+            self._computedCache = None
+        self._cacheState = self._data_state()
+
+    def _clear_cache(self):
+        """Forget the values computed from the data and the references."""
+        self._modCache = None
+        self._computedCache = None
+        self._containedIndex = None
+        self._cacheState = None
 
     def update_titlesRefs(self, titlesRefs):
         """Update the dictionary with the references to movies."""
-        self.titlesRefs.update(titlesRefs)
+        if titlesRefs:
+            self.titlesRefs.update(titlesRefs)
+            self._clear_cache()
 
     def get_titlesRefs(self):
         """Return the dictionary with the references to movies."""
@@ -1369,7 +1880,9 @@ class _Container(object):
 
     def update_namesRefs(self, namesRefs):
         """Update the dictionary with the references to names."""
-        self.namesRefs.update(namesRefs)
+        if namesRefs:
+            self.namesRefs.update(namesRefs)
+            self._clear_cache()
 
     def get_namesRefs(self):
         """Return the dictionary with the references to names."""
@@ -1377,7 +1890,9 @@ class _Container(object):
 
     def update_charactersRefs(self, charactersRefs):
         """Update the dictionary with the references to characters."""
-        self.charactersRefs.update(charactersRefs)
+        if charactersRefs:
+            self.charactersRefs.update(charactersRefs)
+            self._clear_cache()
 
     def get_charactersRefs(self):
         """Return the dictionary with the references to characters."""
@@ -1389,21 +1904,35 @@ class _Container(object):
         are merged.
         """
         if not override:
-            self.data.update(data)
+            self._data.update(data)
         else:
-            self.data = data
+            self._data = data
+        self._clear_cache()
 
     def getID(self):
         """Return movieID, personID, characterID or companyID."""
         raise NotImplementedError('override this method')
 
+    def sort_key(self):
+        """Return a tuple that can be used to sort a list of objects
+        of this class, e.g.: movies.sort(key=Movie.sort_key)"""
+        if self.sortKeyFunct is None:
+            return ()
+        self._check_cache()
+        if self._computedCache is None:
+            self._computedCache = {}
+        key = self._computedCache.get(_sortKeyCache)
+        if key is None:
+            key = self._computedCache[_sortKeyCache] = self.sortKeyFunct()
+        return key
+
     def __lt__(self, other):
         """Compare two Movie, Person, Character or Company objects."""
-        if self.cmpFunct is None:
+        if self.sortKeyFunct is None:
             return False
         if not isinstance(other, self.__class__):
             return False
-        return self.cmpFunct(other) == -1
+        return self.sort_key() < other.sort_key()
 
     def __eq__(self, other):
         """Compare two Movie, Person, Character or Company objects."""
@@ -1415,6 +1944,10 @@ class _Container(object):
 
     def __hash__(self):
         """Hash for this object."""
+        return hash(self._identity())
+
+    def _identity(self):
+        """Return the string identifying this object, used to compute its hash."""
         # XXX: does it always work correctly?
         theID = self.getID()
         if theID is not None and self.accessSystem not in ('UNKNOWN', None):
@@ -1426,12 +1959,61 @@ class _Container(object):
             s4h = '%s:%s[%s]' % (self.__class__.__name__, theID, acs)
         else:
             s4h = repr(self)
-        return hash(s4h)
+        return s4h
 
     def isSame(self, other):
         """Return True if the two represent the same object."""
         return isinstance(other, self.__class__) and hash(self) == hash(other)
 
+    def _get_contained(self):
+        """Return the set of the identities of the objects contained in
+        the data and, prefixed by the class of the object, of their roles;
+        it's built on first use and rebuilt when the data is changed: the
+        items of every list, dictionary and object visited to build it
+        (and the roles of the objects found) are kept to notice it."""
+        if self._containedIndex is not None:
+            index, visited, objects, roles = self._containedIndex
+            if all(_same_items(items, seq) for seq, items in visited) and \
+                    all(map(is_, roles, map(_get_role, objects))):
+                return index
+        index = set()
+        visited = []
+        objects = {}
+        seen = set()
+        toDescend = self._contained_descend
+        stack = [self]
+        while stack:
+            seq = stack.pop()
+            items = _contained_items(seq)
+            visited.append((seq, items))
+            for item in items:
+                if isinstance(item, _Container):
+                    index.add(item._identity())
+                    objects[id(item)] = item
+                    if isinstance(item.__role, _Container):
+                        index.add('%s>%s' % (item.__class__.__name__, item.__role._identity()))
+                if isinstance(item, toDescend) and not isinstance(item, (str, bytes, int, float)) \
+                        and id(item) not in seen:
+                    seen.add(id(item))
+                    stack.append(item)
+        objects = tuple(objects.values())
+        self._containedIndex = (index, visited, objects, tuple(map(_get_role, objects)))
+        return index
+
+    def _contains(self, item, roleOf=None):
+        """Return True if item is contained in the data or, if roleOf
+        is the name of a class, is the role of such an object."""
+        key = item._identity()
+        if roleOf is not None:
+            key = '%s>%s' % (roleOf, key)
+        return key in self._get_contained()
+
+    def _same_occurrence(self, other):
+        """Return True if other can be replaced by this object, having
+        no role and the same notes (see IdentityMap)."""
+        return self.__role is None and other.__role is None and \
+            self.notes == other.notes and self.myID == other.myID
+
     def __len__(self):
         """Number of items in the data dictionary."""
         return len(self.data)
@@ -1440,6 +2022,14 @@ class _Container(object):
         """Return a XML representation of the specified key, or None
         if empty.  If _with_add_keys is False, dinamically generated
         keys are excluded."""
+        chunks = []
+        if not self._write_key_xml(chunks.append, key, _with_add_keys=_with_add_keys):
+            return None
+        return ''.join(chunks)
+
+    def _write_key_xml(self, write, key, _with_add_keys=True):
+        """Pass the XML representation of the specified key to the
+        write function; return False if it's empty."""
         # Prevent modifyStrings in __getitem__ to be called; if needed,
         # it will be called by the _normalizeValue function.
         origModFunct = self.modFunct
@@ -1451,7 +2041,7 @@ class _Container(object):
         key = self.keys_alias.get(key, key)
         if (not _with_add_keys) and (key in self._additional_keys()):
             self.modFunct = origModFunct
-            return None
+            return False
         try:
             withRefs = False
             if key in self.keys_tomodify and \
@@ -1459,31 +2049,43 @@ class _Container(object):
                 withRefs = True
             value = self.get(key)
             if value is None:
-                return None
+                return False
             tag = self.__class__.__name__.lower()
-            return ''.join(_seq2xml({key: value}, withRefs=withRefs,
-                                    modFunct=origModFunct,
-                                    titlesRefs=self.titlesRefs,
-                                    namesRefs=self.namesRefs,
-                                    charactersRefs=self.charactersRefs,
-                                    key2infoset=self.key2infoset,
-                                    fullpath=tag))
+            _write_seq2xml(write, {key: value}, withRefs=withRefs,
+                           modFunct=origModFunct,
+                           titlesRefs=self.titlesRefs,
+                           namesRefs=self.namesRefs,
+                           charactersRefs=self.charactersRefs,
+                           key2infoset=self.key2infoset,
+                           fullpath=tag)
+            return True
         finally:
             self.modFunct = origModFunct
 
     def asXML(self, _with_add_keys=True):
         """Return a XML representation of the whole object.
         If _with_add_keys is False, dinamically generated keys are excluded."""
+        chunks = []
+        self._write_xml(chunks.append, _with_add_keys=_with_add_keys)
+        return ''.join(chunks)
+
+    def write_xml(self, fileobj, _with_add_keys=True, encoding='utf-8'):
+        """Write the output of asXML to a file object, a block at a time,
+        without building the whole document in memory; if fileobj is not
+        a text file, the output is encoded."""
+        writer = _BlockWriter(fileobj.write,
+                              encoding=None if isinstance(fileobj, io.TextIOBase) else encoding)
+        self._write_xml(writer.write, _with_add_keys=_with_add_keys)
+        writer.flush()
+
+    def _write_xml(self, write, _with_add_keys=True):
+        """Pass the XML representation of the whole object to the write function."""
         beginTag, endTag = _tag4TON(self, addAccessSystem=True, _containerOnly=True)
-        resList = [beginTag]
+        write(_xmlHead % self.__class__.__name__.lower())
+        write(beginTag)
         for key in list(self.keys()):
-            value = self.getAsXML(key, _with_add_keys=_with_add_keys)
-            if not value:
-                continue
-            resList.append(value)
-        resList.append(endTag)
-        head = _xmlHead % self.__class__.__name__.lower()
-        return head + ''.join(resList)
+            self._write_key_xml(write, key, _with_add_keys=_with_add_keys)
+        write(endTag)
 
     def _getitem(self, key):
         """Handle special keys."""
@@ -1493,7 +2095,39 @@ class _Container(object):
         """Return the value for a given key, checking key aliases;
         a KeyError exception is raised if the key is not found.
         """
-        value = self._getitem(key)
+        # Parse only the pending set of information known to contain
+        # the key or, if it's unknown, one at a time until the key is found.
+        if self._pending_infosets and not self._lazy_lookup:
+            self._lazy_lookup = True
+            try:
+                infosets = list(self._pending_infosets)
+                known = None
+                if self._key2infoset:
+                    known = self._key2infoset.get(self.keys_alias.get(key, key))
+                if known is not None:
+                    infosets = [known] if known in self._pending_infosets else []
+                for infoset in infosets:
+                    try:
+                        return self._get_value(key)
+                    except KeyError:
+                        pass
+                    self.materialize(infoset)
+                return self._get_value(key)
+            finally:
+                self._lazy_lookup = False
+        return self._get_value(key)
+
+    def _get_value(self, key):
+        """Return the value for a given key, from the data parsed so far."""
+        if self._computed_keys is None:
+            value = self._getitem(key)
+        elif key in self._computed_keys:
+            value = self._get_computed(key)
+        elif key not in self.data:
+            value = self._getitem(key)
+        else:
+            # Plain keys don't need to go through _getitem.
+            value = None
         if value is not None:
             return value
         # Handle key aliases.
@@ -1503,23 +2137,49 @@ class _Container(object):
             rawData = self.data[key]
         if key in self.keys_tomodify and \
                 self.modFunct not in (None, modNull):
+            # The modified value is cached, as long as the raw data (and its
+            # content), the modFunct and the references (see _clear_cache) are
+            # the same; a new copy is returned every time.
+            if self._modCache is None:
+                self._modCache = {}
+            content = _freeze(rawData)
+            cached = self._modCache.get(key)
+            if cached is not None and cached[0] is rawData and cached[2] is self.modFunct and \
+                    cached[1] == content:
+                return _thaw(cached[3])
             try:
-                return modifyStrings(rawData, self.modFunct, self.titlesRefs,
-                                     self.namesRefs, self.charactersRefs)
+                value = modifyStrings(rawData, self.modFunct, self._titlesRefs or {},
+                                      self._namesRefs or {}, self._charactersRefs or {})
+                self._modCache[key] = (rawData, content, self.modFunct, _freeze(value))
+                return value
             except RuntimeError as e:
                 import warnings
                 warnings.warn("RuntimeError in imdb.utils._Container.__getitem__;"
                               " if it's not a recursion limit exceeded, it's a bug:\n%s" % e)
         return rawData
 
+    def _get_computed(self, key):
+        """Return the (cached) value of a key computed by _getitem."""
+        self._check_cache()
+        if self._computedCache is None:
+            self._computedCache = {}
+        value = self._computedCache.get(key)
+        if value is None:
+            value = self._getitem(key)
+            if value is not None:
+                self._computedCache[key] = value
+        return value
+
     def __setitem__(self, key, item):
         """Directly store the item with the given key."""
         self.data[key] = item
+        self._clear_cache()
 
     def __delitem__(self, key):
         """Remove the given section or key."""
         # XXX: how to remove an item of a section?
         del self.data[key]
+        self._clear_cache()
 
     def _additional_keys(self):
         """Valid keys to append to the data.keys() list."""
@@ -1560,6 +2220,7 @@ class _Container(object):
     #      call ia.update(movieObject, 'data set') instead.
     def update(self, dict):
         self.data.update(dict)
+        self._clear_cache()
 
     def get(self, key, failobj=None):
         """Return the given section, or default if it's not found."""
@@ -1574,9 +2235,11 @@ class _Container(object):
         return self[key]
 
     def pop(self, key, *args):
+        self._clear_cache()
         return self.data.pop(key, *args)
 
     def popitem(self):
+        self._clear_cache()
         return self.data.popitem()
 
     def __repr__(self):
@@ -1593,10 +2256,12 @@ class _Container(object):
     def append_item(self, key, item):
         """The item is appended to the list identified by the given key."""
         self.data.setdefault(key, []).append(item)
+        self._clear_cache()
 
     def set_item(self, key, item):
         """Directly store the item with the given key."""
         self.data[key] = item
+        self._clear_cache()
 
     def __bool__(self):
         """Return true if self.data contains something."""
@@ -1609,6 +2274,265 @@ class _Container(object):
         """Return a deep copy of the object itself."""
         return deepcopy(self)
 
+    def to_dict(self):
+        """Return a dictionary made only of dictionaries, lists, strings
+        and numbers, representing this object (see from_dict); an instance
+        found more than once is stored only once.  The modFunct is not
+        included."""
+        d = _to_plain(self, {})['__object__']
+        d['version'] = DICT_VERSION
+        return d
+
+    @classmethod
+    def from_dict(cls, d, modFunct=None):
+        """Return the Movie, Person, Character or Company object
+        represented by a dictionary returned by to_dict."""
+        if d.get('version') != DICT_VERSION:
+            raise IMDbError('unsupported dictionary version: %s' % d.get('version'))
+        return _from_plain({'__object__': d}, [], modFunct)
+
+    def to_bytes(self):
+        """Return a compact binary representation of this object (see
+        from_bytes), encoded with msgpack if available, otherwise with
+        pickle."""
+        d = self.to_dict()
+        if msgpack is not None:
+            return b'M' + msgpack.packb(d, use_bin_type=True)
+        return b'P' + pickle.dumps(d, protocol=_PICKLE_PROTOCOL)
+
+    @classmethod
+    def from_bytes(cls, data, modFunct=None):
+        """Return the object represented by the output of to_bytes.
+        Beware that, when encoded with pickle, the data must come from
+        a trusted source."""
+        codec, data = data[:1], data[1:]
+        if codec == b'M':
+            if msgpack is None:
+                raise IMDbError('the msgpack module is required to decode this data')
+            d = msgpack.unpackb(data, raw=False)
+        elif codec == b'P':
+            d = pickle.loads(data)
+        else:
+            raise IMDbError('unknown encoding: %r' % codec)
+        return cls.from_dict(d, modFunct=modFunct)
+
+    def __getstate__(self):
+        """Parse the pending sets of information before pickling."""
+        self.materialize()
+        state = {}
+        for cls in self.__class__.__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name in ('__weakref__', '_modCache', '_computedCache', '_containedIndex', '_cacheState'):
+                    continue
+                if name.startswith('__'):
+                    name = '_%s%s' % (cls.__name__.lstrip('_'), name)
+                state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        """Restore the object; the state can also come from a pickle
+        saved before the slots were introduced."""
+        self.reset()
+        if isinstance(state, tuple):
+            state = dict(state[0] or {}, **state[1])
+        for name, value in state.items():
+            if name in ('keys_tomodify', '_roleClass'):
+                continue
+            setattr(self, name, value)
+
+
+class IdentityMap(object):
+    """Keep a single Movie, Person, Character or Company object for every
+    (accessSystem, kind, ID) found while parsing.
+
+    The first object built for a given ID is kept; the following ones
+    share its data (merged), and are replaced by it when they don't
+    carry a role or notes of their own."""
+    def __init__(self):
+        self._objects = {}
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, key):
+        return key in self._objects
+
+    def clear(self):
+        """Forget every object."""
+        self._objects.clear()
+
+    def get(self, accessSystem, kind, theID, default=None):
+        """Return the object with the given access system, kind
+        ('movie', 'person', 'character' or 'company') and ID."""
+        return self._objects.get((accessSystem, kind, theID), default)
+
+    def share(self, obj):
+        """Return the object to be stored in place of obj."""
+        theID = obj.getID()
+        if theID is None:
+            return obj
+        key = (obj.accessSystem, obj.__class__.__name__.lower(), theID)
+        known = self._objects.get(key)
+        if known is None:
+            self._objects[key] = obj
+            return obj
+        if known is obj:
+            return obj
+        data = known.data
+        for k, v in obj.data.items():
+            if k not in data:
+                known[k] = v
+        if known._same_occurrence(obj):
+            return known
+        obj.set_data(data, override=True)
+        return obj
+
+
+# Version of the dictionaries returned by _Container.to_dict.
+DICT_VERSION = 1
+
+_PICKLE_PROTOCOL = min(5, pickle.HIGHEST_PROTOCOL)
+
+
+def _container_classes():
+    """Return a dictionary mapping kinds to Movie, Person, Character
+    and Company classes."""
+    from imdb.Character import Character
+    from imdb.Company import Company
+    from imdb.Movie import Movie
+    from imdb.Person import Person
+    return {'movie': Movie, 'person': Person, 'character': Character, 'company': Company}
+
+
+def _extra_fields(cls):
+    """Return the names of the attributes of a subclass of _Container,
+    except its ID (e.g.: myTitle for a Movie)."""
+    return [name for name in cls.__slots__ if not name.endswith('ID')]
+
+
+def _to_plain(value, seen):
+    """Convert a value in a structure made of dictionaries, lists,
+    strings and numbers; seen maps the id of the instances already
+    converted to their index."""
+    if isinstance(value, (str, bytes, int, float)) or value is None:
+        return value
+    if isinstance(value, list):
+        return [_to_plain(item, seen) for item in value]
+    if isinstance(value, tuple):
+        return {'__tuple__': [_to_plain(item, seen) for item in value]}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return dict((key, _to_plain(item, seen)) for key, item in value.items())
+        return {'__items__': [[_to_plain(key, seen), _to_plain(item, seen)]
+                              for key, item in value.items()]}
+    if isinstance(value, _Container):
+        if id(value) in seen:
+            return {'__ref__': seen[id(value)]}
+        seen[id(value)] = len(seen)
+        value.materialize()
+        d = {'kind': value.__class__.__name__.lower()}
+        fields = [
+            ('ID', value.getID()),
+            ('accessSystem', value.accessSystem),
+            ('myID', value.myID),
+            ('notes', value.notes),
+            ('data', _to_plain(value._data, seen)),
+            ('roleIsPerson', value._roleIsPerson),
+            ('currentRole', _to_plain(value._Container__role, seen)),
+            ('titlesRefs', _to_plain(value._titlesRefs, seen)),
+            ('namesRefs', _to_plain(value._namesRefs, seen)),
+            ('charactersRefs', _to_plain(value._charactersRefs, seen)),
+            ('currentInfo', list(value._current_info or [])),
+            ('infoset2keys', _to_plain(value._infoset2keys, seen))
+        ]
+        fields += [(name, getattr(value, name)) for name in _extra_fields(value.__class__)]
+        for name, field in fields:
+            # Empty fields are omitted.
+            if field is None or field is False or (isinstance(field, (str, list, dict)) and not field):
+                continue
+            d[name] = field
+        return {'__object__': d}
+    raise IMDbError('unable to convert %r' % (value,))
+
+
+def _from_plain(value, objects, modFunct):
+    """Convert the output of _to_plain back; objects is the list of
+    the instances already restored."""
+    if isinstance(value, list):
+        return [_from_plain(item, objects, modFunct) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if '__object__' in value:
+        d = value['__object__']
+        cls = _container_classes()[d['kind']]
+        obj = cls(accessSystem=d.get('accessSystem'), myID=d.get('myID'),
+                  notes=d.get('notes', ''), roleIsPerson=d.get('roleIsPerson', False),
+                  modFunct=modFunct)
+        objects.append(obj)
+        setattr(obj, '%sID' % d['kind'], d.get('ID'))
+        for name in _extra_fields(cls):
+            if name in d:
+                setattr(obj, name, d[name])
+        obj.set_data(_from_plain(d.get('data', {}), objects, modFunct), override=True)
+        role = _from_plain(d.get('currentRole'), objects, modFunct)
+        if role is not None:
+            obj.currentRole = role
+        obj.update_titlesRefs(_from_plain(d.get('titlesRefs'), objects, modFunct))
+        obj.update_namesRefs(_from_plain(d.get('namesRefs'), objects, modFunct))
+        obj.update_charactersRefs(_from_plain(d.get('charactersRefs'), objects, modFunct))
+        obj.current_info = list(d.get('currentInfo', []))
+        obj.infoset2keys = _from_plain(d.get('infoset2keys', {}), objects, modFunct)
+        for infoset, keys in obj.infoset2keys.items():
+            for key in keys:
+                obj.key2infoset[key] = infoset
+        return obj
+    if '__ref__' in value:
+        return objects[value['__ref__']]
+    if '__tuple__' in value:
+        return tuple(_from_plain(item, objects, modFunct) for item in value['__tuple__'])
+    if '__items__' in value:
+        return dict((_from_plain(key, objects, modFunct), _from_plain(item, objects, modFunct))
+                    for key, item in value['__items__'])
+    return dict((key, _from_plain(item, objects, modFunct)) for key, item in value.items())
+
+
+_objects_params = local()
+
+
+@contextmanager
+def objects_params(accessSystem, modFunct):
+    """Set the access system and the modFunct of every Movie, Person,
+    Character and Company object created in this context."""
+    previous = getattr(_objects_params, 'current', None)
+    _objects_params.current = (accessSystem, modFunct)
+    try:
+        yield
+    finally:
+        _objects_params.current = previous
+
+
+_identity_maps = local()
+
+
+def get_identity_map():
+    """Return the IdentityMap used in this thread, or None."""
+    return getattr(_identity_maps, 'current', None)
+
+
+@contextmanager
+def identity_map(idmap=None):
+    """Share the objects built in this context through an IdentityMap,
+    which is returned; if idmap is None, the map already in use (or a
+    new one) is used."""
+    previous = get_identity_map()
+    if idmap is None:
+        idmap = previous or IdentityMap()
+    _identity_maps.current = idmap
+    try:
+        yield idmap
+    finally:
+        _identity_maps.current = previous
+
 
 def flatten(seq, toDescend=(list, dict, tuple), yieldDictKeys=False,
             onlyKeysType=(_Container,), scalar=None):
@@ -1616,26 +2540,27 @@ def flatten(seq, toDescend=(list, dict, tuple), yieldDictKeys=False,
     or a tuple of types to be considered non-scalar; if yieldDictKeys is
     true, also dictionaries' keys are yielded; if scalar is not None, only
     items of the given type(s) are yielded."""
-    if scalar is None or isinstance(seq, scalar):
-        yield seq
-    if isinstance(seq, toDescend):
-        if isinstance(seq, (dict, _Container)):
-            if yieldDictKeys:
-                # Yield also the keys of the dictionary.
-                for key in seq.keys():
-                    for k in flatten(key, toDescend=toDescend,
-                                     yieldDictKeys=yieldDictKeys,
-                                     onlyKeysType=onlyKeysType, scalar=scalar):
-                        if onlyKeysType and isinstance(k, onlyKeysType):
-                            yield k
-            for value in seq.values():
-                for v in flatten(value, toDescend=toDescend,
-                                 yieldDictKeys=yieldDictKeys,
-                                 onlyKeysType=onlyKeysType, scalar=scalar):
-                    yield v
-        elif not isinstance(seq, (str, bytes, int, float)):
-            for item in seq:
-                for i in flatten(item, toDescend=toDescend,
-                                 yieldDictKeys=yieldDictKeys,
-                                 onlyKeysType=onlyKeysType, scalar=scalar):
-                    yield i
+    # A stack of iterators, each with a flag telling if it's iterating
+    # over the keys of a dictionary (or over something inside a key).
+    stack = [(iter((seq,)), False)]
+    while stack:
+        items, inKeys = stack.pop()
+        for item in items:
+            if scalar is None or isinstance(item, scalar):
+                # Only the keys of the onlyKeysType type(s) are yielded.
+                if not inKeys or (onlyKeysType and isinstance(item, onlyKeysType)):
+                    yield item
+            if not isinstance(item, toDescend):
+                continue
+            if isinstance(item, (dict, _Container)):
+                # Descend, and resume the current iterator later.
+                stack.append((items, inKeys))
+                stack.append((iter(item.values()), inKeys))
+                if yieldDictKeys:
+                    # The keys are visited before the values.
+                    stack.append((iter(item.keys()), True))
+                break
+            elif not isinstance(item, (str, bytes, int, float)):
+                stack.append((items, inKeys))
+                stack.append((iter(item), inKeys))
+                break
@@ -103,6 +103,9 @@ params = {
         'doc': [
             'sphinx',
             'sphinx_rtd_theme'
+        ],
+        'msgpack': [
+            'msgpack'
         ]
     },
     'packages': setuptools.find_packages(),
@@ -0,0 +1,146 @@
+from imdb.Character import Character
+from imdb.Movie import Movie
+from imdb.Person import Person
+
+
+def _upper(s, titlesRefs, namesRefs, charactersRefs):
+    return s.upper()
+
+
+def test_modified_value_should_be_cached():
+    calls = []
+
+    def _counted(s, titlesRefs, namesRefs, charactersRefs):
+        calls.append(s)
+        return s.upper()
+    movie = Movie(title='The Matrix (1999)', data={'plot': ['a plot']}, modFunct=_counted)
+    assert movie['plot'] == ['A PLOT']
+    assert movie['plot'] == ['A PLOT']
+    assert calls == ['a plot']
+
+
+def test_modified_value_should_be_a_copy():
+    movie = Movie(title='The Matrix (1999)', data={'trivia': ['a trivia']}, modFunct=_upper)
+    trivia = movie['trivia']
+    trivia.append('junk')
+    assert movie['trivia'] == ['A TRIVIA']
+    assert movie['trivia'] is not movie['trivia']
+
+
+def test_modified_value_should_follow_data_changes():
+    movie = Movie(title='The Matrix (1999)', data={'plot': ['a plot']}, modFunct=_upper)
+    assert movie['plot'] == ['A PLOT']
+    movie['plot'] = ['another plot']
+    assert movie['plot'] == ['ANOTHER PLOT']
+    movie.data['plot'] = ['a third plot']
+    assert movie['plot'] == ['A THIRD PLOT']
+    movie.data['plot'].append('a fourth plot')
+    assert movie['plot'] == ['A THIRD PLOT', 'A FOURTH PLOT']
+    movie.data['plot'][0] = 'new plot'
+    assert movie['plot'] == ['NEW PLOT', 'A FOURTH PLOT']
+
+
+def test_modified_value_should_follow_mod_funct_changes():
+    movie = Movie(title='The Matrix (1999)', data={'plot': ['a plot']}, modFunct=_upper)
+    assert movie['plot'] == ['A PLOT']
+    movie.set_mod_funct(lambda s, *refs: s.title())
+    assert movie['plot'] == ['A Plot']
+
+
+def test_modified_value_should_follow_refs_changes():
+    def _refs(s, titlesRefs, namesRefs, charactersRefs):
+        return '%s %d' % (s, len(namesRefs))
+    movie = Movie(title='The Matrix (1999)', data={'plot': ['a plot']}, modFunct=_refs)
+    assert movie['plot'] == ['a plot 0']
+    movie.update_namesRefs({'Keanu Reeves': None})
+    assert movie['plot'] == ['a plot 1']
+
+
+def test_computed_key_should_follow_title_changes():
+    movie = Movie(title='The Matrix (1999)')
+    assert movie['long imdb title'] == 'The Matrix (1999)'
+    movie.set_title('The Matrix Reloaded (2003)')
+    assert movie['long imdb title'] == 'The Matrix Reloaded (2003)'
+    movie['year'] = 2004
+    assert movie['long imdb title'] == 'The Matrix Reloaded (2004)'
+    movie.data['year'] = 2005
+    assert movie['long imdb title'] == 'The Matrix Reloaded (2005)'
+    assert movie.sort_key() == Movie(title='The Matrix Reloaded (2005)').sort_key()
+
+
+def test_computed_key_should_follow_series_changes():
+    series = Movie(title='"Friends" (1994)')
+    episode = Movie(title='The One Where Monica Gets a Roommate', data={'episode of': series})
+    assert episode['series title'] == 'Friends'
+    series['title'] = 'Friends Again'
+    assert episode['series title'] == 'Friends Again'
+
+
+def test_computed_key_should_follow_languages_changes():
+    movie = Movie(title='Die Hard (1988)', data={'languages': ['English']})
+    assert movie['smart long imdb canonical title'] == 'Die Hard (1988)'
+    movie['languages'].insert(0, 'German')
+    assert movie['smart long imdb canonical title'] == 'Hard, Die (1988)'
+    movie['languages'][0] = 'English'
+    assert movie['smart canonical title'] == 'Die Hard'
+
+
+def test_person_should_still_expose_filmography_keys():
+    person = Person(name='Reeves, Keanu', data={'filmography': {'actor': ['The Matrix']}})
+    assert person['name'] == 'Keanu Reeves'
+    assert person['actor'] == ['The Matrix']
+
+
+def test_person_in_movie_should_follow_data_changes():
+    keanu = Person(name='Keanu Reeves', personID='0000206', accessSystem='http')
+    carrie = Person(name='Carrie-Anne Moss', personID='0005251', accessSystem='http')
+    movie = Movie(title='The Matrix (1999)', data={'cast': [keanu]}, accessSystem='http')
+    assert keanu in movie
+    assert carrie not in movie
+    movie.append_item('cast', carrie)
+    assert carrie in movie
+    del movie['cast']
+    assert keanu not in movie
+    movie.data['cast'] = [keanu]
+    assert keanu in movie
+    movie['cast'].append(carrie)
+    assert carrie in movie
+    movie['cast'].remove(keanu)
+    assert keanu not in movie
+    movie['cast'][0] = keanu
+    assert keanu in movie
+    assert carrie not in movie
+
+
+def test_movie_in_person_should_follow_nested_changes():
+    matrix = Movie(title='The Matrix (1999)', movieID='0133093', accessSystem='http')
+    reloaded = Movie(title='The Matrix Reloaded (2003)', movieID='0234215', accessSystem='http')
+    person = Person(name='Keanu Reeves', data={'filmography': {'actor': [matrix]}}, accessSystem='http')
+    assert matrix in person
+    assert reloaded not in person
+    person['filmography']['actor'].append(reloaded)
+    assert reloaded in person
+
+
+def test_person_in_series_should_follow_episodes_changes():
+    jennifer = Person(name='Jennifer Aniston', personID='0000098', accessSystem='http')
+    bruce = Person(name='Bruce Willis', personID='0000246', accessSystem='http')
+    pilot = Movie(title='The One Where It All Began', data={'cast': [jennifer]}, accessSystem='http')
+    episode = Movie(title='The One Where Ross Meets Elizabeth\'s Dad', data={'cast': [bruce]}, accessSystem='http')
+    series = Movie(title='"Friends" (1994)', data={'episodes': {1: {1: pilot}}}, accessSystem='http')
+    assert jennifer in series
+    assert bruce not in series
+    series['episodes'][1][2] = episode
+    assert bruce in series
+
+
+def test_character_in_movie_should_look_at_roles():
+    neo = Character(name='Neo', characterID='0000741', accessSystem='http')
+    keanu = Person(name='Keanu Reeves', personID='0000206', currentRole=neo, accessSystem='http')
+    movie = Movie(title='The Matrix (1999)', data={'cast': [keanu]}, accessSystem='http')
+    assert neo in movie
+    assert Character(name='Neo', characterID='0000741', accessSystem='http') in movie
+    assert Character(name='Trinity', characterID='0000742', accessSystem='http') not in movie
+    keanu.currentRole = Character(name='Trinity', characterID='0000742', accessSystem='http')
+    assert Character(name='Trinity', characterID='0000742', accessSystem='http') in movie
+    assert movie in Person(name='Keanu Reeves', data={'actor': [movie]})
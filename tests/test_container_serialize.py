@@ -0,0 +1,62 @@
+import pytest
+
+import imdb.utils
+from imdb._exceptions import IMDbError
+from imdb.Character import Character
+from imdb.Movie import Movie
+from imdb.Person import Person
+
+
+def _movie():
+    director = Person(name='Lana Wachowski', personID='0905154', accessSystem='http')
+    neo = Character(name='Neo', characterID='0000741', accessSystem='http')
+    keanu = Person(name='Keanu Reeves', personID='0000206', currentRole=neo,
+                   notes='(as K. Reeves)', billingPos=1, accessSystem='http')
+    episode = Movie(title='Episode', movieID='0000001', accessSystem='http')
+    movie = Movie(title='The Matrix (1999)', movieID='0133093', accessSystem='http',
+                  data={'director': [director], 'writer': [director], 'cast': [keanu],
+                        'rating': 8.7, 'episodes': {1: {1: episode}}},
+                  namesRefs={'Lana Wachowski': director})
+    movie.add_to_current_info('main', keys=['director', 'cast'])
+    return movie
+
+
+def test_dict_should_be_versioned():
+    d = _movie().to_dict()
+    assert d['version'] == imdb.utils.DICT_VERSION
+    assert d['kind'] == 'movie'
+    assert d['ID'] == '0133093'
+    d['version'] = -1
+    with pytest.raises(IMDbError):
+        Movie.from_dict(d)
+
+
+def test_from_dict_should_restore_the_object():
+    movie = _movie()
+    restored = Movie.from_dict(movie.to_dict())
+    assert restored.asXML() == movie.asXML()
+    assert restored.current_info == ['main']
+    assert restored.key2infoset['cast'] == 'main'
+    keanu = restored['cast'][0]
+    assert keanu.billingPos == 1
+    assert keanu.notes == '(as K. Reeves)'
+    assert keanu.currentRole.characterID == '0000741'
+    assert restored['episodes'][1][1].movieID == '0000001'
+
+
+def test_shared_objects_should_be_stored_once():
+    restored = Movie.from_dict(_movie().to_dict())
+    assert restored['director'][0] is restored['writer'][0]
+    assert restored['director'][0] is restored.namesRefs['Lana Wachowski']
+
+
+@pytest.mark.parametrize('codec', ['msgpack', 'pickle'])
+def test_bytes_should_restore_the_object(monkeypatch, codec):
+    if codec == 'pickle':
+        monkeypatch.setattr(imdb.utils, 'msgpack', None)
+    elif imdb.utils.msgpack is None:
+        pytest.skip('msgpack is not installed')
+    movie = _movie()
+    data = movie.to_bytes()
+    assert data[:1] == (b'M' if codec == 'msgpack' else b'P')
+    assert Movie.from_bytes(data).asXML() == movie.asXML()
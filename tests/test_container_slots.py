@@ -0,0 +1,34 @@
+import pickle
+from copy import deepcopy
+
+from imdb.Movie import Movie
+from imdb.Person import Person
+
+
+def test_person_should_not_have_instance_dict():
+    person = Person(name='Keanu Reeves', personID='0000206')
+    assert not hasattr(person, '__dict__')
+
+
+def test_refs_should_be_created_only_when_needed():
+    person = Person(name='Keanu Reeves', personID='0000206')
+    assert person._titlesRefs is None
+    assert person._current_info is None
+    person.update_titlesRefs({'The Matrix (1999)': '0133093'})
+    assert person.titlesRefs == {'The Matrix (1999)': '0133093'}
+
+
+def test_keys_tomodify_should_be_shared():
+    assert Movie().keys_tomodify is Movie().keys_tomodify
+    assert 'plot' in Movie().keys_tomodify
+
+
+def test_movie_should_survive_pickle_and_deepcopy():
+    person = Person(name='Keanu Reeves', personID='0000206', currentRole='Neo')
+    movie = Movie(title='The Matrix (1999)', movieID='0133093', data={'cast': [person]})
+    movie.add_to_current_info('main')
+    for copied in (pickle.loads(pickle.dumps(movie)), deepcopy(movie)):
+        assert copied['long imdb title'] == 'The Matrix (1999)'
+        assert copied.movieID == '0133093'
+        assert copied.current_info == ['main']
+        assert str(copied['cast'][0].currentRole) == 'Neo'
@@ -0,0 +1,93 @@
+from functools import cmp_to_key
+
+from imdb.Company import Company
+from imdb.Movie import Movie
+from imdb.Person import Person
+from imdb.utils import cmpCompanies, cmpMovies, cmpPeople, movieSortKey, peopleSortKey
+
+
+def _movies():
+    series = Movie(title='"Friends" (1994)', movieID='0108778')
+    return [
+        Movie(title='The Matrix (1999)', movieID='0133093'),
+        Movie(title='Speed (1994)', movieID='0111257'),
+        Movie(title='Alien (1979)', movieID='0078748'),
+        Movie(movieID='0111258', data={'title': 'Speed', 'year': 1994, 'imdbIndex': 'II'}),
+        Movie(title='Ep 2 (1994)', movieID='0583459', data={'episode of': series, 'season': 1, 'episode': 2}),
+        Movie(title='Ep 1 (1994)', movieID='0583453', data={'episode of': series, 'season': 1, 'episode': 1}),
+        Movie(title='Ep 1 (1995)', movieID='0583454', data={'episode of': series, 'season': 2, 'episode': 1})
+    ]
+
+
+def _people():
+    return [Person(name='Carrie-Anne Moss', personID='0005251', billingPos=3),
+            Person(name='Keanu Reeves', personID='0000206', billingPos=1),
+            Person(name='Laurence Fishburne', personID='0000401', billingPos=2),
+            Person(name='Hugo Weaving', personID='0915989', billingPos=4)]
+
+
+def test_movies_sort_key_should_match_cmp_movies():
+    movies = [m for m in _movies() if 'episode of' not in m and 'imdbIndex' not in m]
+    movies.append(Movie(movieID='0120179', data={'title': 'Speed 2', 'year': 1997, 'imdbIndex': 'II'}))
+    movies.append(Movie(movieID='0120180', data={'title': 'Speed 2', 'year': 1997, 'imdbIndex': 'I'}))
+    assert [m.movieID for m in sorted(movies, key=Movie.sort_key)] == \
+        [m.movieID for m in sorted(movies, key=cmp_to_key(cmpMovies))]
+
+
+def test_episodes_should_be_sorted_with_their_series():
+    series = Movie(title='"A" (1990)', movieID='0000001')
+    episode = Movie(title='B', movieID='0000002', data={'episode of': series, 'season': 1, 'episode': 1})
+    movies = [Movie(title='C (1990)', movieID='0000003'), Movie(title='B (1990)', movieID='0000004'),
+              episode, series]
+    assert [m.movieID for m in sorted(movies)] == ['0000001', '0000002', '0000004', '0000003']
+
+
+def test_movies_should_be_sorted_by_year_in_reverse_order():
+    titles = [m['title'] for m in sorted(_movies()) if 'episode of' not in m]
+    assert titles == ['The Matrix', 'Speed', 'Speed', 'Alien']
+
+
+def test_episodes_should_be_sorted_in_reverse_order():
+    episodes = [m.movieID for m in sorted(_movies()) if 'episode of' in m]
+    assert episodes == ['0583454', '0583459', '0583453']
+
+
+def test_people_sort_key_should_match_cmp_people():
+    people = _people()
+    assert [p.personID for p in sorted(people, key=Person.sort_key)] == \
+        [p.personID for p in sorted(people, key=cmp_to_key(cmpPeople))]
+    assert [p['name'] for p in sorted(people)][0] == 'Keanu Reeves'
+
+
+def test_people_sort_key_should_follow_billing_pos_changes():
+    people = _people()
+    sorted(people)
+    people[3].billingPos = 0
+    people[1].billingPos = None
+    assert [p.personID for p in sorted(people)][-2:] == ['0000206', '0915989']
+
+
+def test_missing_values_should_be_sorted_last():
+    people = [Person(name='Hugo Weaving'), Person(name='Keanu Reeves', billingPos=1), Person()]
+    assert [p.get('name') for p in sorted(people)] == ['Keanu Reeves', 'Hugo Weaving', None]
+
+
+def test_sort_keys_should_work_with_dictionaries():
+    movies = [{'title': 'Speed', 'year': 1994}, {'title': 'The Matrix', 'year': 1999}]
+    assert sorted(movies, key=movieSortKey)[0]['title'] == 'The Matrix'
+    people = [{'name': 'Reeves, Keanu'}, {'name': 'Moss, Carrie-Anne'}]
+    assert sorted(people, key=peopleSortKey)[0]['name'] == 'Moss, Carrie-Anne'
+
+
+def test_companies_sort_key_should_match_cmp_companies():
+    companies = [Company(name='Warner Bros. [us]'), Company(name='Village Roadshow [au]'),
+                 Company(name='Groucho II Film Partnership')]
+    assert [c['name'] for c in sorted(companies, key=Company.sort_key)] == \
+        [c['name'] for c in sorted(companies, key=cmp_to_key(cmpCompanies))]
+
+
+def test_sort_key_should_change_with_the_data():
+    movie = Movie(title='Speed (1994)')
+    key = movie.sort_key()
+    movie['year'] = 2000
+    assert movie.sort_key() != key
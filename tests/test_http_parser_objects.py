@@ -0,0 +1,59 @@
+from imdb.parser.http.piculet import Path, Rule, Rules
+from imdb.parser.http.utils import DOMParserBase, analyze_imdbid, build_person
+
+
+class CastParser(DOMParserBase):
+    _containsObjects = True
+
+    rules = [
+        Rule(
+            key='cast',
+            extractor=Rules(
+                foreach='//table[@class="cast_list"]//tr',
+                rules=[
+                    Rule(
+                        key='person',
+                        extractor=Path('.//text()')
+                    ),
+                    Rule(
+                        key='link',
+                        extractor=Path('./td[1]/a[@href]/@href')
+                    )
+                ],
+                transform=lambda x: build_person(
+                    x.get('person') or '',
+                    personID=analyze_imdbid(x.get('link')),
+                    roleID=''
+                )
+            )
+        )
+    ]
+
+
+CAST = '''<html><body><table class="cast_list">
+<tr><td><a href="/name/nm0000206/">Keanu Reeves</a> ... Neo</td></tr>
+<tr><td><a href="/name/nm0005251/">Carrie-Anne Moss</a> ... Trinity</td></tr>
+</table></body></html>'''
+
+
+def _mod_funct(s, titlesRefs, namesRefs, charactersRefs):
+    return s
+
+
+def test_objects_should_get_parser_params():
+    parser = CastParser()
+    parser._as = 'test'
+    parser._modFunct = _mod_funct
+    cast = parser.parse(CAST)['data']['cast']
+    assert [p.personID for p in cast] == ['0000206', '0005251']
+    for person in cast:
+        assert person.accessSystem == 'test'
+        assert person.modFunct is _mod_funct
+        assert person.currentRole.accessSystem == 'test'
+
+
+def test_objects_built_outside_parsers_should_keep_their_params():
+    CastParser().parse(CAST)
+    person = build_person('Keanu Reeves', personID='0000206')
+    assert person.accessSystem == 'http'
+    assert person.modFunct is not None
@@ -0,0 +1,47 @@
+from imdb.parser.http.utils import build_movie, build_person
+from imdb.utils import IdentityMap, get_identity_map, identity_map
+
+
+def test_objects_should_not_be_shared_by_default():
+    assert get_identity_map() is None
+    assert build_person('Lana Wachowski', personID='0905154') is not \
+        build_person('Lana Wachowski', personID='0905154')
+
+
+def test_same_person_should_be_a_single_object():
+    with identity_map() as idmap:
+        director = build_person('Lana Wachowski', personID='0905154')
+        writer = build_person('Lana Wachowski', personID='0905154')
+    assert director is writer
+    assert idmap.get('http', 'person', '0905154') is director
+    assert get_identity_map() is None
+
+
+def test_persons_with_roles_should_share_data():
+    with identity_map():
+        neo = build_person('Keanu Reeves ... Neo', personID='0000206', roleID='0000741')
+        keanu = build_person('Keanu Reeves', personID='0000206', headshot='keanu.jpg')
+    assert neo is not keanu
+    assert str(neo.currentRole) == 'Neo'
+    assert neo.data is keanu.data
+    assert neo['headshot'] == 'keanu.jpg'
+
+
+def test_session_should_span_many_calls():
+    session = IdentityMap()
+    with identity_map(session):
+        first = build_movie('The Matrix (1999)', movieID='0133093')
+    with identity_map(session):
+        with identity_map():
+            second = build_movie('The Matrix (1999)', movieID='0133093')
+    assert first is second
+    assert len(session) == 1
+
+
+def test_shared_data_should_not_leave_stale_caches():
+    with identity_map():
+        neo = build_person('Keanu Reeves ... Neo', personID='0000206', roleID='0000741')
+        keanu = build_person('Keanu Reeves', personID='0000206')
+    assert neo['long imdb name'] == keanu['long imdb name'] == 'Keanu Reeves'
+    keanu['name'] = 'Keanu Charles Reeves'
+    assert neo['long imdb name'] == 'Keanu Charles Reeves'
@@ -0,0 +1,107 @@
+import pytest
+
+from imdb import Cinemagoer
+from imdb.parser.http import IMDbURLopener
+
+PAGES = {
+    'reference': '<html><head><meta property="og:title" content="The Matrix (1999) - IMDb"/></head></html>',
+    'plotsummary': '<html><body><ul id="plot-summaries-content"><li><p>Neo learns the truth.</p>'
+                   '<div class="author-container"><a>Morpheus</a></div></li></ul></body></html>'
+}
+
+
+@pytest.fixture
+def stored_pages(monkeypatch):
+    """Serve the stored pages, instead of retrieving them from IMDb."""
+    urls = []
+
+    def retrieve_unicode(self, url, size=-1):
+        urls.append(url)
+        return PAGES[url.rstrip('/').rsplit('/', 1)[-1]]
+    monkeypatch.setattr(IMDbURLopener, 'retrieve_unicode', retrieve_unicode)
+    return urls
+
+
+def test_lazy_update_should_retrieve_the_pages_at_once(stored_pages):
+    ia = Cinemagoer('http')
+    movie = ia.new_movie(movieID='0133093')
+    ia.update(movie, info=['main', 'plot'], lazy=True)
+    assert len(stored_pages) == 2
+    assert movie.get_pending_info() == ['main', 'plot']
+    assert movie['title'] == 'The Matrix'
+    assert movie.get_pending_info() == ['plot']
+    assert movie['plot'] == ['Neo learns the truth.::Morpheus']
+    assert movie.get_pending_info() == []
+    assert len(stored_pages) == 2
+    assert movie.data == ia.get_movie('0133093', info=['main', 'plot']).data
+
+
+def test_lazy_update_should_parse_only_the_info_set_of_a_known_key(stored_pages):
+    ia = Cinemagoer('http')
+    movie = ia.get_movie('0133093', info=['main', 'plot'])
+    data = dict(movie.data)
+    del data['plot']
+    ia.update(movie, info=['main', 'plot'], override=1, lazy=True)
+    movie.set_data(data, override=1)
+    assert movie.get_pending_info() == ['main', 'plot']
+    assert movie['plot'] == ['Neo learns the truth.::Morpheus']
+    assert movie.get_pending_info() == ['main']
+
+
+def test_info_set_that_cannot_be_parsed_should_be_dropped(stored_pages, monkeypatch):
+    ia = Cinemagoer('http', reraiseExceptions=False)
+    parse = ia.mProxy.plot_parser.parse
+    failures = [ValueError('broken page')]
+
+    def parse_once(*args, **kwds):
+        if failures:
+            raise failures.pop()
+        return parse(*args, **kwds)
+    monkeypatch.setattr(ia.mProxy.plot_parser, 'parse', parse_once)
+    movie = ia.new_movie(movieID='0133093')
+    ia.update(movie, info=['main', 'plot'], lazy=True)
+    assert movie.get('plot') is None
+    assert movie.get_pending_info() == []
+    assert movie['title'] == 'The Matrix'
+    assert movie.get('plot') is None
+    assert len(stored_pages) == 2
+    ia.update(movie, info=['plot'])
+    assert movie['plot'] == ['Neo learns the truth.::Morpheus']
+    assert len(stored_pages) == 3
+
+
+def test_info_set_that_cannot_be_parsed_should_be_reraised(stored_pages, monkeypatch):
+    ia = Cinemagoer('http')
+    monkeypatch.setattr(ia.mProxy.plot_parser, 'parse', lambda *args, **kwds: 1 / 0)
+    movie = ia.new_movie(movieID='0133093')
+    ia.update(movie, info=['plot'], lazy=True)
+    with pytest.raises(ZeroDivisionError):
+        movie.get('plot')
+    assert movie.get_pending_info() == []
+    assert movie.get('plot') is None
+
+
+def test_lazy_update_should_delay_parsing(ia):
+    movie = ia.new_movie(movieID=ia._get_real_movieID('0133093'))  # Matrix
+    ia.update(movie, info=['main', 'plot'], lazy=True)
+    assert movie.has_pending_info('main')
+    assert movie.has_pending_info('plot')
+    assert movie['title'] == 'The Matrix'
+    assert not movie.has_pending_info('main')
+    assert movie.has_pending_info('plot')
+
+
+def test_lazy_update_should_parse_everything_listing_keys(ia):
+    movie = ia.new_movie(movieID=ia._get_real_movieID('0133093'))  # Matrix
+    ia.update(movie, info=['main', 'plot'], lazy=True)
+    assert 'plot' in movie.keys()
+    assert movie.get_pending_info() == []
+    assert 'main' in movie.current_info
+
+
+def test_lazy_update_should_match_eager_update(ia):
+    lazy_movie = ia.new_movie(movieID=ia._get_real_movieID('0133093'))  # Matrix
+    ia.update(lazy_movie, info=['main', 'plot'], lazy=True)
+    movie = ia.get_movie('0133093', info=['main', 'plot'])
+    assert lazy_movie.get('plot') == movie.get('plot')
+    assert sorted(lazy_movie.keys()) == sorted(movie.keys())
@@ -0,0 +1,67 @@
+import pytest
+
+import time
+
+from imdb._exceptions import IMDbParserError
+from imdb.utils import (
+    LRUCache,
+    analyze_name,
+    analyze_title,
+    analyze_titles,
+    build_title,
+    build_titles,
+    clear_parsing_caches,
+    parsing_cache_stats
+)
+
+
+def test_analyze_title_should_be_cached():
+    clear_parsing_caches()
+    analyze_title('The Matrix (1999)')
+    analyze_title('The Matrix (1999)')
+    stats = parsing_cache_stats()['analyze_title']
+    assert (stats['hits'], stats['misses'], stats['hitRate']) == (1, 1, 0.5)
+
+
+def test_cached_results_should_not_be_corrupted_by_callers():
+    title = '"Friends" The One (1995)'
+    analyze_title(title)['episode of']['title'] = 'Foes'
+    analyze_name('Keanu Reeves')['name'] = 'Neo'
+    assert analyze_title(title)['episode of']['title'] == 'Friends'
+    assert analyze_name('Keanu Reeves')['name'] == 'Keanu Reeves'
+
+
+def test_invalid_titles_should_always_raise():
+    for i in range(2):
+        with pytest.raises(IMDbParserError):
+            analyze_title('')
+
+
+def test_batch_variants_should_match_single_calls():
+    titles = ['The Matrix (1999)', 'Speed (1994) (TV)', 'The Matrix (1999)']
+    results = analyze_titles(titles, canonical=True)
+    assert results == [analyze_title(t, canonical=True) for t in titles]
+    assert build_titles(results, canonical=False) == ['The Matrix (1999)', 'Speed (1994) (TV)', 'The Matrix (1999)']
+
+
+def test_build_title_should_handle_unhashable_values():
+    assert build_title({'title': 'Speed', 'year': [1994]}) == 'Speed ([1994])'
+
+
+def test_lru_cache_should_discard_the_least_recently_used_items():
+    cache = LRUCache(maxsize=2)
+    cache['a'] = 1
+    cache['b'] = 2
+    cache.get('a')
+    cache['c'] = 3
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c'), len(cache)) == (1, 3, 2)
+
+
+def test_lru_cache_should_discard_the_expired_items():
+    cache = LRUCache(ttl=0.01)
+    cache['a'] = 1
+    assert cache.get('a') == 1
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert cache.stats()['misses'] == 1
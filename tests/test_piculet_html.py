@@ -0,0 +1,76 @@
+import glob
+import os
+from contextlib import redirect_stdout
+from io import StringIO
+from threading import Thread
+
+from imdb.parser.http.piculet import HTMLNormalizer, html_to_xhtml
+
+DOCUMENT = ('<!DOCTYPE html><html><head><meta charset="utf-8"><title>A &amp; B</title></head>'
+            '<body><ul><li>one<li>two</li></ul><img src="x.png" alt="a&quot;b">'
+            '<script>var x = 1;</script><me@example.org></body></html>')
+
+XHTML = ('<html><head><meta charset="utf-8" /><title>A &amp; B</title></head>'
+         '<body><ul><li>one</li><li>two</li></ul><img src="x.png" alt="a&quot;b" />'
+         '&lt;me@example.org&gt;</body></html>')
+
+
+def test_html_to_xhtml_should_close_tags_and_omit_scripts():
+    assert html_to_xhtml(DOCUMENT, omit_tags={'script'}) == XHTML
+
+
+def test_html_to_xhtml_should_not_write_to_stdout(capsys):
+    html_to_xhtml(DOCUMENT)
+    assert capsys.readouterr().out == ''
+
+
+def test_html_to_xhtml_should_be_thread_safe():
+    results = []
+
+    def normalize():
+        for _ in range(20):
+            results.append(html_to_xhtml(DOCUMENT, omit_tags={'script'}))
+    threads = [Thread(target=normalize) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [XHTML] * 160
+
+
+# pages retrieved by the tests of the http access system (see conftest.py), if any.
+CACHED_PAGES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), '.cache', '*')))[:50]
+
+PAGE = ('<html><head><title>The Matrix (1999)</title><style>p {}</style></head><body>'
+        '<div id="main" class="a b"><h1 itemprop="name">The Matrix&nbsp;<span>(1999)</span></h1>'
+        '<table><tr><td><a href="/name/nm0000206/">Keanu Reeves</a><td>Neo</tr>'
+        '<tr><td><a href="/name/nm0005251/">Carrie-Anne Moss</a><td>Trinity</table>'
+        '<ul><li>Action<li>Sci-Fi</ul><p>Plot &lt;summary&gt; &#233; <b><i>bold</b></i></p>'
+        '<br><input type="checkbox" checked><script>if (a < b) {}</script></div></body></html>')
+
+
+class _PrintingNormalizer(HTMLNormalizer):
+    """The previous implementation, printing the output."""
+
+    def __init__(self, *args, **kwds):
+        super(_PrintingNormalizer, self).__init__(*args, **kwds)
+        self._write = lambda s: print(s, end='')
+
+
+def _print_to_xhtml(document, omit_tags=None, omit_attrs=None):
+    out = StringIO()
+    normalizer = _PrintingNormalizer(omit_tags=omit_tags, omit_attrs=omit_attrs)
+    with redirect_stdout(out):
+        normalizer.feed(document)
+    return out.getvalue()
+
+
+def test_html_to_xhtml_should_match_the_printing_implementation():
+    documents = [DOCUMENT, PAGE, PAGE * 200]
+    for fn in CACHED_PAGES:
+        with open(fn, encoding='utf-8') as fd:
+            documents.append(fd.read())
+    for document in documents:
+        for omit_tags, omit_attrs in ((None, None), ({'script', 'style'}, {'class', 'itemprop'})):
+            assert html_to_xhtml(document, omit_tags=omit_tags, omit_attrs=omit_attrs) == \
+                _print_to_xhtml(document, omit_tags=omit_tags, omit_attrs=omit_attrs)
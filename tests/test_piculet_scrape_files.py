@@ -0,0 +1,29 @@
+from imdb.parser.http.piculet import list_documents, scrape_files
+
+SPEC = {'items': [{'key': 'title', 'value': {'path': '//h1/text()'}}]}
+
+
+def _write_documents(tmp_path):
+    for index in range(6):
+        tmp_path.joinpath('doc%d.xml' % index).write_text('<html><h1>Title %d</h1></html>' % index)
+    tmp_path.joinpath('doc6.xml').write_text('<html><h1>broken')
+
+
+def test_list_documents_should_sort_directory_contents(tmp_path):
+    _write_documents(tmp_path)
+    paths = list_documents([str(tmp_path), str(tmp_path / 'doc1.*')])
+    assert [p.rsplit('/', 1)[-1] for p in paths] == ['doc%d.xml' % i for i in range(7)] + ['doc1.xml']
+
+
+def test_scrape_files_should_keep_input_order(tmp_path):
+    _write_documents(tmp_path)
+    paths = list_documents([str(tmp_path)])
+    records = list(scrape_files(paths, SPEC, jobs=3))
+    assert [r['file'] for r in records] == paths
+    assert [r['data']['title'] for r in records[:6]] == ['Title %d' % i for i in range(6)]
+
+
+def test_scrape_files_should_report_errors(tmp_path):
+    _write_documents(tmp_path)
+    records = list(scrape_files([str(tmp_path / 'doc6.xml'), str(tmp_path / 'missing.xml')], SPEC))
+    assert [('error' in r) and ('data' not in r) for r in records] == [True, True]
@@ -0,0 +1,43 @@
+from imdb.parser.http.piculet import Path, Rule, Rules, Selector, build_tree, single_pass
+
+DOCUMENT = ('<html><body><div class="refs">'
+            '<a href="/name/nm0000206/">Keanu Reeves</a>'
+            '<a href="/title/tt0133093/">The Matrix</a>'
+            '<a href="/name/nm0000401/" class="x">Laurence Fishburne</a>'
+            '<a>no link</a></div></body></html>')
+
+
+def test_simple_selectors_should_be_detected():
+    assert Selector('//a[starts-with(@href, "/name/nm")]').tag == 'a'
+    assert Selector('//tr[@class="odd" or @class="even"]').tag == 'tr'
+    assert Selector('//section[starts-with(@id, "a-")][not(contains(@id, "b"))]').tag == 'section'
+    assert Selector('//h2').tag == 'h2'
+
+
+def test_complex_selectors_should_not_be_detected():
+    assert Selector('//td[starts-with(text(), "Genre")]/..//li/a').tag is None
+    assert Selector('//div[@class="info"]/h3').tag is None
+    assert Selector('.//a[@href]').tag is None
+
+
+def test_single_pass_should_match_xpath():
+    root = build_tree(DOCUMENT)
+    paths = ['//a[starts-with(@href, "/name/nm")]', '//a[starts-with(@href, "/title/tt")]',
+             '//a[@href and not(@class)]', '//a[@class="x" or contains(@href, "tt")]', '//*[@class]']
+    selectors = [Selector(path) for path in paths]
+    expected = [selector(root) for selector in selectors]
+    with single_pass(root, selectors) as scan:
+        assert [scan.results[selector] for selector in selectors] == expected
+        assert [selector(root) for selector in selectors] == expected
+
+
+def test_single_pass_should_not_change_extracted_data():
+    root = build_tree(DOCUMENT)
+    rules = Rules([
+        Rule(key='names', extractor=Path('./text()', foreach='//a[starts-with(@href, "/name/nm")]')),
+        Rule(key='titles', extractor=Path('./text()', foreach='//a[starts-with(@href, "/title/tt")]'))
+    ])
+    data = rules.extract(root)
+    assert data == {'names': ['Keanu Reeves', 'Laurence Fishburne'], 'titles': ['The Matrix']}
+    with single_pass(root, rules.selectors()):
+        assert rules.extract(root) == data
@@ -0,0 +1,143 @@
+import pytest
+
+import sqlite3
+
+import sqlalchemy
+
+from imdb.parser.s3 import IMDbS3AccessSystem
+from imdb.parser.s3.utils import IMPORTS_TABLE, title_soundex, trigrams
+
+TABLES = {
+    'title_basics': ('tconst', 'titleType', 'primaryTitle', 'originalTitle', 'isAdult', 'startYear', 'endYear',
+                     'runtimeMinutes', 'genres', 't_soundex'),
+    'name_basics': ('nconst', 'primaryName', 'birthYear', 'deathYear', 'primaryProfession', 'knownForTitles',
+                    'ns_soundex', 'sn_soundex', 's_soundex'),
+    'title_akas': ('titleId', 'ordering', 'title', 'region', 'language', 'types', 'attributes', 'isOriginalTitle',
+                   't_soundex'),
+    'title_crew': ('tconst', 'directors', 'writers'),
+    'title_episode': ('tconst', 'parentTconst', 'seasonNumber', 'episodeNumber'),
+    'title_principals': ('tconst', 'ordering', 'nconst', 'category', 'job', 'characters'),
+    'title_ratings': ('tconst', 'averageRating', 'numVotes')
+}
+
+ROWS = {
+    'title_basics': [(133093, 'movie', 'The Matrix', 'The Matrix', 0, 1999, None, 136, 'Action,Sci-Fi', 'M362'),
+                     (111257, 'movie', 'Speed', 'Speed', 0, 1994, None, 116, 'Action', 'S13')],
+    'name_basics': [(206, 'Keanu Reeves', 1964, None, 'actor', '133093,111257', 'K5612', 'R125', 'R12'),
+                    (5251, 'Carrie-Anne Moss', 1967, None, 'actress', '133093', 'C6535', 'M2625', 'M2'),
+                    (905154, 'Lana Wachowski', 1965, None, 'director', '133093', 'L5232', 'W2545', 'W2')],
+    'title_crew': [(133093, '905154', '905154')],
+    'title_principals': [(133093, 2, 5251, 'actress', None, 'Trinity'),
+                         (133093, 1, 206, 'actor', None, 'Neo'),
+                         (133093, 3, 905154, 'director', None, None)],
+    'title_ratings': [(133093, 8.7, 1900000)]
+}
+
+
+@pytest.fixture
+def s3(tmp_path):
+    db = str(tmp_path / 'imdb.db')
+    connection = sqlite3.connect(db)
+    for table, columns in TABLES.items():
+        connection.execute('CREATE TABLE %s (%s)' % (table, ', '.join(columns)))
+        for row in ROWS.get(table, []):
+            connection.execute('INSERT INTO %s VALUES (%s)' % (table, ', '.join('?' * len(row))), row)
+    connection.commit()
+    connection.close()
+    ia = IMDbS3AccessSystem('sqlite:///' + db)
+    queries = []
+    sqlalchemy.event.listen(ia._engine, 'before_cursor_execute', lambda *args: queries.append(args[2]))
+    ia.queries = queries
+    yield ia
+    ia._metadata.clear()
+
+
+def _reload(s3):
+    s3._metadata.clear()
+    s3._metadata.reflect()
+
+
+def test_get_movie_main_should_fetch_people_and_titles_in_batches(s3):
+    data = s3.get_movie_main('0133093')['data']
+    assert [p.personID for p in data['cast']] == [206, 5251]
+    assert data['cast'][0]['known for'][1]['title'] == 'Speed'
+    assert data['director'][0]['name'] == 'Lana Wachowski'
+    assert data['director'][0] is not data['writer'][0]
+    assert data['director'][0].data is data['writer'][0].data
+    # title, crew, principals, people, known for titles, episode, ratings, akas.
+    assert len(s3.queries) == 8
+
+
+def test_get_person_main_should_fetch_the_known_for_titles_at_once(s3):
+    data = s3.get_person_main('0000206')['data']
+    assert [m['title'] for m in data['known for']] == ['The Matrix', 'Speed']
+    assert len(s3.queries) == 2
+
+
+def test_titles_and_people_should_be_cached_across_calls(s3):
+    s3.get_movie_main('0133093')
+    del s3.queries[:]
+    data = s3.get_movie_main('0133093')['data']
+    assert data['cast'][0]['known for'][1]['title'] == 'Speed'
+    # crew, principals, episode, ratings, akas.
+    assert len(s3.queries) == 5
+    assert s3.cache_stats()['persons']['hits'] == 3
+
+
+def test_caches_should_be_dropped_when_the_dataset_is_imported_again(s3):
+    s3.get_person_main('0000206')
+    s3.importCheckInterval = 0
+    s3._engine.execute('CREATE TABLE %s (id INTEGER PRIMARY KEY, imported DATETIME)' % IMPORTS_TABLE)
+    s3._engine.execute("INSERT INTO %s (imported) VALUES ('2026-01-01 00:00:00')" % IMPORTS_TABLE)
+    del s3.queries[:]
+    s3.get_person_main('0000206')
+    del s3.queries[:]
+    s3.get_person_main('0000206')
+    assert [q for q in s3.queries if IMPORTS_TABLE not in q] == []
+    s3._engine.execute("INSERT INTO %s (imported) VALUES ('2026-02-01 00:00:00')" % IMPORTS_TABLE)
+    del s3.queries[:]
+    s3.get_person_main('0000206')
+    assert len([q for q in s3.queries if IMPORTS_TABLE not in q]) == 2
+
+
+def test_trigrams_should_pad_every_word():
+    assert trigrams('The Matrix') == {'  t', ' th', 'the', 'he ', '  m', ' ma', 'mat', 'atr', 'tri', 'rix', 'ix '}
+    assert trigrams(' - ') == set()
+
+
+def test_search_should_use_the_full_text_index(s3):
+    s3._engine.execute("CREATE VIRTUAL TABLE title_search USING fts5(text, id UNINDEXED, tokenize='trigram')")
+    s3._engine.execute('INSERT INTO title_search SELECT primaryTitle, tconst FROM title_basics')
+    _reload(s3)
+    del s3.queries[:]
+    assert [m[1]['title'] for m in s3._search_movie('the matrx', 20)] == ['The Matrix']
+    assert s3._search_candidates('title', 'matrix') == [133093]
+    assert not any('t_soundex = ' in q for q in s3.queries)
+
+
+def test_search_episode_should_not_lose_the_episodes_among_the_candidates(s3):
+    for tconst in range(1, 302):
+        kind = 'episode' if tconst == 301 else 'movie'
+        s3._engine.execute('INSERT INTO title_basics (tconst, titleType, primaryTitle, t_soundex) VALUES (?, ?, ?, ?)',
+                           tconst, kind, 'Hamlet', title_soundex('Hamlet'))
+    s3._engine.execute("CREATE VIRTUAL TABLE title_search USING fts5(text, id UNINDEXED, tokenize='trigram')")
+    s3._engine.execute('INSERT INTO title_search SELECT primaryTitle, tconst FROM title_basics')
+    _reload(s3)
+    assert [m[0] for m in s3._search_episode('Hamlet', 20)] == [301]
+
+
+def test_search_should_use_the_least_common_trigrams(s3):
+    s3._engine.execute('CREATE TABLE name_trigrams (trigram VARCHAR(3), id INTEGER)')
+    s3._engine.execute('CREATE TABLE name_trigram_counts (trigram VARCHAR(3) PRIMARY KEY, docs INTEGER)')
+    docs = {}
+    for nconst, name in s3._engine.execute('SELECT nconst, primaryName FROM name_basics').fetchall():
+        for trigram in trigrams(name):
+            s3._engine.execute('INSERT INTO name_trigrams VALUES (?, ?)', trigram, nconst)
+            docs[trigram] = docs.get(trigram, 0) + 1
+    for trigram, count in docs.items():
+        s3._engine.execute('INSERT INTO name_trigram_counts VALUES (?, ?)', trigram, count)
+    _reload(s3)
+    del s3.queries[:]
+    assert [p[1]['name'] for p in s3._search_person('Reeves Keanu', 20)] == ['Keanu Reeves']
+    assert s3._search_person('xyz', 20) == []
+    assert not any('soundex = ' in q for q in s3.queries)
@@ -0,0 +1,52 @@
+import random
+import re
+
+from imdb.parser.s3.utils import name_soundexes, soundex, title_soundex
+
+_CODES = dict(B='1', C='2', D='3', F='1', G='2', J='2', K='2', L='4', M='5', N='5', P='1', Q='2', R='6', S='2',
+              T='3', V='1', X='2', Z='2')
+
+
+def _reference_soundex(s, length=5):
+    # The straightforward, char by char, implementation.
+    s = re.sub(r'^[^a-z]*', '', s, flags=re.I)
+    if not s:
+        return None
+    s = s.upper()
+    code = s[0]
+    for c in s[1:]:
+        if len(code) >= length:
+            break
+        cw = _CODES.get(c, '0')
+        if cw != '0' and code[-1] != cw:
+            code += cw
+    return code
+
+
+def _strings(count=20000):
+    rnd = random.Random(42)
+    words = ['the', 'Matrix', 'love', "l'amour", 'der', 'Straße', 'Ünïcode', 'İstanbul', 'al-', '1999', 'Jr.', ', The']
+    return [' '.join(rnd.choice(words) for i in range(rnd.randint(0, 5))) for j in range(count)]
+
+
+def test_soundex_should_return_the_known_codes():
+    assert [soundex(s) for s in ('Robert', 'Rupert', 'Tymczak', 'Pfister', '  42 Ashcraft')] == \
+        ['R163', 'R163', 'T52', 'P1236', 'A2613']
+    assert soundex('1999') is None
+
+
+def test_soundex_should_match_the_reference_implementation():
+    for s in _strings():
+        for length in (1, 3, 5):
+            assert soundex(s, length) == _reference_soundex(s, length)
+
+
+def test_title_soundex_should_skip_the_article():
+    assert title_soundex('The Matrix') == title_soundex('Matrix, The') == soundex('Matrix')
+    assert title_soundex("L'amour") == soundex('amour')
+    assert title_soundex('Theater') == soundex('Theater')
+
+
+def test_name_soundexes_should_return_three_codes():
+    assert name_soundexes('Keanu Reeves') == ('K5612', 'R125', 'R12')
+    assert name_soundexes('Madonna') == ('M35', None, None)
@@ -0,0 +1,175 @@
+import pytest
+
+import gzip
+import os
+import sys
+import threading
+
+from imdb import IMDb
+from imdb._exceptions import IMDbDataAccessError
+from imdb.parser.s3mmap.store import Store, compile_dataset
+
+DATASET = {
+    'title.basics': [
+        ('tconst', 'titleType', 'primaryTitle', 'originalTitle', 'isAdult', 'startYear', 'endYear',
+         'runtimeMinutes', 'genres'),
+        # the rows are not sorted by tconst.
+        ('tt0133093', 'movie', 'The Matrix', 'The Matrix', '0', '1999', r'\N', '136', 'Action,Sci-Fi'),
+        ('tt0108778', 'tvSeries', 'Friends', 'Friends', '0', '1994', '2004', '22', 'Comedy,Romance'),
+        ('tt0583459', 'tvEpisode', 'The One Where Monica Gets a Roommate', 'The One Where Monica Gets a Roommate',
+         '0', '1994', r'\N', '22', 'Comedy'),
+        ('tt0583453', 'tvEpisode', 'The One with the Sonogram at the End', 'The One with the Sonogram at the End',
+         '0', '1994', r'\N', '22', 'Comedy'),
+        ('tt0111257', 'movie', 'Speed', 'Speed', '0', '1994', r'\N', '116', 'Action')
+    ],
+    'title.ratings': [
+        ('tconst', 'averageRating', 'numVotes'),
+        ('tt0133093', '8.7', '1900000'),
+        ('tt9999999', '1.0', '1')
+    ],
+    'title.episode': [
+        ('tconst', 'parentTconst', 'seasonNumber', 'episodeNumber'),
+        ('tt0583453', 'tt0108778', '1', '2'),
+        ('tt0583459', 'tt0108778', '1', '1')
+    ],
+    'title.crew': [
+        ('tconst', 'directors', 'writers'),
+        ('tt0133093', 'nm0905154', 'nm0905154,nm0905152')
+    ],
+    'title.principals': [
+        ('tconst', 'ordering', 'nconst', 'category', 'job', 'characters'),
+        ('tt0133093', '2', 'nm0005251', 'actress', r'\N', '["Trinity"]'),
+        ('tt0133093', '1', 'nm0000206', 'actor', r'\N', '["Neo"]'),
+        ('tt0111257', '1', 'nm0000206', 'actor', r'\N', '["Jack Traven"]')
+    ],
+    'title.akas': [
+        ('titleId', 'ordering', 'title', 'region', 'language', 'types', 'attributes', 'isOriginalTitle'),
+        ('tt0133093', '1', 'Matrix', 'IT', r'\N', 'imdbDisplay', r'\N', '0'),
+        ('tt0111257', '1', 'Máxima velocidad', 'ES', r'\N', 'imdbDisplay', r'\N', '0')
+    ],
+    'name.basics': [
+        ('nconst', 'primaryName', 'birthYear', 'deathYear', 'primaryProfession', 'knownForTitles'),
+        ('nm0905154', 'Lana Wachowski', '1965', r'\N', 'director,writer', 'tt0133093'),
+        ('nm0000206', 'Keanu Reeves', '1964', r'\N', 'actor', 'tt0133093,tt0111257'),
+        ('nm0005251', 'Carrie-Anne Moss', '1967', r'\N', 'actress', 'tt0133093,tt9999999')
+    ]
+}
+
+
+def write_dataset(dir_name, dataset):
+    for name, lines in dataset.items():
+        with gzip.open(os.path.join(dir_name, name + '.tsv.gz'), 'wb') as fd:
+            fd.write(''.join('\t'.join(line) + '\n' for line in lines).encode('utf-8'))
+
+
+@pytest.fixture
+def mmap_file(tmp_path):
+    write_dataset(str(tmp_path), DATASET)
+    file_name = str(tmp_path / 'imdb.mmap')
+    compile_dataset(str(tmp_path), file_name)
+    return file_name
+
+
+@pytest.fixture
+def ia(mmap_file):
+    ia = IMDb('s3mmap', mmap_file)
+    yield ia
+    ia.close()
+
+
+def test_get_movie_should_read_the_compiled_dataset(ia):
+    movie = ia.get_movie('0133093')
+    assert (movie['title'], movie['year'], movie['kind'], movie['genres']) == \
+        ('The Matrix', '1999', 'movie', ['action', 'sci-fi'])
+    assert (movie['rating'], movie['votes'], movie['runtimes']) == (8.7, 1900000, [136])
+    assert [(p.personID, p['name'], p.billingPos) for p in movie['cast']] == \
+        [(206, 'Keanu Reeves', 1), (5251, 'Carrie-Anne Moss', 2)]
+    assert [p['name'] for p in movie['director']] == ['Lana Wachowski']
+    assert [p.get('name') for p in movie['writer']] == ['Lana Wachowski', None]
+    assert movie['akas'] == [{'ordering': 1, 'title': 'Matrix', 'region': 'IT', 'types': ['imdbDisplay']}]
+    assert movie['cast'][0]['known for'][1]['title'] == 'Speed'
+
+
+def test_get_movie_should_return_nothing_for_missing_titles(ia):
+    assert ia.get_movie('9999999').keys() == []
+
+
+def test_get_person_should_read_the_compiled_dataset(ia):
+    person = ia.get_person('0005251')
+    assert (person['name'], person['birth date'], person['primary profession']) == \
+        ('Carrie-Anne Moss', 1967, 'actress')
+    # the titles missing in title.basics are empty.
+    assert [m.get('title') for m in person['known for']] == ['The Matrix', None]
+
+
+def test_get_movie_episodes_should_sort_the_episodes(ia):
+    series = ia.get_movie('0108778', info=['main', 'episodes'])
+    assert series['number of episodes'] == 2
+    episodes = series['episodes'][1]
+    assert [(number, episodes[number].movieID) for number in episodes] == [(1, 583459), (2, 583453)]
+    assert episodes[2]['episode of'].movieID == 108778
+    assert ia.get_movie('0583453')['episodes of']['title'] == 'Friends'
+
+
+def test_search_should_use_the_soundex_indexes(ia):
+    assert [m.movieID for m in ia.search_movie('The Matrix')] == [133093]
+    assert [(m.movieID, m['title']) for m in ia.search_movie('Maxima velocidad')] == \
+        [(111257, 'Máxima velocidad')]
+    assert [m.movieID for m in ia.search_episode('The One with the Sonogram at the End')] == [583453]
+    assert [p.personID for p in ia.search_person('Reeves, Keanu')] == [206]
+
+
+def test_the_file_should_be_opened_again_when_compiled_again(ia, mmap_file, tmp_path):
+    dataset = dict(DATASET)
+    dataset['title.basics'] = DATASET['title.basics'][:1] + [
+        ('tt0133093', 'movie', 'The Matrix Reloaded', 'The Matrix Reloaded', '0', '2003', r'\N', '138', 'Action')]
+    write_dataset(str(tmp_path), dataset)
+    compile_dataset(str(tmp_path), mmap_file)
+    assert ia.get_movie('0133093')['title'] == 'The Matrix'
+    ia.fileCheckInterval = 0
+    assert ia.get_movie('0133093')['title'] == 'The Matrix Reloaded'
+
+
+def test_the_file_should_be_read_while_it_is_compiled_again(ia, mmap_file, tmp_path):
+    reloaded_dir = tmp_path / 'reloaded'
+    reloaded_dir.mkdir()
+    dataset = dict(DATASET)
+    dataset['title.basics'] = DATASET['title.basics'][:1] + [
+        ('tt0133093', 'movie', 'The Matrix Reloaded', 'The Matrix Reloaded', '0', '2003', r'\N', '138', 'Action')]
+    write_dataset(str(reloaded_dir), dataset)
+    ia.fileCheckInterval = 0
+    titles = set()
+    errors = []
+
+    def read():
+        try:
+            for _ in range(200):
+                titles.add(ia.get_movie('0133093')['title'])
+                ia.search_person('Reeves, Keanu')
+        except Exception as e:
+            errors.append(e)
+
+    def compile_again():
+        for idx in range(20):
+            compile_dataset(str(reloaded_dir if idx % 2 else tmp_path), mmap_file)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=read) for _ in range(4)] + [threading.Thread(target=compile_again)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
+    assert titles <= {'The Matrix', 'The Matrix Reloaded'}
+
+
+def test_other_files_should_be_refused(tmp_path):
+    file_name = str(tmp_path / 'imdb.db')
+    with open(file_name, 'wb') as fd:
+        fd.write(b'SQLite format 3\0' * 4)
+    with pytest.raises(IMDbDataAccessError):
+        Store(file_name)
@@ -0,0 +1,46 @@
+import io
+
+import lxml.etree
+
+from imdb.Character import Character
+from imdb.Company import Company
+from imdb.helpers import iterparseXML, parseTags
+from imdb.Movie import Movie
+from imdb.Person import Person
+
+
+def _objects():
+    neo = Character(name='Neo', characterID='0000741')
+    cast = [Person(name='Keanu Reeves', personID='0000206', currentRole=neo,
+                   notes='(as K.)', accessSystem='http')]
+    movie = Movie(title='The Matrix (1999)', movieID='0133093', accessSystem='http',
+                  data={'cast': cast, 'rating': 8.7, 'plot': ['A hacker learns::author']})
+    movie.add_to_current_info('main', keys=['cast', 'rating'])
+    person = Person(name='Keanu Reeves', personID='0000206', accessSystem='http',
+                    data={'birth date': '1964-09-02', 'actor': [Movie(title='Speed (1994)', movieID='0111257')]})
+    company = Company(name='Warner Bros. (us)', companyID='0026840', accessSystem='http')
+    return [movie, person, company]
+
+
+def _body(obj):
+    # Strip the XML declaration and the DOCTYPE.
+    return obj.asXML(_with_add_keys=False).split('\n', 2)[2]
+
+
+def test_iterparse_should_match_parse_tags():
+    for obj in _objects():
+        xml = obj.asXML().encode('utf-8')
+        expected = parseTags(lxml.etree.fromstring(xml))
+        parsed = list(iterparseXML(io.BytesIO(xml)))
+        assert len(parsed) == 1
+        assert parsed[0].asXML() == expected.asXML()
+        assert parsed[0].infoset2keys == expected.infoset2keys
+
+
+def test_iterparse_should_yield_every_object_of_a_stream():
+    objects = _objects() * 2
+    xml = '<objects>%s</objects>' % ''.join(_body(obj) for obj in objects)
+    parsed = list(iterparseXML(io.BytesIO(xml.encode('utf-8'))))
+    assert [type(obj) for obj in parsed] == [type(obj) for obj in objects]
+    assert [obj.getID() for obj in parsed] == [obj.getID() for obj in objects]
+    assert parsed[0]['cast'][0].currentRole[0]['name'] == 'Neo'
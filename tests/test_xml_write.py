@@ -0,0 +1,34 @@
+import io
+
+from imdb.Character import Character
+from imdb.Movie import Movie
+from imdb.Person import Person
+
+
+def _movie():
+    neo = Character(name='Neo', characterID='0000741')
+    cast = [Person(name='Keanu <Reeves> & co', personID='0000206', currentRole=neo,
+                   notes="(as 'K.')", accessSystem='http')]
+    return Movie(title='The Matrix (1999)', movieID='0133093', accessSystem='http',
+                 data={'cast': cast, 'rating': 8.7, 'plot': ['A "hacker" learns::author']})
+
+
+def test_write_xml_to_text_file_should_match_as_xml():
+    movie = _movie()
+    out = io.StringIO()
+    movie.write_xml(out)
+    assert out.getvalue() == movie.asXML()
+
+
+def test_write_xml_to_binary_file_should_be_encoded():
+    movie = _movie()
+    out = io.BytesIO()
+    movie.write_xml(out)
+    assert out.getvalue() == movie.asXML().encode('utf-8')
+
+
+def test_xml_values_should_be_escaped():
+    xml = _movie().asXML()
+    assert '<name>Keanu &lt;Reeves&gt; &amp; co</name>' in xml
+    assert '<notes>(as &apos;K.&apos;)</notes>' in xml
+    assert 'A &quot;hacker&quot; learns<notes>author</notes>' in xml